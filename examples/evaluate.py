@@ -12,26 +12,9 @@ from rlcard.utils import (
     get_device,
     set_seed,
     tournament,
+    load_agent,
 )
 
-def load_model(model_path, env=None, position=None, device=None):
-    if os.path.isfile(model_path):  # Torch model
-        import torch
-        agent = torch.load(model_path, map_location=device)
-        agent.set_device(device)
-    elif os.path.isdir(model_path):  # CFR model
-        from rlcard.agents import CFRAgent
-        agent = CFRAgent(env, model_path)
-        agent.load()
-    elif model_path == 'random':  # Random model
-        from rlcard.agents import RandomAgent
-        agent = RandomAgent(num_actions=env.num_actions)
-    else:  # A model in the model zoo
-        from rlcard import models
-        agent = models.load(model_path).agents[position]
-    
-    return agent
-
 def evaluate(args):
 
     # Check whether gpu is available
@@ -46,7 +29,7 @@ def evaluate(args):
     # Load models
     agents = []
     for position, model_path in enumerate(args.models):
-        agents.append(load_model(model_path, env, position, device))
+        agents.append(load_agent(model_path, env, position, device))
     env.set_agents(agents)
 
     # Evaluate
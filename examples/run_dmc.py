@@ -21,8 +21,19 @@ def train(args):
         xpid=args.xpid,
         savedir=args.savedir,
         save_interval=args.save_interval,
+        keep_checkpoints=args.keep_checkpoints,
         num_actor_devices=args.num_actor_devices,
         num_actors=args.num_actors,
+        num_envs_per_actor=args.num_envs_per_actor,
+        net_type=args.net_type,
+        pack_bits=args.pack_bits,
+        metrics_interval=args.metrics_interval,
+        metrics_format=args.metrics_format,
+        metrics_max_bytes=args.metrics_max_bytes,
+        learner_processes=args.learner_processes,
+        listen_address=args.listen,
+        eval_opponents=args.eval_opponents,
+        eval_interval=args.eval_interval,
         training_device=args.training_device,
     )
 
@@ -72,6 +83,12 @@ if __name__ == '__main__':
         type=int,
         help='Time interval (in minutes) at which to save the model',
     )
+    parser.add_argument(
+        '--keep_checkpoints',
+        default=None,
+        type=int,
+        help='The number of most recent evaluation weights to keep, all by default',
+    )
     parser.add_argument(
         '--num_actor_devices',
         default=1,
@@ -84,6 +101,65 @@ if __name__ == '__main__':
         type=int,
         help='The number of actors for each simulation device',
     )
+    parser.add_argument(
+        '--num_envs_per_actor',
+        default=1,
+        type=int,
+        help='The number of environments driven by each actor',
+    )
+    parser.add_argument(
+        '--net_type',
+        default='mlp',
+        choices=['mlp', 'factored'],
+        help='The DMC network architecture',
+    )
+    parser.add_argument(
+        '--pack_bits',
+        action='store_true',
+        help='Store the binary features in the shared buffers with eight features per byte',
+    )
+    parser.add_argument(
+        '--metrics_interval',
+        default=10.0,
+        type=float,
+        help='Time interval (in seconds) at which to save the throughput and latency metrics',
+    )
+    parser.add_argument(
+        '--metrics_format',
+        default='jsonl',
+        choices=['jsonl', 'csv'],
+        help='The format of the metrics file',
+    )
+    parser.add_argument(
+        '--metrics_max_bytes',
+        default=10 * 2 ** 20,
+        type=int,
+        help='Size (in bytes) at which the metrics file is rolled over',
+    )
+    parser.add_argument(
+        '--learner_processes',
+        action='store_true',
+        help='Train every position in its own process',
+    )
+    parser.add_argument(
+        '--listen',
+        default=None,
+        type=str,
+        help='Accept rollouts from remote actors on host:port or unix:<path>',
+    )
+    parser.add_argument(
+        '--eval_opponents',
+        nargs='+',
+        default=None,
+        help='Evaluate the first position in a separate process against these models, '
+             'such as random or doudizhu-rule-v1',
+    )
+    parser.add_argument(
+        '--eval_interval',
+        default=300,
+        type=float,
+        help='Time interval (in seconds) at which to check for new weights to evaluate',
+    )
     parser.add_argument(
         '--training_device',
         default="0",
@@ -0,0 +1,71 @@
+''' An example of running Deep Monte-Carlo (DMC) actors on another host. The
+    actors send their rollouts to a trainer started with `run_dmc.py --listen`
+'''
+import argparse
+
+from torch import multiprocessing as mp
+
+import rlcard
+from rlcard.agents.dmc_agent.transport import act_remote
+
+def run(args):
+
+    # Make the environment
+    env = rlcard.make(args.env)
+
+    # Start the actors
+    ctx = mp.get_context('spawn')
+    actors = []
+    for i in range(args.num_actors):
+        actor = ctx.Process(
+            target=act_remote,
+            args=(args.actor_offset + i, args.address, env, args.num_envs_per_actor))
+        actor.start()
+        actors.append(actor)
+    for actor in actors:
+        actor.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Remote DMC actors in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='leduc-holdem',
+        choices=[
+            'blackjack',
+            'leduc-holdem',
+            'limit-holdem',
+            'doudizhu',
+            'mahjong',
+            'no-limit-holdem',
+            'uno',
+            'gin-rummy'
+        ],
+    )
+    parser.add_argument(
+        '--address',
+        type=str,
+        required=True,
+        help='The host:port or unix:<path> the trainer listens on',
+    )
+    parser.add_argument(
+        '--num_actors',
+        default=5,
+        type=int,
+        help='The number of actors',
+    )
+    parser.add_argument(
+        '--actor_offset',
+        default=0,
+        type=int,
+        help='Added to the actor indices, which seed the environments',
+    )
+    parser.add_argument(
+        '--num_envs_per_actor',
+        default=1,
+        type=int,
+        help='The number of environments driven by each actor',
+    )
+
+    args = parser.parse_args()
+    run(args)
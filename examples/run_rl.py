@@ -14,6 +14,7 @@ from rlcard.utils import (
     reorganize,
     Logger,
     plot_curve,
+    EvaluationWorker,
 )
 
 def train(args):
@@ -32,46 +33,100 @@ def train(args):
         }
     )
 
-    # Initialize the agent and use random agents as opponents
-    if args.algorithm == 'dqn':
-        from rlcard.agents import DQNAgent
-        if args.load_checkpoint_path != "":
-            agent = DQNAgent.from_checkpoint(checkpoint=torch.load(args.load_checkpoint_path))
-        else:
-            agent = DQNAgent(
+    def make_agent(state_shape, save_path):
+        if args.algorithm == 'dqn':
+            from rlcard.agents import DQNAgent
+            return DQNAgent(
                 num_actions=env.num_actions,
-                state_shape=env.state_shape[0],
+                state_shape=state_shape,
                 mlp_layers=[64,64],
                 device=device,
-                save_path=args.log_dir,
+                save_path=save_path,
                 save_every=args.save_every
             )
-
-    elif args.algorithm == 'nfsp':
-        from rlcard.agents import NFSPAgent
-        if args.load_checkpoint_path != "":
-            agent = NFSPAgent.from_checkpoint(checkpoint=torch.load(args.load_checkpoint_path))
-        else:
-            agent = NFSPAgent(
+        elif args.algorithm == 'nfsp':
+            from rlcard.agents import NFSPAgent
+            return NFSPAgent(
                 num_actions=env.num_actions,
-                state_shape=env.state_shape[0],
+                state_shape=state_shape,
                 hidden_layers_sizes=[64,64],
                 q_mlp_layers=[64,64],
                 device=device,
-                save_path=args.log_dir,
+                save_path=save_path,
                 save_every=args.save_every
             )
-    agents = [agent]
+
+    # Initialize the agent and use random agents as opponents
+    if args.load_checkpoint_path != "":
+        if args.algorithm == 'dqn':
+            from rlcard.agents import DQNAgent
+            agent = DQNAgent.from_checkpoint(checkpoint=torch.load(args.load_checkpoint_path))
+        elif args.algorithm == 'nfsp':
+            from rlcard.agents import NFSPAgent
+            agent = NFSPAgent.from_checkpoint(checkpoint=torch.load(args.load_checkpoint_path))
+    else:
+        agent = make_agent(env.state_shape[0], args.log_dir)
+
+    # In self-play mode, the agent controls every seat so that the
+    # experience of all the players can be fed into its memory. Seats
+    # observing states of another shape, such as the landlord and the
+    # peasants of Doudizhu, are controlled by another agent shared by the
+    # seats of that shape, which saves its checkpoints in player_<id>/.
+    # Evaluation is always done with the first agent against random agents.
+    eval_agents = [agent]
     for _ in range(1, env.num_players):
-        agents.append(RandomAgent(num_actions=env.num_actions))
+        eval_agents.append(RandomAgent(num_actions=env.num_actions))
+    if args.self_play:
+        shape_agents = {tuple(env.state_shape[0]): agent}
+        agents = []
+        for player_id, state_shape in enumerate(env.state_shape):
+            if tuple(state_shape) not in shape_agents:
+                save_path = os.path.join(args.log_dir, 'player_%d' % player_id)
+                os.makedirs(save_path, exist_ok=True)
+                shape_agents[tuple(state_shape)] = make_agent(state_shape, save_path)
+            agents.append(shape_agents[tuple(state_shape)])
+        eval_env = rlcard.make(
+            args.env,
+            config={
+                'seed': args.seed,
+            }
+        )
+        eval_env.set_agents(eval_agents)
+    else:
+        agents = eval_agents
+        eval_env = env
+    # The distinct agents that learn
+    learning_agents = []
+    for learning_agent in (agents if args.self_play else agents[:1]):
+        if learning_agent not in learning_agents:
+            learning_agents.append(learning_agent)
     env.set_agents(agents)
 
+    # Evaluate the saved checkpoints in a separate process instead of
+    # pausing the training
+    evaluator = None
+    if args.eval_in_background:
+        if args.save_every <= 0:
+            raise ValueError('--eval_in_background needs checkpoints, set --save_every')
+        os.makedirs(args.log_dir, exist_ok=True)
+        evaluator = EvaluationWorker(
+            args.env,
+            os.path.join(args.log_dir, 'checkpoint_*.pt'),
+            ['random' for _ in range(1, env.num_players)],
+            os.path.join(args.log_dir, 'evaluation.jsonl'),
+            num_games=args.num_eval_games,
+            interval=args.eval_interval,
+            seed=args.seed,
+        )
+        evaluator.start()
+
     # Start training
     with Logger(args.log_dir) as logger:
         for episode in range(args.num_episodes):
 
             if args.algorithm == 'nfsp':
-                agents[0].sample_episode_policy()
+                for learning_agent in learning_agents:
+                    learning_agent.sample_episode_policy()
 
             # Generate data from the environment
             trajectories, payoffs = env.run(is_training=True)
@@ -81,16 +136,19 @@ def train(args):
 
             # Feed transitions into agent memory, and train the agent
             # Here, we assume that DQN always plays the first position
-            # and the other players play randomly (if any)
-            for ts in trajectories[0]:
-                agent.feed(ts)
+            # and the other players play randomly (if any). In self-play
+            # mode, the transitions of every seat are fed to its agent.
+            feed_trajectories = trajectories if args.self_play else trajectories[:1]
+            for player_id, trajectory in enumerate(feed_trajectories):
+                for ts in trajectory:
+                    agents[player_id].feed(ts)
 
             # Evaluate the performance. Play with random agents.
-            if episode % args.evaluate_every == 0:
+            if evaluator is None and episode % args.evaluate_every == 0:
                 logger.log_performance(
                     episode,
                     tournament(
-                        env,
+                        eval_env,
                         args.num_eval_games,
                     )[0]
                 )
@@ -105,6 +163,15 @@ def train(args):
     save_path = os.path.join(args.log_dir, 'model.pth')
     torch.save(agent, save_path)
     print('Model saved in', save_path)
+    for learning_agent in learning_agents[1:]:
+        save_path = os.path.join(learning_agent.save_path, 'model.pth')
+        torch.save(learning_agent, save_path)
+        print('Model saved in', save_path)
+
+    if evaluator is not None:
+        agent.save_checkpoint(args.log_dir)
+        evaluator.stop()
+        print('Evaluation results saved in', os.path.join(args.log_dir, 'evaluation.jsonl'))
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser("DQN/NFSP example in RLCard")
@@ -133,6 +200,11 @@ if __name__ == '__main__':
             'nfsp',
         ],
     )
+    parser.add_argument(
+        '--self_play',
+        action='store_true',
+        help='Let the agent control every seat and learn from all of them',
+    )
     parser.add_argument(
         '--cuda',
         type=str,
@@ -158,6 +230,17 @@ if __name__ == '__main__':
         type=int,
         default=100,
     )
+    parser.add_argument(
+        '--eval_in_background',
+        action='store_true',
+        help='Evaluate the saved checkpoints in a separate process',
+    )
+    parser.add_argument(
+        '--eval_interval',
+        type=float,
+        default=60,
+        help='Time interval (in seconds) at which to check for a new checkpoint to evaluate',
+    )
     parser.add_argument(
         '--log_dir',
         type=str,
@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+import traceback
+
+import torch
+
+from .utils import log
+
+def to_cpu(obj):
+    """Copy every tensor of a (nested) state dict to the CPU, so that the
+    snapshot no longer changes while the learner keeps training.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: to_cpu(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_cpu(value) for value in obj)
+    return obj
+
+def save_atomic(obj, path):
+    """Save `obj` to a temporary file next to `path` and rename it, so that
+    `path` always holds either the previous or the new complete file.
+    """
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+class CheckpointWriter:
+    """Write checkpoint snapshots to disk in a background thread.
+
+    A snapshot is a list of `(path, obj)` files, which are saved atomically
+    in order. At most one snapshot waits to be written: submitting another
+    one replaces it. With `keep`, only the evaluation files of the `keep`
+    most recent snapshots are retained and older ones are deleted.
+    """
+    def __init__(self, keep=None):
+        self.keep = keep
+        self._retained = []
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, files, prunable=()):
+        """Queue a snapshot for writing without blocking
+
+        Args:
+            files (list): A list of (path, obj) to save
+            prunable (list): The paths of `files` that may be deleted once
+              more than `keep` newer snapshots have been written
+        """
+        job = (files, list(prunable))
+        while True:
+            try:
+                self._queue.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    log.warning('Checkpoint writer is busy, dropping an unwritten snapshot')
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            files, prunable = job
+            try:
+                for path, obj in files:
+                    save_atomic(obj, path)
+                self._prune(prunable)
+            except Exception:
+                log.error('Failed to write checkpoint')
+                traceback.print_exc()
+
+    def _prune(self, prunable):
+        if self.keep is None:
+            return
+        self._retained.append(prunable)
+        while len(self._retained) > self.keep:
+            for path in self._retained.pop(0):
+                # A newer snapshot may have rewritten the same path
+                if any(path in paths for paths in self._retained):
+                    continue
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        """Write the pending snapshot and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
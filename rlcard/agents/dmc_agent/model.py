@@ -13,11 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Optional
+
 import numpy as np
 
 import torch
 from torch import nn
 
+def _mlp(layer_dims):
+    fc = []
+    for i in range(len(layer_dims)-1):
+        fc.append(nn.Linear(layer_dims[i], layer_dims[i+1]))
+        fc.append(nn.ReLU())
+    return fc
+
 class DMCNet(nn.Module):
     def __init__(
         self,
@@ -26,35 +35,104 @@ class DMCNet(nn.Module):
         mlp_layers=[512,512,512,512,512]
     ):
         super().__init__()
-        input_dim = np.prod(state_shape) + np.prod(action_shape)
+        input_dim = int(np.prod(state_shape) + np.prod(action_shape))
         layer_dims = [input_dim] + mlp_layers
-        fc = []
-        for i in range(len(layer_dims)-1):
-            fc.append(nn.Linear(layer_dims[i], layer_dims[i+1]))
-            fc.append(nn.ReLU())
+        fc = _mlp(layer_dims)
         fc.append(nn.Linear(layer_dims[-1], 1))
         self.fc_layers = nn.Sequential(*fc)
 
-    def forward(self, obs, actions):
+    def forward(self, obs, actions, obs_index: Optional[torch.Tensor] = None):
+        """Predict the values of (observation, action) pairs. If `obs_index`
+        is given, `obs` holds the distinct observations and row `i` of
+        `actions` is paired with `obs[obs_index[i]]`.
+        """
         obs = torch.flatten(obs, 1)
+        if obs_index is not None:
+            obs = obs[obs_index]
         actions = torch.flatten(actions, 1)
         x = torch.cat((obs, actions), dim=1)
         values = self.fc_layers(x).flatten()
         return values
 
+class DMCFactoredNet(nn.Module):
+    """A DMC network that embeds the observation and the action separately
+    and combines them in a late fusion head. When the legal actions of one
+    observation are evaluated, the observation is only encoded once.
+    """
+    def __init__(
+        self,
+        state_shape,
+        action_shape,
+        obs_layers=[512,512,512],
+        action_layers=[256],
+        head_layers=[256,256]
+    ):
+        super().__init__()
+        obs_dims = [int(np.prod(state_shape))] + obs_layers
+        action_dims = [int(np.prod(action_shape))] + action_layers
+        head_dims = [obs_dims[-1] + action_dims[-1]] + head_layers
+        self.obs_layers = nn.Sequential(*_mlp(obs_dims))
+        self.action_layers = nn.Sequential(*_mlp(action_dims))
+        head = _mlp(head_dims)
+        head.append(nn.Linear(head_dims[-1], 1))
+        self.head_layers = nn.Sequential(*head)
+
+    def forward(self, obs, actions, obs_index: Optional[torch.Tensor] = None):
+        """Predict the values of (observation, action) pairs. If `obs_index`
+        is given, `obs` holds the distinct observations and row `i` of
+        `actions` is paired with `obs[obs_index[i]]`.
+        """
+        obs_embedding = self.obs_layers(torch.flatten(obs, 1))
+        if obs_index is not None:
+            obs_embedding = obs_embedding[obs_index]
+        action_embedding = self.action_layers(torch.flatten(actions, 1))
+        x = torch.cat((obs_embedding, action_embedding), dim=1)
+        values = self.head_layers(x).flatten()
+        return values
+
+
 class DMCAgent:
+    """The agent of one position, which predicts the value of every legal
+    action with a DMCNet (`net_type` `mlp`) or a DMCFactoredNet (`factored`).
+
+    With `mlp`, `mlp_layers` are the hidden layers on the concatenated
+    observation and action, [512,512,512,512,512] by default. With
+    `factored`, they are the layers of the observation encoder,
+    [512,512,512] by default. The action encoder then has one layer and
+    the fusion head two layers, of half the width of the last one.
+    """
     def __init__(
         self,
         state_shape,
         action_shape,
-        mlp_layers=[512,512,512,512,512],
+        mlp_layers=None,
         exp_epsilon=0.01,
         device="0",
+        net_type='mlp',
     ):
         self.use_raw = False
         self.device = 'cuda:'+device if device != "cpu" else "cpu"
-        self.net = DMCNet(state_shape, action_shape, mlp_layers).to(self.device)
+        if net_type == 'mlp':
+            if mlp_layers is None:
+                mlp_layers = [512,512,512,512,512]
+            self.net = DMCNet(state_shape, action_shape, mlp_layers).to(self.device)
+        elif net_type == 'factored':
+            if mlp_layers is None:
+                mlp_layers = [512,512,512]
+            width = max(mlp_layers[-1] // 2, 1)
+            self.net = DMCFactoredNet(
+                state_shape,
+                action_shape,
+                obs_layers=mlp_layers,
+                action_layers=[width],
+                head_layers=[width, width],
+            ).to(self.device)
+        else:
+            raise ValueError("'net_type' should be either 'mlp' or 'factored'.")
+        self.net_type = net_type
+        self.mlp_layers = mlp_layers
         self.exp_epsilon = exp_epsilon
+        self.state_shape = state_shape
         self.action_shape = action_shape
 
     def step(self, state):
@@ -90,7 +168,64 @@ class DMCAgent:
 
     def predict(self, state):
         # Prepare obs and actions
-        obs = state['obs'].astype(np.float32)
+        obs = state['obs'].astype(np.float32)[np.newaxis, :]
+        action_keys, action_values = self._get_action_values(state)
+        obs_index = torch.zeros(len(action_keys), dtype=torch.long, device=self.device)
+
+        # Predict Q values
+        values = self.net.forward(torch.from_numpy(obs).to(self.device),
+                                  torch.from_numpy(action_values).to(self.device),
+                                  obs_index)
+
+        return action_keys, values.cpu().detach().numpy()
+
+    def batch_predict(self, states):
+        ''' Predict the Q values of several states with one forward pass
+
+        Args:
+            states (list): A list of states
+
+        Returns:
+            (list): A list of (action_keys, values) tuples, one for each state
+        '''
+        action_keys, action_values = [], []
+        for state in states:
+            _action_keys, _action_values = self._get_action_values(state)
+            action_keys.append(_action_keys)
+            action_values.append(_action_values)
+        obs = np.stack([state['obs'] for state in states]).astype(np.float32)
+        action_values = np.concatenate(action_values)
+        counts = [len(_action_keys) for _action_keys in action_keys]
+        obs_index = np.repeat(np.arange(len(states)), counts)
+
+        with torch.no_grad():
+            values = self.net.forward(torch.from_numpy(obs).to(self.device),
+                                      torch.from_numpy(action_values).to(self.device),
+                                      torch.from_numpy(obs_index).to(self.device))
+        values = values.cpu().numpy()
+
+        splits = np.cumsum(counts)[:-1]
+        return list(zip(action_keys, np.split(values, splits)))
+
+    def batch_step(self, states):
+        ''' Choose the actions of several states with one forward pass
+
+        Args:
+            states (list): A list of states
+
+        Returns:
+            (list): A list of action ids
+        '''
+        actions = []
+        for action_keys, values in self.batch_predict(states):
+            if self.exp_epsilon > 0 and np.random.rand() < self.exp_epsilon:
+                action = np.random.choice(action_keys)
+            else:
+                action = action_keys[np.argmax(values)]
+            actions.append(action)
+        return actions
+
+    def _get_action_values(self, state):
         legal_actions = state['legal_actions']
         action_keys = np.array(list(legal_actions.keys()))
         action_values = list(legal_actions.values())
@@ -100,14 +235,7 @@ class DMCAgent:
                 action_values[i] = np.zeros(self.action_shape[0])
                 action_values[i][action_keys[i]] = 1
         action_values = np.array(action_values, dtype=np.float32)
-
-        obs = np.repeat(obs[np.newaxis, :], len(action_keys), axis=0)
-
-        # Predict Q values
-        values = self.net.forward(torch.from_numpy(obs).to(self.device),
-                                  torch.from_numpy(action_values).to(self.device))
-
-        return action_keys, values.cpu().detach().numpy()
+        return action_keys, action_values
 
     def forward(self, obs, actions):
         return self.net.forward(obs, actions)
@@ -120,16 +248,52 @@ class DMCAgent:
 
     def set_device(self, device):
         self.device = device
+        self.net.to(device)
+
+    def checkpoint_attributes(self):
+        ''' Return the attributes needed to restore the agent for evaluation.
+            Only the weights are saved, not the pickled agent
+        '''
+        return {
+            'agent_type': type(self).__name__,
+            'state_shape': self.state_shape,
+            'action_shape': self.action_shape,
+            'mlp_layers': self.mlp_layers,
+            'exp_epsilon': self.exp_epsilon,
+            'net_type': self.net_type,
+            'net': self.net.state_dict(),
+        }
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint, device="cpu"):
+        ''' Restore an agent from a checkpoint
+
+        Args:
+            checkpoint (dict): the checkpoint attributes generated by checkpoint_attributes()
+            device (str): the index of the GPU, or `cpu`
+        '''
+        agent = cls(
+            checkpoint['state_shape'],
+            checkpoint['action_shape'],
+            mlp_layers=checkpoint['mlp_layers'],
+            exp_epsilon=checkpoint['exp_epsilon'],
+            device=device,
+            net_type=checkpoint['net_type'],
+        )
+        agent.load_state_dict(checkpoint['net'])
+        return agent
 
 class DMCModel:
     def __init__(
         self,
         state_shape,
         action_shape,
-        mlp_layers=[512,512,512,512,512],
+        mlp_layers=None,
         exp_epsilon=0.01,
-        device=0
+        device=0,
+        net_type='mlp',
     ):
+        self.net_type = net_type
         self.agents = []
         for player_id in range(len(state_shape)):
             agent = DMCAgent(
@@ -138,6 +302,7 @@ class DMCModel:
                 mlp_layers,
                 exp_epsilon,
                 device,
+                net_type,
             )
             self.agents.append(agent)
 
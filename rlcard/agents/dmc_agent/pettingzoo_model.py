@@ -23,9 +23,10 @@ class DMCModelPettingZoo:
     def __init__(
         self,
         env,
-        mlp_layers=[512,512,512,512,512],
+        mlp_layers=None,
         exp_epsilon=0.01,
-        device="0"
+        device="0",
+        net_type='mlp',
     ):
         self.agents = OrderedDict()
         for agent_name in env.agents:
@@ -35,6 +36,7 @@ class DMCModelPettingZoo:
                 mlp_layers,
                 exp_epsilon,
                 device,
+                net_type,
             )
             self.agents[agent_name] = agent
 
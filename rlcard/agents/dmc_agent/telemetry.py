@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import threading
+import time
+import timeit
+import traceback
+
+import torch
+
+from .utils import log
+
+class ActorStats:
+    """Shared counters that the actors of one device update for telemetry.
+
+    Every actor only writes its own row, so the counters need no lock
+    across processes. A row holds the number of frames, then for every
+    position the number of buffers taken from the free queue, the number
+    of buffers put into the full queue and the parameter version in use.
+    """
+    def __init__(self, num_actors, num_players):
+        self.num_players = num_players
+        self.counters = torch.zeros(num_actors, 1 + 3 * num_players, dtype=torch.int64).share_memory_()
+
+    def add_frames(self, i, n):
+        self.counters[i, 0] += n
+
+    def took_free(self, i, position):
+        self.counters[i, 1 + position] += 1
+
+    def put_full(self, i, position):
+        self.counters[i, 1 + self.num_players + position] += 1
+
+    def set_versions(self, i, versions):
+        self.counters[i, 1 + 2 * self.num_players:] = torch.tensor(versions, dtype=torch.int64)
+
+    def frames(self):
+        return self.counters[:, 0].clone()
+
+    def num_taken(self):
+        return self.counters[:, 1:1 + self.num_players].sum(0)
+
+    def num_put(self):
+        return self.counters[:, 1 + self.num_players:1 + 2 * self.num_players].sum(0)
+
+    def versions(self):
+        return self.counters[:, 1 + 2 * self.num_players:].clone()
+
+class Telemetry:
+    """Collect the throughput of the actors and the learner, the depths of
+    the buffer queues, the latency of the learner steps and the lag of the
+    actor parameters, and append a flat record of them to a metrics file
+    every `interval` seconds from a background thread. Once the file
+    reaches `max_bytes`, it is rolled over to `path.1`, `path.2` and so on,
+    and only the `backup_count` most recent files are kept.
+
+    Args:
+        path (str): The metrics file. Records are JSON lines, or CSV rows
+            if `fmt` is `csv`
+        actor_stats (dict): The ActorStats of every device
+        versions (dict): The published parameter versions of every device,
+            or None if the actors do not pull versioned parameters
+        num_buffers (int): The number of buffers per position and device
+        batch_size (int): The number of buffers consumed by a learner step
+        num_players (int): The number of positions
+        interval (float): Seconds between two records
+        fmt (str): `jsonl` or `csv`
+        slot_counts (dict): The shared counts of the full buffers in every
+            slot of every device and position, which the learner already
+            took out of the full queue. None to count them as queued
+        max_bytes (int): The size of the metrics file that triggers a
+            rollover, or None to never roll it over
+        backup_count (int): The number of rolled over files to keep
+    """
+    def __init__(
+        self,
+        path,
+        actor_stats,
+        versions,
+        num_buffers,
+        batch_size,
+        num_players,
+        interval=10.0,
+        fmt='jsonl',
+        slot_counts=None,
+        max_bytes=None,
+        backup_count=5,
+    ):
+        if fmt not in ('jsonl', 'csv'):
+            raise ValueError("'fmt' should be either 'jsonl' or 'csv'.")
+        self.path = path
+        self.actor_stats = actor_stats
+        self.versions = versions
+        self.num_buffers = num_buffers
+        self.batch_size = batch_size
+        self.num_players = num_players
+        self.interval = interval
+        self.fmt = fmt
+        self.slot_counts = slot_counts
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fieldnames = None
+
+        self._lock = threading.Lock()
+        self._steps = {device: [0 for _ in range(num_players)] for device in actor_stats}
+        self._window = self._empty_window()
+        self._last_frames = {device: stats.frames() for device, stats in actor_stats.items()}
+        self._last_learner_frames = 0
+        self._last_time = timeit.default_timer()
+        self._frames = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _empty_window(self):
+        return {
+            key: [0.0 for _ in range(self.num_players)]
+            for key in ('count', 'wait', 'forward_backward', 'broadcast')
+        }
+
+    def record_step(self, device, position, wait, forward_backward, broadcast, frames):
+        """Record one learner step. The times are in seconds and `frames`
+        is the total number of frames trained on so far.
+        """
+        with self._lock:
+            self._steps[device][position] += 1
+            self._window['count'][position] += 1
+            self._window['wait'][position] += wait
+            self._window['forward_backward'][position] += forward_backward
+            self._window['broadcast'][position] += broadcast
+            self._frames = frames
+
+    def collect(self):
+        """Return the metrics since the previous call as a flat dict"""
+        now = timeit.default_timer()
+        elapsed = max(now - self._last_time, 1e-9)
+        with self._lock:
+            window, self._window = self._window, self._empty_window()
+            steps = {device: list(_steps) for device, _steps in self._steps.items()}
+            frames = self._frames
+
+        record = {
+            'time': time.time(),
+            'frames': frames,
+            'learner_fps': (frames - self._last_learner_frames) / elapsed,
+        }
+        for device, stats in self.actor_stats.items():
+            actor_frames = stats.frames()
+            actor_fps = (actor_frames - self._last_frames[device]).double() / elapsed
+            self._last_frames[device] = actor_frames
+            for i, fps in enumerate(actor_fps.tolist()):
+                record['actor_fps_%s_%d' % (device, i)] = fps
+
+            # Every learner step takes `batch_size` buffers out of the full
+            # queue and gives them back to the free queue. The buffers of a
+            # slot that is not complete yet are out of the full queue too
+            num_taken, num_put = stats.num_taken(), stats.num_put()
+            for p in range(self.num_players):
+                consumed = steps[device][p] * self.batch_size
+                filling = 0 if self.slot_counts is None else int(sum(self.slot_counts[device][p]))
+                record['free_queue_%s_%d' % (device, p)] = self.num_buffers + consumed - int(num_taken[p])
+                record['full_queue_%s_%d' % (device, p)] = int(num_put[p]) - consumed - filling
+
+            # Versions grow by two for every published snapshot
+            if self.versions is not None:
+                published = self.versions[device].clone()
+                lag = (published.unsqueeze(0) - stats.versions()).double() / 2
+                for p in range(self.num_players):
+                    record['version_lag_%s_%d' % (device, p)] = lag[:, p].mean().item()
+                    record['max_version_lag_%s_%d' % (device, p)] = lag[:, p].max().item()
+
+        for p in range(self.num_players):
+            count = max(window['count'][p], 1)
+            for key in ('wait', 'forward_backward', 'broadcast'):
+                record['%s_ms_%d' % (key, p)] = 1000 * window[key][p] / count
+
+        self._last_learner_frames = frames
+        self._last_time = now
+        return record
+
+    def rollover(self):
+        """Shift `path` to `path.1`, `path.1` to `path.2` and so on, and
+        drop the oldest file beyond `backup_count`.
+        """
+        for i in range(self.backup_count - 1, 0, -1):
+            src = '%s.%d' % (self.path, i)
+            if os.path.exists(src):
+                os.replace(src, '%s.%d' % (self.path, i + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+        # A new CSV file needs its own header
+        self.fieldnames = None
+
+    def write(self, record):
+        if self.max_bytes is not None and os.path.exists(self.path) \
+                and os.path.getsize(self.path) >= self.max_bytes:
+            self.rollover()
+        if self.fmt == 'jsonl':
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+            return
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+            write_header = not os.path.exists(self.path)
+            with open(self.path, 'a') as f:
+                if write_header:
+                    csv.writer(f).writerow(self.fieldnames)
+        with open(self.path, 'a') as f:
+            csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore').writerow(record)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write(self.collect())
+            except Exception:
+                log.error('Failed to write metrics')
+                traceback.print_exc()
+
+    def start(self):
+        log.info('Saving metrics to %s', self.path)
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Write a last record and stop the background thread."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.write(self.collect())
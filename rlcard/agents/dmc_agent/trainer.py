@@ -13,26 +13,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import os
+import queue
 import threading
 import time
 import timeit
 import pprint
+import traceback
 from collections import deque
 
 import torch
 from torch import multiprocessing as mp
 from torch import nn
 
+from .checkpoint_writer import CheckpointWriter, to_cpu
 from .file_writer import FileWriter
 from .model import DMCModel
 from .pettingzoo_model import DMCModelPettingZoo
+from .telemetry import ActorStats, Telemetry
+from .transport import RolloutServer
+from rlcard.utils.evaluation import EvaluationWorker
 from .utils import (
     get_batch,
+    release_batch,
     create_buffers,
     create_optimizers,
     act,
     log,
+    ParameterBroadcaster,
+    unpack_bits,
 )
 from .pettingzoo_utils import (
     create_buffers_pettingzoo,
@@ -45,19 +55,32 @@ def compute_loss(logits, targets):
 
 def learn(
     position,
-    actor_models,
+    broadcaster,
     agent,
     batch,
     optimizer,
     training_device,
     max_grad_norm,
     mean_episode_return_buf,
-    lock
+    lock,
+    packed=False,
+    timings=None,
 ):
-    """Performs a learning (optimization) step."""
+    """Performs a learning (optimization) step. If `timings` is given, the
+    seconds spent publishing the parameters are stored in it under
+    `broadcast`.
+    """
     device = "cuda:"+str(training_device) if training_device != "cpu" else "cpu"
-    state = torch.flatten(batch['state'].to(device), 0, 1).float()
-    action = torch.flatten(batch['action'].to(device), 0, 1).float()
+    # The features are stored as int8 (or packed bits) to keep the shared
+    # buffers small, so the batch is cast to float once, by the same copy
+    # that moves it to the training device
+    state = torch.flatten(batch['state'], 0, 1)
+    action = torch.flatten(batch['action'], 0, 1)
+    if packed:
+        state = unpack_bits(state.to(device), agent.state_shape)
+        action = unpack_bits(action.to(device), agent.action_shape)
+    state = state.to(device, torch.float32)
+    action = action.to(device, torch.float32)
     target = torch.flatten(batch['target'].to(device), 0, 1)
     episode_returns = batch['episode_return'][batch['done']]
     mean_episode_return_buf[position].append(torch.mean(episode_returns).to(device))
@@ -75,10 +98,116 @@ def learn(
         nn.utils.clip_grad_norm_(agent.parameters(), max_grad_norm)
         optimizer.step()
 
-        for actor_model in actor_models.values():
-            actor_model.get_agent(position).load_state_dict(agent.state_dict())
+        broadcast_time = broadcaster.step(position, agent)
+        if timings is not None:
+            timings['broadcast'] = broadcast_time
         return stats
 
+def learner_process(
+    position,
+    agent,
+    optimizer_state,
+    device_iterator,
+    free_queue,
+    full_queue,
+    buffers,
+    slot_counts,
+    broadcaster,
+    batch_size,
+    num_threads,
+    num_torch_threads,
+    training_device,
+    max_grad_norm,
+    packed,
+    commands,
+    results,
+    learner_frames,
+    total_frames,
+    frames_per_step,
+):
+    """Train one position in its own process. `free_queue`, `full_queue`,
+    `buffers` and `slot_counts` map every device to those of the position.
+    `learner_frames` is a shared counter of the frames trained on by all
+    positions. A learner thread adds `frames_per_step` to it before every
+    step and exits once it reaches `total_frames`.
+    The learner threads put a `('stats', position, device, stats, timings)`
+    message in `results` after every step. Every `checkpoint` or `stop`
+    command is answered with a `('checkpoint', position, snapshot)`
+    message, where the snapshot is the serialized
+    `(attributes, optimizer_state)`; after `stop` the process exits.
+    """
+    try:
+        log.info('Learner of position %i started.', position)
+        torch.set_num_threads(num_torch_threads)
+        # The hyperparameters are restored from the state of the optimizer
+        optimizer = torch.optim.RMSprop(agent.parameters())
+        optimizer.load_state_dict(optimizer_state)
+        mean_episode_return_buf = {position: deque(maxlen=100)}
+        position_lock = threading.Lock()
+        timer = timeit.default_timer
+
+        def batch_and_learn(device, local_lock, slot_counts):
+            timings = {}
+            while True:
+                with learner_frames.get_lock():
+                    if learner_frames.value >= total_frames:
+                        break
+                    learner_frames.value += frames_per_step
+                start_time = timer()
+                slot, batch = get_batch(full_queue[device], buffers[device], batch_size, local_lock, slot_counts)
+                learn_time = timer()
+                _stats = learn(
+                    position,
+                    broadcaster,
+                    agent,
+                    batch,
+                    optimizer,
+                    training_device,
+                    max_grad_norm,
+                    mean_episode_return_buf,
+                    position_lock,
+                    packed,
+                    timings,
+                )
+                release_batch(free_queue[device], slot, batch_size)
+                end_time = timer()
+                step_timings = (
+                    learn_time - start_time,
+                    end_time - learn_time - timings['broadcast'],
+                    timings['broadcast'],
+                )
+                results.put(('stats', position, device, _stats, step_timings))
+
+        for device in device_iterator:
+            local_lock = threading.Lock()
+            for i in range(num_threads):
+                thread = threading.Thread(
+                    target=batch_and_learn,
+                    name='batch-and-learn-%d' % i,
+                    args=(device, local_lock, slot_counts[device]),
+                    daemon=True,
+                )
+                thread.start()
+
+        while True:
+            command = commands.get()
+            position_lock.acquire()
+            # Serialized, so that the snapshot does not refer to shared
+            # memory of this process, which may have exited when it is read
+            snapshot = io.BytesIO()
+            torch.save((agent.checkpoint_attributes(), optimizer.state_dict()), snapshot)
+            results.put(('checkpoint', position, snapshot.getvalue()))
+            if command == 'stop':
+                # Keep the lock so that no publish is torn when the process exits
+                break
+            position_lock.release()
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        log.error('Exception in learner process %i', position)
+        traceback.print_exc()
+        raise e
 
 class DMCTrainer:    
     """
@@ -89,16 +218,50 @@ class DMCTrainer:
         load_model (boolean): Whether loading an existing model
         xpid (string): Experiment id (default: dmc)
         save_interval (int): Time interval (in minutes) at which to save the model
+        keep_checkpoints (int): Number of most recent evaluation weights to keep on disk,
+            or None to keep all of them
         num_actor_devices (int): The number devices used for simulation
         num_actors (int): Number of actors for each simulation device
+        num_envs_per_actor (int): Number of environments driven by each actor. The
+            decisions pending in all of them are evaluated in one forward pass
+        net_type (str): `mlp` for the DMCNet on concatenated observation and action,
+            or `factored` for the DMCFactoredNet that encodes the observation once.
+            The layer sizes of both are the defaults of DMCAgent
+        publish_every (int): Publish the learner parameters to the actors every N updates
+        publish_interval (float): Publish the learner parameters to the actors at least
+            every N seconds
+        pack_bits (boolean): Store the state and action features in the shared buffers
+            with eight features per byte. Only for environments whose features are binary,
+            such as Doudizhu. The learner unpacks them on the training device
+        metrics_interval (float): Seconds between two records of the throughput, queue depth,
+            learner latency and parameter lag metrics, or None to disable them
+        metrics_format (str): `jsonl` or `csv`, the format of the metrics file saved next
+            to the logs
+        metrics_max_bytes (int): Roll the metrics file over once it reaches this size,
+            keeping the five previous files, or None to let it grow
         training_device (str): The index of the GPU used for training models, or `cpu`.
         savedir (string): Root dir where experiment data will be saved
         total_frames (int): Total environment frames to train for
         exp_epsilon (float): The prbability for exploration
         batch_size (int): Learner batch size
         unroll_length (int): The unroll length (time dimension)
-        num_buffers (int): Number of shared-memory buffers
+        num_buffers (int): Number of shared-memory buffers. Rounded up to a multiple
+            of the batch size with a warning, since a batch is a contiguous slot of
+            buffers. The default 50 becomes 64 with the default batch size of 32
         num_threads (int): Number learner threads
+        learner_processes (boolean): Whether to train every position in its own process
+            instead of in threads of the main process, so that CPU training is not
+            limited by the GIL
+        learner_torch_threads (int): Number of torch threads of every learner process.
+            Defaults to the number of CPUs divided by the number of positions
+        listen_address (str): `host:port` or `unix:<path>` on which to accept rollouts from
+            remote actors started with `act_remote`, or None to only use local actors
+        eval_opponents (list): The models of the other positions, such as `random` or
+            `doudizhu-rule-v1`, against which a separate process evaluates the latest
+            weights of `eval_position`. None disables the evaluation
+        eval_position (int): The position whose weights are evaluated
+        eval_num_games (int): The number of games of every evaluation
+        eval_interval (float): Seconds between two checks for new weights to evaluate
         max_grad_norm (int): Max norm of gradients
         learning_rate (float): Learning rate
         alpha (float): RMSProp smoothing constant
@@ -113,8 +276,17 @@ class DMCTrainer:
         load_model=False,
         xpid='dmc',
         save_interval=30,
+        keep_checkpoints=None,
         num_actor_devices=1,
         num_actors=5,
+        num_envs_per_actor=1,
+        net_type='mlp',
+        publish_every=10,
+        publish_interval=5.0,
+        pack_bits=False,
+        metrics_interval=10.0,
+        metrics_format='jsonl',
+        metrics_max_bytes=10 * 2 ** 20,
         training_device="0",
         savedir='experiments/dmc_result',
         total_frames=100000000000,
@@ -123,6 +295,13 @@ class DMCTrainer:
         unroll_length=100,
         num_buffers=50,
         num_threads=4,
+        learner_processes=False,
+        learner_torch_threads=None,
+        listen_address=None,
+        eval_opponents=None,
+        eval_position=0,
+        eval_num_games=1000,
+        eval_interval=300,
         max_grad_norm=40,
         learning_rate=0.0001,
         alpha=0.99,
@@ -146,13 +325,36 @@ class DMCTrainer:
         self.load_model = load_model
         self.savedir = savedir
         self.save_interval = save_interval
+        self.keep_checkpoints = keep_checkpoints
         self.num_actor_devices = num_actor_devices
         self.num_actors = num_actors
+        self.num_envs_per_actor = num_envs_per_actor
+        self.net_type = net_type
+        self.publish_every = publish_every
+        self.publish_interval = publish_interval
+        self.pack_bits = pack_bits
+        self.metrics_interval = metrics_interval
+        self.metrics_format = metrics_format
+        self.metrics_max_bytes = metrics_max_bytes
         self.training_device = training_device
         self.total_frames = total_frames
         self.exp_epsilon = exp_epsilon
-        self.num_buffers = num_buffers
+        self.num_buffers = -(-num_buffers // batch_size) * batch_size
+        if self.num_buffers != num_buffers:
+            log.warning(
+                'num_buffers is rounded up from %d to %d, a multiple of the batch size %d',
+                num_buffers,
+                self.num_buffers,
+                batch_size,
+            )
         self.num_threads = num_threads
+        self.learner_processes = learner_processes
+        self.learner_torch_threads = learner_torch_threads
+        self.listen_address = listen_address
+        self.eval_opponents = eval_opponents
+        self.eval_position = eval_position
+        self.eval_num_games = eval_num_games
+        self.eval_interval = eval_interval
         self.max_grad_norm = max_grad_norm
         self.learning_rate =learning_rate
         self.alpha = alpha
@@ -172,15 +374,23 @@ class DMCTrainer:
                     self.action_shape,
                     exp_epsilon=self.exp_epsilon,
                     device=str(device),
+                    net_type=self.net_type,
                 )
         else:
+            if pack_bits:
+                raise ValueError("'pack_bits' is not supported for PettingZoo environments.")
+            if listen_address is not None:
+                raise ValueError("Remote actors are not supported for PettingZoo environments.")
+            if eval_opponents is not None:
+                raise ValueError("Background evaluation is not supported for PettingZoo environments.")
             self.num_players = self.env.num_agents
 
             def model_func(device):
                 return DMCModelPettingZoo(
                     self.env,
                     exp_epsilon=self.exp_epsilon,
-                    device=device
+                    device=device,
+                    net_type=self.net_type,
                 )
         self.model_func = model_func
 
@@ -209,6 +419,7 @@ class DMCTrainer:
                 self.env.state_shape,
                 self.action_shape,
                 self.device_iterator,
+                self.pack_bits,
             )
         else:
             buffers = create_buffers_pettingzoo(
@@ -255,100 +466,288 @@ class DMCTrainer:
                     self.checkpointpath,
                     map_location="cuda:"+str(self.training_device) if self.training_device != "cpu" else "cpu"
             )
+            checkpoint_net_type = checkpoint_states.get("net_type", "mlp")
+            if checkpoint_net_type != self.net_type:
+                raise ValueError(
+                    "The checkpoint uses net_type '{}' but the trainer is configured with '{}'".format(
+                        checkpoint_net_type, self.net_type))
             for p in range(self.num_players):
                 learner_model.get_agent(p).load_state_dict(checkpoint_states["model_state_dict"][p])
                 optimizers[p].load_state_dict(checkpoint_states["optimizer_state_dict"][p])
-                for device in self.device_iterator:
-                    models[device].get_agent(p).load_state_dict(learner_model.get_agent(p).state_dict())
             stats = checkpoint_states["stats"]
             frames = checkpoint_states["frames"]
             log.info(f"Resuming preempted job, current stats:\n{stats}")
 
+        # Publish the initial parameters of the learner to the actors
+        broadcaster = ParameterBroadcaster(
+            models,
+            self.num_players,
+            self.publish_every,
+            self.publish_interval,
+        )
+        for p in range(self.num_players):
+            broadcaster.publish(p, learner_model.get_agent(p))
+
+        # Telemetry of the actors and the learner
+        # The rollouts of remote actors are counted in one extra row
+        server_device = list(self.device_iterator)[0]
+        actor_stats = {
+            device: ActorStats(
+                self.num_actors + int(self.listen_address is not None and device == server_device),
+                self.num_players,
+            )
+            for device in self.device_iterator
+        }
+        # Number of full buffers in each slot of batch_size buffers. They are
+        # shared with the learner processes and read by the telemetry
+        num_slots = self.num_buffers // self.B
+        slot_counts = {
+            device: torch.zeros(self.num_players, num_slots, dtype=torch.int64).share_memory_()
+            for device in self.device_iterator
+        }
+
+        telemetry = None
+        if self.metrics_interval is not None:
+            telemetry = Telemetry(
+                os.path.join(self.plogger.basepath, 'metrics.' + self.metrics_format),
+                actor_stats,
+                None if self.is_pettingzoo_env else broadcaster.versions,
+                self.num_buffers,
+                self.B,
+                self.num_players,
+                self.metrics_interval,
+                self.metrics_format,
+                slot_counts,
+                self.metrics_max_bytes,
+            )
+
+        # Evaluate the saved weights in a separate process. The results go
+        # to the JSON lines metrics file, or to their own file
+        evaluator = None
+        if self.eval_opponents is not None:
+            if self.metrics_format == 'jsonl':
+                eval_log_path = os.path.join(self.plogger.basepath, 'metrics.jsonl')
+            else:
+                eval_log_path = os.path.join(self.plogger.basepath, 'evaluation.jsonl')
+            evaluator = EvaluationWorker(
+                self.env.name,
+                os.path.join(self.plogger.basepath, '%d_*.pth' % self.eval_position),
+                self.eval_opponents,
+                eval_log_path,
+                position=self.eval_position,
+                num_games=self.eval_num_games,
+                interval=self.eval_interval,
+            )
+            evaluator.start()
+
+        # Accept rollouts from remote actors into the buffers of the first device
+        server = None
+        if self.listen_address is not None:
+            server = RolloutServer(
+                self.listen_address,
+                self.T,
+                buffers[server_device],
+                free_queue[server_device],
+                full_queue[server_device],
+                models[server_device],
+                broadcaster.versions[server_device],
+                dict(net_type=self.net_type, exp_epsilon=self.exp_epsilon, packed=self.pack_bits),
+                actor_stats[server_device],
+                self.num_actors,
+            )
+            server.start()
 
         # Starting actor processes
         for device in self.device_iterator:
             num_actors = self.num_actors
             for i in range(self.num_actors):
-                actor = ctx.Process(
-                    target=act_pettingzoo if self.is_pettingzoo_env else act,
-                    args=(i, device, self.T, free_queue[device], full_queue[device], models[device], buffers[device], self.env))
+                if self.is_pettingzoo_env:
+                    actor = ctx.Process(
+                        target=act_pettingzoo,
+                        args=(i, device, self.T, free_queue[device], full_queue[device], models[device], buffers[device], self.env, actor_stats[device]))
+                else:
+                    actor = ctx.Process(
+                        target=act,
+                        args=(i, device, self.T, free_queue[device], full_queue[device], models[device], buffers[device], self.env, self.num_envs_per_actor, broadcaster.versions[device], self.pack_bits, actor_stats[device]))
                 actor.start()
                 actor_processes.append(actor)
 
-        def batch_and_learn(i, device, position, local_lock, position_lock, lock=threading.Lock()):
-            """Thread target for the learning process."""
+        def record(device, position, _stats, wait, forward_backward, broadcast, lock=threading.Lock()):
+            """Log the stats of one learner step."""
             nonlocal frames, stats
+            with lock:
+                for k in _stats:
+                    stats[k] = _stats[k]
+                to_log = dict(frames=frames)
+                to_log.update({k: stats[k] for k in stat_keys})
+                self.plogger.log(to_log)
+                frames += self.T * self.B
+                if telemetry is not None:
+                    telemetry.record_step(device, position, wait, forward_backward, broadcast, frames)
+
+        def batch_and_learn(i, device, position, local_lock, position_lock):
+            """Thread target for the learning process."""
+            timer = timeit.default_timer
+            timings = {}
             while frames < self.total_frames:
-                batch = get_batch(
-                    free_queue[device][position],
+                start_time = timer()
+                slot, batch = get_batch(
                     full_queue[device][position],
                     buffers[device][position],
                     self.B,
-                    local_lock
+                    local_lock,
+                    slot_counts[device][position],
                 )
+                learn_time = timer()
                 _stats = learn(
                     position,
-                    models,
+                    broadcaster,
                     learner_model.get_agent(position),
                     batch,
                     optimizers[position],
                     self.training_device,
                     self.max_grad_norm,
                     self.mean_episode_return_buf,
-                    position_lock
+                    position_lock,
+                    self.pack_bits,
+                    timings,
+                )
+                release_batch(free_queue[device][position], slot, self.B)
+                end_time = timer()
+                record(
+                    device,
+                    position,
+                    _stats,
+                    learn_time - start_time,
+                    end_time - learn_time - timings['broadcast'],
+                    timings['broadcast'],
                 )
-
-                with lock:
-                    for k in _stats:
-                        stats[k] = _stats[k]
-                    to_log = dict(frames=frames)
-                    to_log.update({k: stats[k] for k in stat_keys})
-                    self.plogger.log(to_log)
-                    frames += self.T * self.B
 
         for device in self.device_iterator:
             for m in range(self.num_buffers):
                 for p in range(self.num_players):
                     free_queue[device][p].put(m)
 
+        if telemetry is not None:
+            telemetry.start()
+
         threads = []
         locks = {device: [threading.Lock() for _ in range(self.num_players)] for device in self.device_iterator}
         position_locks = [threading.Lock() for _ in range(self.num_players)]
 
-        for device in self.device_iterator:
-            for i in range(self.num_threads):
+        if not self.learner_processes:
+            for device in self.device_iterator:
+                for i in range(self.num_threads):
+                    for position in range(self.num_players):
+                        thread = threading.Thread(
+                            target=batch_and_learn,
+                            name='batch-and-learn-%d' % i,
+                            args=(
+                                i,
+                                device,
+                                position,
+                                locks[device][position],
+                                position_locks[position])
+                            )
+                        thread.start()
+                        threads.append(thread)
+        else:
+            # Every position is trained by its own process, which sends its
+            # stats and checkpoint snapshots back through `results`
+            num_torch_threads = self.learner_torch_threads or max(1, os.cpu_count() // self.num_players)
+            commands = [ctx.SimpleQueue() for _ in range(self.num_players)]
+            results = ctx.SimpleQueue()
+            learner_frames = ctx.Value('q', frames)
+            snapshots = queue.Queue()
+            learners = []
+            for position in range(self.num_players):
+                learner = ctx.Process(
+                    target=learner_process,
+                    args=(
+                        position,
+                        learner_model.get_agent(position),
+                        optimizers[position].state_dict(),
+                        list(self.device_iterator),
+                        {device: free_queue[device][position] for device in self.device_iterator},
+                        {device: full_queue[device][position] for device in self.device_iterator},
+                        {device: buffers[device][position] for device in self.device_iterator},
+                        {device: slot_counts[device][position] for device in self.device_iterator},
+                        broadcaster,
+                        self.B,
+                        self.num_threads,
+                        num_torch_threads,
+                        self.training_device,
+                        self.max_grad_norm,
+                        self.pack_bits,
+                        commands[position],
+                        results,
+                        learner_frames,
+                        self.total_frames,
+                        self.T * self.B,
+                    ))
+                learner.start()
+                learners.append(learner)
+
+            def collect_results():
+                while True:
+                    message = results.get()
+                    if message[0] == 'stats':
+                        _, position, device, _stats, step_timings = message
+                        record(device, position, _stats, *step_timings)
+                    else:
+                        snapshots.put(message[1:])
+
+            threading.Thread(target=collect_results, name='collect-results', daemon=True).start()
+
+        checkpoint_writer = CheckpointWriter(self.keep_checkpoints)
+
+        def snapshot(stop=False):
+            """Return the CPU snapshots of the attributes and the optimizer
+            state of every position. With learner processes, `stop` asks
+            them to exit after their snapshot.
+            """
+            if self.learner_processes:
                 for position in range(self.num_players):
-                    thread = threading.Thread(
-                        target=batch_and_learn,
-                        name='batch-and-learn-%d' % i,
-                        args=(
-                            i,
-                            device,
-                            position,
-                            locks[device][position],
-                            position_locks[position])
-                        )
-                    thread.start()
-                    threads.append(thread)
-
-        def checkpoint(frames):
+                    commands[position].put('stop' if stop else 'checkpoint')
+                received = {}
+                for _ in range(self.num_players):
+                    position, snapshot_bytes = snapshots.get()
+                    received[position] = torch.load(io.BytesIO(snapshot_bytes), map_location='cpu')
+                return [received[position] for position in range(self.num_players)]
+
+            result = []
+            for position in range(self.num_players):
+                with position_locks[position]:
+                    result.append((
+                        to_cpu(learner_model.get_agent(position).checkpoint_attributes()),
+                        to_cpu(optimizers[position].state_dict()),
+                    ))
+            return result
+
+        def checkpoint(frames, stop=False):
+            """Snapshot the learner to CPU and hand it to the background writer."""
             log.info('Saving checkpoint to %s', self.checkpointpath)
-            _agents = learner_model.get_agents()
-            torch.save({
-                'model_state_dict': [_agent.state_dict() for _agent in _agents],
-                'optimizer_state_dict': [optimizer.state_dict() for optimizer in optimizers],
-                "stats": stats,
-                'frames': frames,
-            }, self.checkpointpath)
+            model_state_dicts, optimizer_state_dicts, eval_files = [], [], []
+            for position, (attributes, optimizer_state) in enumerate(snapshot(stop)):
+                model_state_dicts.append(attributes['net'])
+                optimizer_state_dicts.append(optimizer_state)
 
-            # Save the weights for evaluation purpose
-            for position in range(self.num_players):
+                # Save the weights for evaluation purpose
                 model_weights_dir = os.path.expandvars(os.path.expanduser(
                     '%s/%s/%s' % (self.savedir, self.xpid, str(position)+'_'+str(frames)+'.pth')))
-                torch.save(
-                    learner_model.get_agent(position),
-                    model_weights_dir
-                )
+                eval_files.append((model_weights_dir, attributes))
+
+            checkpoint_states = {
+                'model_state_dict': model_state_dicts,
+                'optimizer_state_dict': optimizer_state_dicts,
+                "stats": dict(stats),
+                'frames': frames,
+                'net_type': self.net_type,
+            }
+            checkpoint_writer.submit(
+                [(self.checkpointpath, checkpoint_states)] + eval_files,
+                prunable=[path for path, _ in eval_files],
+            )
 
         timer = timeit.default_timer
         try:
@@ -375,7 +774,26 @@ class DMCTrainer:
         else:
             for thread in threads:
                 thread.join()
+            if self.learner_processes:
+                # Wait for the stats of the steps that were still running,
+                # so that the frames match the weights of the checkpoint
+                while frames < learner_frames.value:
+                    time.sleep(0.1)
             log.info('Learning finished after %d frames.', frames)
 
-        checkpoint(frames)
+        checkpoint(frames, stop=True)
+        if self.learner_processes:
+            for learner in learners:
+                learner.join()
+        # The actors never stop by themselves
+        for actor in actor_processes:
+            actor.terminate()
+            actor.join()
+        checkpoint_writer.close()
+        if server is not None:
+            server.close()
+        if evaluator is not None:
+            evaluator.stop()
+        if telemetry is not None:
+            telemetry.close()
         self.plogger.close()
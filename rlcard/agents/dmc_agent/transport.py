@@ -0,0 +1,283 @@
+import json
+import os
+import socket
+import struct
+import threading
+import timeit
+import traceback
+
+import numpy as np
+import torch
+
+from .model import DMCModel
+from .utils import log, run_actor
+
+# A message is the length of its JSON header, the header, and the raw bytes
+# of the arrays that the header describes
+_HEADER_LENGTH = struct.Struct('!I')
+
+def parse_address(address):
+    """Parse `host:port` for TCP or `unix:<path>` for a Unix socket
+
+    Returns:
+        (tuple): The socket family and the address to bind or connect to
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+def _recv_exactly(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('Connection closed')
+        received += n
+    return buf
+
+def send_message(sock, header, arrays=None):
+    """Send a JSON-serializable `header` and a dict of NumPy arrays. The
+    arrays are sent as raw bytes, described by their dtype and shape.
+    """
+    arrays = {} if arrays is None else arrays
+    header = dict(header)
+    header['arrays'] = []
+    payloads = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        header['arrays'].append((name, array.dtype.str, array.shape))
+        payloads.append(memoryview(array).cast('B'))
+    encoded = json.dumps(header).encode('utf-8')
+    sock.sendall(_HEADER_LENGTH.pack(len(encoded)) + encoded)
+    for payload in payloads:
+        sock.sendall(payload)
+
+def recv_message(sock):
+    """Receive a message sent by `send_message`
+
+    Returns:
+        (tuple): The header and the dict of arrays
+    """
+    (length,) = _HEADER_LENGTH.unpack(_recv_exactly(sock, _HEADER_LENGTH.size))
+    header = json.loads(_recv_exactly(sock, length).decode('utf-8'))
+    arrays = {}
+    for name, dtype, shape in header.pop('arrays'):
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = np.frombuffer(_recv_exactly(sock, nbytes), dtype=dtype).reshape(shape)
+    return header, arrays
+
+class RolloutServer:
+    """Receive rollouts from remote actors into the shared buffers of one
+    device, and serve them the published parameters.
+
+    Every connection is served by its own thread. A remote actor first
+    sends `hello` and receives the unroll length, the config of the model
+    and a template of the buffers of every position. It then sends `block`
+    messages with the `T` transitions of a position, which are copied into
+    a free buffer, and `pull` messages with the versions of its parameters,
+    which are answered with the parameters of the positions that changed.
+
+    Args:
+        address (str): `host:port` or `unix:<path>` to listen on
+        T (int): The unroll length
+        buffers (list): The buffers of every position of the device
+        free_queue (list): The free queue of every position of the device
+        full_queue (list): The full queue of every position of the device
+        model (DMCModel): The shared actor model of the device
+        versions (torch.Tensor): The published versions of the device
+        config (dict): Sent to the remote actors to build their model
+        actor_stats (ActorStats): Telemetry counters, or None
+        stats_index (int): The row of `actor_stats` counting remote rollouts
+    """
+    def __init__(
+        self,
+        address,
+        T,
+        buffers,
+        free_queue,
+        full_queue,
+        model,
+        versions,
+        config,
+        actor_stats=None,
+        stats_index=0,
+    ):
+        self.address = address
+        self.T = T
+        self.buffers = buffers
+        self.free_queue = free_queue
+        self.full_queue = full_queue
+        self.model = model
+        self.versions = versions
+        self.config = config
+        self.actor_stats = actor_stats
+        self.stats_index = stats_index
+        self._lock = threading.Lock()
+        self._sock = None
+
+    def start(self):
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(address)
+        self._sock.listen()
+        if family == socket.AF_INET:
+            # Resolve port 0 to the port chosen by the system
+            self.address = '%s:%d' % (address[0], self._sock.getsockname()[1])
+        log.info('Listening for remote actors on %s', self.address)
+        threading.Thread(target=self._accept, name='rollout-server', daemon=True).start()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), name='rollout-connection', daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            with conn:
+                while True:
+                    header, arrays = recv_message(conn)
+                    if header['type'] == 'hello':
+                        self._hello(conn)
+                    elif header['type'] == 'block':
+                        self._put_block(header['position'], arrays)
+                    elif header['type'] == 'pull':
+                        self._pull(conn, header['versions'])
+                    else:
+                        raise ValueError('Unknown message type: ' + str(header['type']))
+        except ConnectionError:
+            pass
+        except Exception:
+            log.error('Exception while serving a remote actor')
+            traceback.print_exc()
+
+    def _hello(self, conn):
+        templates = {}
+        for p, buffers in enumerate(self.buffers):
+            for key, buffer in buffers.items():
+                templates['%d/%s' % (p, key)] = buffer[:1, :1].cpu().numpy()
+        send_message(conn, dict(T=self.T, num_players=len(self.buffers), config=self.config), templates)
+
+    def _put_block(self, position, arrays):
+        index = self.free_queue[position].get()
+        if index is None:
+            return
+        for key, array in arrays.items():
+            self.buffers[position][key][index].copy_(torch.from_numpy(array))
+        self.full_queue[position].put(index)
+        if self.actor_stats is not None:
+            with self._lock:
+                self.actor_stats.add_frames(self.stats_index, len(arrays['target']))
+                self.actor_stats.took_free(self.stats_index, position)
+                self.actor_stats.put_full(self.stats_index, position)
+
+    def _pull(self, conn, local_versions):
+        versions, arrays = {}, {}
+        for position, local_version in enumerate(local_versions):
+            version = int(self.versions[position])
+            if version == local_version or version % 2 == 1:
+                continue
+            state_dict = self.model.get_agent(position).state_dict()
+            params = {'%d/%s' % (position, name): tensor.cpu().numpy().copy() for name, tensor in state_dict.items()}
+            # Skip a snapshot that changed while it was copied
+            if int(self.versions[position]) == version:
+                versions[position] = version
+                arrays.update(params)
+        send_message(conn, dict(versions=versions), arrays)
+
+class SocketTransport:
+    """Hand the rollouts of a remote actor to a `RolloutServer` and pull the
+    published parameters from it, at most every `pull_interval` seconds.
+    """
+    def __init__(self, address, pull_interval=1.0):
+        family, address = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(address)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.pull_interval = pull_interval
+        self.last_pull_time = None
+
+    def hello(self):
+        """Returns:
+            (tuple): The unroll length, the model config and the buffer
+              templates of every position
+        """
+        send_message(self.sock, dict(type='hello'))
+        header, arrays = recv_message(self.sock)
+        templates = [{} for _ in range(header['num_players'])]
+        for name, array in arrays.items():
+            p, key = name.split('/', 1)
+            templates[int(p)][key] = torch.from_numpy(array)
+        return header['T'], header['config'], templates
+
+    def put_block(self, position, staging):
+        send_message(self.sock, dict(type='block', position=position), staging.pop_block())
+        return True
+
+    def pull_parameters(self, model, local_versions):
+        now = timeit.default_timer()
+        if self.last_pull_time is not None and now - self.last_pull_time < self.pull_interval:
+            return
+        self.last_pull_time = now
+        send_message(self.sock, dict(type='pull', versions=local_versions))
+        header, arrays = recv_message(self.sock)
+        for position, version in header['versions'].items():
+            position = int(position)
+            prefix = '%d/' % position
+            state_dict = {
+                name[len(prefix):]: torch.from_numpy(array)
+                for name, array in arrays.items() if name.startswith(prefix)
+            }
+            model.get_agent(position).load_state_dict(state_dict)
+            local_versions[position] = version
+
+    def close(self):
+        self.sock.close()
+
+def act_remote(i, address, env, num_envs=1, device='cpu'):
+    """Run an actor on another host that sends its rollouts to the
+    `RolloutServer` listening on `address`.
+    """
+    try:
+        transport = SocketTransport(address)
+        T, config, templates = transport.hello()
+        log.info('Remote actor %i connected to %s.', i, address)
+
+        action_shape = env.action_shape
+        if action_shape[0] is None:  # One-hot encoding
+            action_shape = [[env.num_actions] for _ in range(env.num_players)]
+        model = DMCModel(
+            env.state_shape,
+            action_shape,
+            exp_epsilon=config['exp_epsilon'],
+            device=device,
+            net_type=config['net_type'],
+        )
+        model.eval()
+
+        run_actor(i, T, transport, model, templates, env, num_envs, config['packed'])
+
+    except KeyboardInterrupt:
+        pass
+    except ConnectionError:
+        log.info('Remote actor %i disconnected.', i)
+    except Exception as e:
+        log.error('Exception in remote actor %i', i)
+        traceback.print_exc()
+        raise e
@@ -13,7 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import logging
+import timeit
 import traceback
 
 import numpy as np
@@ -30,21 +32,45 @@ log.addHandler(shandle)
 log.setLevel(logging.INFO)
 
 def get_batch(
-    free_queue,
     full_queue,
     buffers,
     batch_size,
-    lock
+    lock,
+    slot_counts,
 ):
-    with lock:
-        indices = [full_queue.get() for _ in range(batch_size)]
+    """Wait until the `batch_size` buffers of one slot are all full and
+    return the slot with a batch of views into the shared buffers.
+
+    Buffer `m` belongs to slot `m // batch_size`, so the buffers of a slot
+    are contiguous and a batch is a slice of the buffers without any copy.
+    `slot_counts` counts the full buffers of every slot and is shared by
+    the learner threads of the same position under `lock`. The lock is
+    only held to count a buffer, never while waiting for one, and the
+    thread that counts the last buffer of a slot takes the batch.
+    """
+    while True:
+        slot = full_queue.get() // batch_size
+        with lock:
+            slot_counts[slot] += 1
+            if slot_counts[slot] == batch_size:
+                slot_counts[slot] = 0
+                break
     batch = {
-        key: torch.stack([buffers[key][m] for m in indices], dim=1)
+        key: buffers[key][slot*batch_size:(slot+1)*batch_size]
         for key in buffers
     }
-    for m in indices:
+    return slot, batch
+
+def release_batch(
+    free_queue,
+    slot,
+    batch_size,
+):
+    """Give the buffers of a slot back to the actors once the learner is
+    done with its batch.
+    """
+    for m in range(slot*batch_size, (slot+1)*batch_size):
         free_queue.put(m)
-    return batch
 
 def create_buffers(
     T,
@@ -52,29 +78,124 @@ def create_buffers(
     state_shape,
     action_shape,
     device_iterator,
+    packed=False,
 ):
+    """Create one contiguous shared tensor of `num_buffers` buffers for
+    every key, position and device.
+
+    If `packed`, the binary state and action features are stored
+    flattened with eight features per byte (see `packed_size`).
+    """
     buffers = {}
     for device in device_iterator:
         buffers[device] = []
         for player_id in range(len(state_shape)):
+            if packed:
+                state = dict(size=(num_buffers, T, packed_size(state_shape[player_id])), dtype=torch.uint8)
+                action = dict(size=(num_buffers, T, packed_size(action_shape[player_id])), dtype=torch.uint8)
+            else:
+                state = dict(size=(num_buffers, T)+tuple(state_shape[player_id]), dtype=torch.int8)
+                action = dict(size=(num_buffers, T)+tuple(action_shape[player_id]), dtype=torch.int8)
             specs = dict(
-                done=dict(size=(T,), dtype=torch.bool),
-                episode_return=dict(size=(T,), dtype=torch.float32),
-                target=dict(size=(T,), dtype=torch.float32),
-                state=dict(size=(T,)+tuple(state_shape[player_id]), dtype=torch.int8),
-                action=dict(size=(T,)+tuple(action_shape[player_id]), dtype=torch.int8),
+                done=dict(size=(num_buffers, T), dtype=torch.bool),
+                episode_return=dict(size=(num_buffers, T), dtype=torch.float32),
+                target=dict(size=(num_buffers, T), dtype=torch.float32),
+                state=state,
+                action=action,
             )
-            _buffers = {key: [] for key in specs}
-            for _ in range(num_buffers):
-                for key in _buffers:
-                    if device == "cpu":
-                        _buffer = torch.empty(**specs[key]).to('cpu').share_memory_()
-                    else:
-                        _buffer = torch.empty(**specs[key]).to('cuda:'+str(device)).share_memory_()
-                    _buffers[key].append(_buffer)
+            _buffers = {}
+            for key in specs:
+                if device == "cpu":
+                    _buffers[key] = torch.empty(**specs[key]).to('cpu').share_memory_()
+                else:
+                    _buffers[key] = torch.empty(**specs[key]).to('cuda:'+str(device)).share_memory_()
             buffers[device].append(_buffers)
     return buffers
 
+PACKED_KEYS = ('state', 'action')
+
+def packed_size(shape):
+    """Number of bytes of a flattened binary feature of `shape` stored with
+    eight features per byte.
+    """
+    return -(-int(np.prod(shape)) // 8)
+
+def pack_bits(features):
+    """Pack binary features of shape `(n, ...)` into a `(n, packed_size)`
+    uint8 array. Any nonzero feature is stored as 1.
+    """
+    return np.packbits(features.reshape(len(features), -1) != 0, axis=-1)
+
+_BIT_SHIFTS = {}
+
+def unpack_bits(packed, shape):
+    """Unpack a uint8 tensor produced by `pack_bits` into 0/1 features of
+    `shape` on the device of `packed`. All the bits are extracted with one
+    shift and mask, without a loop over the features.
+    """
+    key = str(packed.device)
+    if key not in _BIT_SHIFTS:
+        _BIT_SHIFTS[key] = torch.arange(7, -1, -1, dtype=torch.uint8, device=packed.device)
+    bits = (packed.unsqueeze(-1) >> _BIT_SHIFTS[key]) & 1
+    bits = bits.flatten(-2)[..., :int(np.prod(shape))]
+    return bits.reshape(packed.shape[:-1] + tuple(shape))
+
+class ParameterBroadcaster:
+    """Publish version-stamped snapshots of the learner parameters into the
+    shared actor models. A position is published after `publish_every`
+    updates or `publish_interval` seconds, whichever comes first.
+
+    The version of a position is odd while a snapshot is being written and
+    even once it is complete, so that actors can detect torn reads.
+    """
+    def __init__(self, models, num_players, publish_every=10, publish_interval=5.0):
+        self.models = models
+        self.publish_every = publish_every
+        self.publish_interval = publish_interval
+        self.versions = {
+            device: torch.zeros(num_players, dtype=torch.int64).share_memory_()
+            for device in models
+        }
+        self.num_updates = [0 for _ in range(num_players)]
+        self.last_publish_time = [timeit.default_timer() for _ in range(num_players)]
+
+    def step(self, position, agent):
+        """Count one update of `position` and publish if it is due. Must be
+        called while holding the lock of the position. Returns the seconds
+        spent publishing.
+        """
+        self.num_updates[position] += 1
+        start_time = timeit.default_timer()
+        elapsed = start_time - self.last_publish_time[position]
+        if self.num_updates[position] >= self.publish_every or \
+                (self.publish_interval is not None and elapsed >= self.publish_interval):
+            self.publish(position, agent)
+            return timeit.default_timer() - start_time
+        return 0.0
+
+    def publish(self, position, agent):
+        state_dict = agent.state_dict()
+        for device, model in self.models.items():
+            versions = self.versions[device]
+            versions[position] += 1
+            model.get_agent(position).load_state_dict(state_dict)
+            versions[position] += 1
+        self.num_updates[position] = 0
+        self.last_publish_time[position] = timeit.default_timer()
+
+def pull_parameters(shared_model, local_model, versions, local_versions):
+    """Copy the published parameters of every position whose version changed
+    into the local model of an actor. A snapshot that is being written, or
+    that changed during the copy, is picked up at the next pull.
+    """
+    for position, local_version in enumerate(local_versions):
+        version = int(versions[position])
+        if version == local_version or version % 2 == 1:
+            continue
+        local_model.get_agent(position).load_state_dict(shared_model.get_agent(position).state_dict())
+        if int(versions[position]) == version:
+            local_versions[position] = version
+
 def create_optimizers(
     num_players,
     learning_rate,
@@ -94,6 +215,219 @@ def create_optimizers(
         optimizers.append(optimizer)
     return optimizers
 
+class RolloutStaging:
+    """Preallocated NumPy arrays in which an actor stages the transitions
+    of one position until a full `T`-length block can be copied into a
+    shared buffer.
+
+    If the buffers are bit-packed, the state and action blocks are packed
+    as they are staged.
+    """
+    def __init__(self, T, buffers, packed=False):
+        self.T = T
+        self.size = 0
+        self.packed = packed
+        self.arrays = {
+            key: np.empty(
+                (2 * T,) + tuple(buffers[key].shape[2:]),
+                dtype=torch.empty((), dtype=buffers[key].dtype).numpy().dtype,
+            )
+            for key in buffers
+        }
+
+    def _reserve(self, n):
+        capacity = len(self.arrays['target'])
+        if self.size + n <= capacity:
+            return
+        while capacity < self.size + n:
+            capacity *= 2
+        for key, array in self.arrays.items():
+            new_array = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+            new_array[:self.size] = array[:self.size]
+            self.arrays[key] = new_array
+
+    def extend(self, **blocks):
+        """Append a block of transitions. Every keyword is an array whose
+        first dimension is the number of transitions.
+        """
+        n = len(blocks['target'])
+        self._reserve(n)
+        for key, block in blocks.items():
+            if self.packed and key in PACKED_KEYS:
+                block = pack_bits(block)
+            self.arrays[key][self.size:self.size+n] = block
+        self.size += n
+
+    def is_full(self):
+        return self.size > self.T
+
+    def pop_block(self):
+        """Remove the first `T` transitions and return a copy of them."""
+        T = self.T
+        block = {}
+        for key, array in self.arrays.items():
+            block[key] = array[:T].copy()
+            array[:self.size-T] = array[T:self.size]
+        self.size -= T
+        return block
+
+    def flush(self, buffers, index):
+        """Copy the first `T` transitions into the shared buffers at `index`
+        and shift the remaining ones to the front.
+        """
+        T = self.T
+        for key, array in self.arrays.items():
+            buffers[key][index][...] = torch.from_numpy(array[:T])
+            array[:self.size-T] = array[T:self.size]
+        self.size -= T
+
+class BatchedEnvRunner:
+    """Drive several environments at the same time. The pending decisions
+    of every position are evaluated in one forward pass over all the
+    environments that are waiting for that position.
+    """
+    def __init__(self, envs, agents):
+        self.envs = envs
+        self.agents = agents
+        self.trajectories = [None for _ in envs]
+        self.states = [None for _ in envs]
+        self.player_ids = [None for _ in envs]
+        for k in range(len(envs)):
+            self._reset(k)
+
+    def _reset(self, k):
+        env = self.envs[k]
+        self.trajectories[k] = [[] for _ in range(env.num_players)]
+        self.states[k], self.player_ids[k] = env.reset()
+        self.trajectories[k][self.player_ids[k]].append(self.states[k])
+
+    def run(self):
+        """Advance every environment by one decision
+
+        Returns:
+            (list): The (trajectories, payoffs) of the games that finished,
+              in the same format as `Env.run`
+        """
+        finished = []
+        for position, agent in enumerate(self.agents):
+            indices = [k for k, player_id in enumerate(self.player_ids) if player_id == position]
+            if not indices:
+                continue
+            actions = agent.batch_step([self.states[k] for k in indices])
+            for k, action in zip(indices, actions):
+                env = self.envs[k]
+                next_state, next_player_id = env.step(action, agent.use_raw)
+                self.trajectories[k][position].append(action)
+                self.states[k] = next_state
+                self.player_ids[k] = next_player_id
+                if not env.is_over():
+                    self.trajectories[k][next_player_id].append(next_state)
+                    continue
+
+                # Add a final state to all the players
+                trajectories = self.trajectories[k]
+                for player_id in range(env.num_players):
+                    trajectories[player_id].append(env.get_state(player_id))
+                finished.append((trajectories, env.get_payoffs()))
+                self._reset(k)
+        return finished
+
+class SharedMemoryTransport:
+    """Hand the rollouts of an actor to the learner through the shared
+    buffers of its device, and pull the published parameters from the
+    shared actor model if `versions` is given.
+    """
+    def __init__(self, free_queue, full_queue, buffers, shared_model=None, versions=None):
+        self.free_queue = free_queue
+        self.full_queue = full_queue
+        self.buffers = buffers
+        self.shared_model = shared_model
+        self.versions = versions
+
+    def put_block(self, position, staging):
+        """Move the first `T` staged transitions of `position` to the learner.
+        Returns False if the learner has no buffer for them anymore.
+        """
+        index = self.free_queue[position].get()
+        if index is None:
+            return False
+        staging.flush(self.buffers[position], index)
+        self.full_queue[position].put(index)
+        return True
+
+    def pull_parameters(self, model, local_versions):
+        if self.versions is not None:
+            pull_parameters(self.shared_model, model, self.versions, local_versions)
+
+def run_actor(
+    i,
+    T,
+    transport,
+    model,
+    buffers,
+    env,
+    num_envs=1,
+    packed=False,
+    actor_stats=None,
+):
+    """Generate rollouts with `model` and hand every `T`-length block of a
+    position to `transport`. `buffers` only gives the shapes and dtypes of
+    the blocks of every position.
+    """
+    local_versions = [-1 for _ in range(env.num_players)]
+
+    def pull():
+        transport.pull_parameters(model, local_versions)
+        if actor_stats is not None:
+            actor_stats.set_versions(i, local_versions)
+
+    pull()
+
+    # Configure environments
+    if num_envs > 1:
+        envs = [copy.deepcopy(env) for _ in range(num_envs)]
+        for k, _env in enumerate(envs):
+            _env.seed(i * num_envs + k)
+        runner = BatchedEnvRunner(envs, model.get_agents())
+    else:
+        env.seed(i)
+        env.set_agents(model.get_agents())
+
+    stagings = [RolloutStaging(T, buffers[p], packed) for p in range(env.num_players)]
+
+    while True:
+        if num_envs > 1:
+            games = runner.run()
+        else:
+            games = [env.run(is_training=True)]
+        if games:
+            pull()
+        for trajectories, payoffs in games:
+            for p in range(env.num_players):
+                staging = stagings[p]
+                n = len(trajectories[p][:-1]) // 2
+                if actor_stats is not None:
+                    actor_stats.add_frames(i, n)
+                if n > 0:
+                    done = np.zeros(n, dtype=bool)
+                    done[-1] = True
+                    episode_return = np.zeros(n, dtype=np.float32)
+                    episode_return[-1] = payoffs[p]
+                    staging.extend(
+                        done=done,
+                        episode_return=episode_return,
+                        target=np.full(n, payoffs[p], dtype=np.float32),
+                        state=np.stack([trajectories[p][t]['obs'] for t in range(0, 2*n, 2)]),
+                        action=env.get_action_features([trajectories[p][t] for t in range(1, 2*n, 2)]),
+                    )
+
+                while staging.is_full():
+                    if not transport.put_block(p, staging):
+                        break
+                    if actor_stats is not None:
+                        actor_stats.took_free(i, p)
+                        actor_stats.put_full(i, p)
+
 def act(
     i,
     device,
@@ -102,57 +436,22 @@ def act(
     full_queue,
     model,
     buffers,
-    env
+    env,
+    num_envs=1,
+    versions=None,
+    packed=False,
+    actor_stats=None,
 ):
     try:
         log.info('Device %s Actor %i started.', str(device), i)
 
-        # Configure environment
-        env.seed(i)
-        env.set_agents(model.get_agents())
-
-        done_buf = [[] for _ in range(env.num_players)]
-        episode_return_buf = [[] for _ in range(env.num_players)]
-        target_buf = [[] for _ in range(env.num_players)]
-        state_buf = [[] for _ in range(env.num_players)]
-        action_buf = [[] for _ in range(env.num_players)]
-        size = [0 for _ in range(env.num_players)]
+        # Act with a local copy of the model that is refreshed from the
+        # published parameters between episodes
+        transport = SharedMemoryTransport(free_queue, full_queue, buffers, model, versions)
+        if versions is not None:
+            model = copy.deepcopy(model)
 
-        while True:
-            trajectories, payoffs = env.run(is_training=True)
-            for p in range(env.num_players):
-                size[p] += len(trajectories[p][:-1]) // 2
-                diff = size[p] - len(target_buf[p])
-                if diff > 0:
-                    done_buf[p].extend([False for _ in range(diff-1)])
-                    done_buf[p].append(True)
-                    episode_return_buf[p].extend([0.0 for _ in range(diff-1)])
-                    episode_return_buf[p].append(float(payoffs[p]))
-                    target_buf[p].extend([float(payoffs[p]) for _ in range(diff)])
-                    # State and action
-                    for i in range(0, len(trajectories[p])-2, 2):
-                        state = trajectories[p][i]['obs']
-                        action = env.get_action_feature(trajectories[p][i+1])
-                        state_buf[p].append(torch.from_numpy(state))
-                        action_buf[p].append(torch.from_numpy(action))
-                
-                while size[p] > T:
-                    index = free_queue[p].get()
-                    if index is None:
-                        break
-                    for t in range(T):
-                        buffers[p]['done'][index][t, ...] = done_buf[p][t]
-                        buffers[p]['episode_return'][index][t, ...] = episode_return_buf[p][t]
-                        buffers[p]['target'][index][t, ...] = target_buf[p][t]
-                        buffers[p]['state'][index][t, ...] = state_buf[p][t]
-                        buffers[p]['action'][index][t, ...] = action_buf[p][t]
-                    full_queue[p].put(index)
-                    done_buf[p] = done_buf[p][T:]
-                    episode_return_buf[p] = episode_return_buf[p][T:]
-                    target_buf[p] = target_buf[p][T:]
-                    state_buf[p] = state_buf[p][T:]
-                    action_buf[p] = action_buf[p][T:]
-                    size[p] -= T
+        run_actor(i, T, transport, model, buffers, env, num_envs, packed, actor_stats)
 
     except KeyboardInterrupt:
         pass
@@ -327,7 +327,11 @@ class DQNAgent(object):
             path (str): the path to save the model
             filename(str): the file name of checkpoint
         '''
-        torch.save(self.checkpoint_attributes(), os.path.join(path, filename))
+        # Written to a temporary file first, so that a reader never sees
+        # a partially written checkpoint
+        save_path = os.path.join(path, filename)
+        torch.save(self.checkpoint_attributes(), save_path + '.tmp')
+        os.replace(save_path + '.tmp', save_path)
 
 
 class Estimator(object):
@@ -476,7 +480,7 @@ class EstimatorNetwork(nn.Module):
         self.mlp_layers = mlp_layers
 
         # build the Q network
-        layer_dims = [np.prod(self.state_shape)] + self.mlp_layers
+        layer_dims = [int(np.prod(self.state_shape))] + self.mlp_layers
         fc = [nn.Flatten()]
         fc.append(nn.BatchNorm1d(layer_dims[0]))
         for i in range(len(layer_dims)-1):
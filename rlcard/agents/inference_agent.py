@@ -0,0 +1,290 @@
+''' Export of trained agents for inference and a lightweight agent to serve them
+
+A trained DQNAgent, NFSPAgent or DMCAgent can be exported with `export_agent`
+as a TorchScript or ONNX artifact. The legal-action masking is part of the
+exported graph, and the MLP layers can optionally be quantized to int8 for
+CPU inference. The exported file can then be loaded with `InferenceAgent`,
+which does not depend on any of the training code.
+'''
+import os
+import json
+import copy
+import inspect
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# Name of the metadata file embedded in TorchScript artifacts
+METADATA_FILE = 'rlcard.json'
+
+
+class MaskedValueNetwork(nn.Module):
+    ''' Wrap a network that maps observations to a score for every action.
+        The scores of the illegal actions are set to -inf. If `log_probs` is
+        True, the scores are log probabilities that are renormalized over the
+        legal actions.
+    '''
+
+    def __init__(self, net, log_probs=False):
+        super(MaskedValueNetwork, self).__init__()
+        self.net = net
+        self.log_probs = log_probs
+
+    def forward(self, obs, legal_mask):
+        ''' Predict the masked scores
+
+        Args:
+            obs (Tensor): (batch, state_shape) observations
+            legal_mask (Tensor): (batch, num_actions) boolean mask of legal actions
+
+        Returns:
+            scores (Tensor): (batch, num_actions)
+        '''
+        scores = self.net(obs).masked_fill(~legal_mask, float('-inf'))
+        if self.log_probs:
+            scores = torch.log_softmax(scores, dim=-1)
+        return scores
+
+
+class DMCValueNetwork(nn.Module):
+    ''' Wrap a DMCNet so that one observation is evaluated against
+        the features of all its legal actions
+    '''
+
+    def __init__(self, net):
+        super(DMCValueNetwork, self).__init__()
+        self.net = net
+
+    def forward(self, obs, actions):
+        ''' Predict the values of the legal actions
+
+        Args:
+            obs (Tensor): (state_shape) observation
+            actions (Tensor): (num_legal_actions, action_shape) action features
+
+        Returns:
+            values (Tensor): (num_legal_actions,)
+        '''
+        obs = torch.flatten(obs).unsqueeze(0)
+        obs_index = torch.zeros(actions.shape[0], dtype=torch.long)
+        return self.net(obs, actions, obs_index)
+
+
+def _build_export_module(agent):
+    ''' Build the module to be exported from a trained agent
+
+    Returns:
+        (tuple): The module, the example inputs and the metadata
+    '''
+    from rlcard.agents.dqn_agent import DQNAgent
+    from rlcard.agents.nfsp_agent import NFSPAgent
+    from rlcard.agents.dmc_agent.model import DMCAgent
+
+    if isinstance(agent, NFSPAgent) and agent.evaluate_with == 'best_response':
+        agent = agent._rl_agent
+
+    if isinstance(agent, DQNAgent):
+        estimator = agent.q_estimator
+        module = MaskedValueNetwork(copy.deepcopy(estimator.qnet))
+        state_shape = estimator.state_shape
+        num_actions = agent.num_actions
+        kind = 'value'
+    elif isinstance(agent, NFSPAgent):
+        module = MaskedValueNetwork(copy.deepcopy(agent.policy_network), log_probs=True)
+        state_shape = agent._state_shape
+        num_actions = agent._num_actions
+        kind = 'policy'
+    elif isinstance(agent, DMCAgent):
+        module = DMCValueNetwork(copy.deepcopy(agent.net))
+        state_shape = agent.state_shape
+        num_actions = agent.action_shape[0]
+        kind = 'dmc'
+    else:
+        raise ValueError('Exporting {} is not supported'.format(type(agent).__name__))
+
+    module = module.to('cpu').eval()
+    if kind == 'dmc':
+        example_inputs = (torch.zeros(tuple(state_shape)),
+                          torch.zeros((2, num_actions)))
+    else:
+        example_inputs = (torch.zeros((2,) + tuple(state_shape)),
+                          torch.ones((2, num_actions), dtype=torch.bool))
+    metadata = {
+        'kind': kind,
+        'num_actions': int(num_actions),
+        'state_shape': [int(d) for d in state_shape],
+    }
+    return module, example_inputs, metadata
+
+def export_agent(agent, path, export_format='torchscript', quantize=False):
+    ''' Export a trained agent for inference
+
+    Args:
+        agent (object): A DQNAgent, NFSPAgent or DMCAgent
+        path (str): The path of the exported file
+        export_format (str): `torchscript` or `onnx`
+        quantize (boolean): Whether to apply dynamic int8 quantization to the
+          linear layers. Only supported for TorchScript.
+
+    Returns:
+        metadata (dict): The metadata of the exported model
+    '''
+    if export_format not in ('torchscript', 'onnx'):
+        raise ValueError("'export_format' should be either 'torchscript' or 'onnx'.")
+    if quantize and export_format == 'onnx':
+        raise ValueError('Dynamic quantization is only supported for TorchScript export.')
+
+    module, example_inputs, metadata = _build_export_module(agent)
+    if quantize:
+        module = torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+    metadata['quantized'] = quantize
+
+    save_dir = os.path.dirname(path)
+    if save_dir and not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    if export_format == 'torchscript':
+        scripted = torch.jit.script(module)
+        torch.jit.save(scripted, path, _extra_files={METADATA_FILE: json.dumps(metadata)})
+    else:
+        if metadata['kind'] == 'dmc':
+            input_names = ['obs', 'actions']
+            dynamic_axes = {'actions': {0: 'num_legal_actions'}, 'scores': {0: 'num_legal_actions'}}
+        else:
+            input_names = ['obs', 'legal_mask']
+            dynamic_axes = {'obs': {0: 'batch'}, 'legal_mask': {0: 'batch'}, 'scores': {0: 'batch'}}
+        # Use the TorchScript-based exporter, which handles `dynamic_axes`
+        export_kwargs = {}
+        if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs['dynamo'] = False
+        torch.onnx.export(
+            module,
+            example_inputs,
+            path,
+            input_names=input_names,
+            output_names=['scores'],
+            dynamic_axes=dynamic_axes,
+            **export_kwargs,
+        )
+        with open(path + '.json', 'w') as f:
+            json.dump(metadata, f)
+
+    return metadata
+
+
+class InferenceAgent(object):
+    ''' A lightweight agent that serves a model exported by `export_agent`.
+        TorchScript artifacts are run with torch, ONNX artifacts with onnxruntime.
+    '''
+
+    def __init__(self, path, num_threads=None):
+        ''' Load an exported model
+
+        Args:
+            path (str): The path of the exported file
+            num_threads (int): The number of intra-op threads for CPU inference
+        '''
+        self.use_raw = False
+        self.path = path
+
+        if path.endswith('.onnx'):
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            if num_threads is not None:
+                options.intra_op_num_threads = num_threads
+            self._session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            self._model = None
+            with open(path + '.json') as f:
+                self.metadata = json.load(f)
+        else:
+            if num_threads is not None:
+                torch.set_num_threads(num_threads)
+            extra_files = {METADATA_FILE: ''}
+            self._model = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+            self._model.eval()
+            self._session = None
+            self.metadata = json.loads(extra_files[METADATA_FILE])
+
+        self.kind = self.metadata['kind']
+        self.num_actions = self.metadata['num_actions']
+
+    def _run(self, first, second):
+        ''' Run the exported model on numpy inputs
+        '''
+        if self._session is not None:
+            names = [i.name for i in self._session.get_inputs()]
+            return self._session.run(None, {names[0]: first, names[1]: second})[0]
+        with torch.no_grad():
+            return self._model(torch.from_numpy(first), torch.from_numpy(second)).numpy()
+
+    def predict(self, state):
+        ''' Predict the scores of the legal actions
+
+        Args:
+            state (dict): The current state
+
+        Returns:
+            action_keys (numpy.array): The legal action ids
+            scores (numpy.array): The score of each legal action. For the
+              policy models, the scores are log probabilities.
+        '''
+        obs = state['obs'].astype(np.float32)
+        legal_actions = state['legal_actions']
+        action_keys = np.array(list(legal_actions.keys()))
+        if self.kind == 'dmc':
+            action_values = list(legal_actions.values())
+            features = np.zeros((len(action_keys), self.num_actions), dtype=np.float32)
+            for i, action_value in enumerate(action_values):
+                if action_value is None:
+                    features[i][action_keys[i]] = 1
+                else:
+                    features[i] = action_value
+            scores = self._run(obs, features)
+        else:
+            legal_mask = np.zeros((1, self.num_actions), dtype=bool)
+            legal_mask[0, action_keys] = True
+            scores = self._run(np.expand_dims(obs, 0), legal_mask)[0][action_keys]
+        return action_keys, scores
+
+    def step(self, state):
+        ''' Predict the action given the current state
+
+        Args:
+            state (dict): The current state
+
+        Returns:
+            action (int): The action id
+        '''
+        action_keys, scores = self.predict(state)
+        return self._choose(action_keys, scores)
+
+    def eval_step(self, state):
+        ''' Predict the action given the current state for evaluation.
+            Value models act greedily, policy models sample from the policy.
+
+        Args:
+            state (dict): The current state
+
+        Returns:
+            action (int): The action id
+            info (dict): A dictionary containing information
+        '''
+        action_keys, scores = self.predict(state)
+        action = self._choose(action_keys, scores)
+        info = {}
+        if self.kind == 'policy':
+            probs = np.exp(scores)
+            info['probs'] = {state['raw_legal_actions'][i]: float(probs[i]) for i in range(len(action_keys))}
+        else:
+            info['values'] = {state['raw_legal_actions'][i]: float(scores[i]) for i in range(len(action_keys))}
+        return action, info
+
+    def _choose(self, action_keys, scores):
+        ''' Sample from the policy models and act greedily with the value models
+        '''
+        if self.kind == 'policy':
+            probs = np.exp(scores.astype(np.float64))
+            probs /= probs.sum()
+            return int(np.random.choice(action_keys, p=probs))
+        return int(action_keys[np.argmax(scores)])
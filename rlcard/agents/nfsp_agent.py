@@ -371,7 +371,11 @@ class NFSPAgent(object):
         Args:
             path (str): the path to save the model
         '''
-        torch.save(self.checkpoint_attributes(), os.path.join(path, filename))
+        # Written to a temporary file first, so that a reader never sees
+        # a partially written checkpoint
+        save_path = os.path.join(path, filename)
+        torch.save(self.checkpoint_attributes(), save_path + '.tmp')
+        os.replace(save_path + '.tmp', save_path)
         
 
 class AveragePolicyNetwork(nn.Module):
@@ -398,7 +402,7 @@ class AveragePolicyNetwork(nn.Module):
         self.mlp_layers = mlp_layers
 
         # set up mlp w/ relu activations
-        layer_dims = [np.prod(self.state_shape)] + self.mlp_layers
+        layer_dims = [int(np.prod(self.state_shape))] + self.mlp_layers
         mlp = [nn.Flatten()]
         mlp.append(nn.BatchNorm1d(layer_dims[0]))
         for i in range(len(layer_dims)-1):
@@ -6,19 +6,24 @@ from rlcard.envs import Env
 
 class DoudizhuEnv(Env):
     ''' Doudizhu Environment
+
+    The observations are kept up to date in place by a
+    DoudizhuObservationEncoder. The 'obs' of every state is a copy of the
+    view of the encoder, not the view itself, since the states are kept in
+    trajectories and would otherwise change with the game. Use
+    game.encoder.get_obs() for the read-only view.
     '''
 
     def __init__(self, config):
-        from rlcard.games.doudizhu.utils import ACTION_2_ID, ID_2_ACTION
-        from rlcard.games.doudizhu.utils import cards2str, cards2str_with_suit
+        from rlcard.games.doudizhu.utils import ID_2_ACTION
+        from rlcard.games.doudizhu.utils import cards2str_with_suit
         from rlcard.games.doudizhu import Game
-        self._cards2str = cards2str
         self._cards2str_with_suit = cards2str_with_suit
-        self._ACTION_2_ID = ACTION_2_ID
         self._ID_2_ACTION = ID_2_ACTION
         
         self.name = 'doudizhu'
         self.game = Game()
+        self.game.encoder = DoudizhuObservationEncoder()
         super().__init__(config)
         self.state_shape = [[790], [901], [901]]
         self.action_shape = [[54] for _ in range(self.num_players)]
@@ -28,61 +33,12 @@ class DoudizhuEnv(Env):
 
         Args:
             state (dict): dict of original state
-        '''
-        current_hand = _cards2array(state['current_hand'])
-        others_hand = _cards2array(state['others_hand'])
 
-        last_action = ''
-        if len(state['trace']) != 0:
-            if state['trace'][-1][1] == 'pass':
-                last_action = state['trace'][-2][1]
-            else:
-                last_action = state['trace'][-1][1]
-        last_action = _cards2array(last_action)
-
-        last_9_actions = _action_seq2array(_process_action_seq(state['trace']))
-
-        if state['self'] == 0: # landlord
-            landlord_up_played_cards = _cards2array(state['played_cards'][2])
-            landlord_down_played_cards = _cards2array(state['played_cards'][1])
-            landlord_up_num_cards_left = _get_one_hot_array(state['num_cards_left'][2], 17) 
-            landlord_down_num_cards_left = _get_one_hot_array(state['num_cards_left'][1], 17)
-            obs = np.concatenate((current_hand,
-                                  others_hand,
-                                  last_action,
-                                  last_9_actions,
-                                  landlord_up_played_cards,
-                                  landlord_down_played_cards,
-                                  landlord_up_num_cards_left,
-                                  landlord_down_num_cards_left))
-        else:
-            landlord_played_cards = _cards2array(state['played_cards'][0])
-            for i, action in reversed(state['trace']):
-                if i == 0:
-                    last_landlord_action = action
-                    break
-            last_landlord_action = _cards2array(last_landlord_action)
-            landlord_num_cards_left = _get_one_hot_array(state['num_cards_left'][0], 20)
-
-            teammate_id = 3 - state['self']
-            teammate_played_cards = _cards2array(state['played_cards'][teammate_id])
-            last_teammate_action = 'pass'
-            for i, action in reversed(state['trace']):
-                if i == teammate_id:
-                    last_teammate_action = action
-                    break
-            last_teammate_action = _cards2array(last_teammate_action)
-            teammate_num_cards_left = _get_one_hot_array(state['num_cards_left'][teammate_id], 17)
-            obs = np.concatenate((current_hand,
-                                  others_hand,
-                                  last_action,
-                                  last_9_actions,
-                                  landlord_played_cards,
-                                  teammate_played_cards,
-                                  last_landlord_action,
-                                  last_teammate_action,
-                                  landlord_num_cards_left,
-                                  teammate_num_cards_left))
+        Returns:
+            (dict): The encoded state, whose 'obs' is a copy of the
+            observation of the encoder
+        '''
+        obs = self.game.encoder.get_obs(state['self']).copy()
 
         extracted_state = OrderedDict({'obs': obs, 'legal_actions': self._get_legal_actions()})
         extracted_state['raw_obs'] = state
@@ -115,8 +71,8 @@ class DoudizhuEnv(Env):
         Returns:
             legal_actions (list): a list of legal actions' id
         '''
-        legal_actions = self.game.state['actions']
-        legal_actions = {self._ACTION_2_ID[action]: _cards2array(action) for action in legal_actions}
+        action_ids = self.game.get_legal_action_ids()
+        legal_actions = dict(zip(action_ids.tolist(), self.get_action_features(action_ids)))
         return legal_actions
 
     def get_perfect_information(self):
@@ -127,7 +83,7 @@ class DoudizhuEnv(Env):
         '''
         state = {}
         state['hand_cards_with_suit'] = [self._cards2str_with_suit(player.current_hand) for player in self.game.players]
-        state['hand_cards'] = [self._cards2str(player.current_hand) for player in self.game.players]
+        state['hand_cards'] = [player.current_hand_str for player in self.game.players]
         state['trace'] = self.game.state['trace']
         state['current_player'] = self.game.round.current_player
         state['legal_actions'] = self.game.state['actions']
@@ -139,7 +95,18 @@ class DoudizhuEnv(Env):
         Returns:
             (numpy.array): The action features
         '''
-        return _cards2array(self._decode_action(action))
+        return _get_action_feature_table()[action]
+
+    def get_action_features(self, actions):
+        ''' Gather the features of several actions from the cached table
+
+        Args:
+            actions (list): A list of action ids
+
+        Returns:
+            (numpy.array): A (len(actions), 54) array of action features
+        '''
+        return _get_action_feature_table()[np.asarray(actions, dtype=np.int64)]
 
 Card2Column = {'3': 0, '4': 1, '5': 2, '6': 3, '7': 4, '8': 5, '9': 6, 'T': 7,
                'J': 8, 'Q': 9, 'K': 10, 'A': 11, '2': 12}
@@ -166,23 +133,164 @@ def _cards2array(cards):
             matrix[:, Card2Column[card]] = NumOnes2Array[num_times]
     return np.concatenate((matrix.flatten('F'), jokers))
 
-def _get_one_hot_array(num_left_cards, max_num_cards):
-    one_hot = np.zeros(max_num_cards, dtype=np.int8)
-    one_hot[num_left_cards - 1] = 1
-
-    return one_hot
-
-def _action_seq2array(action_seq_list):
-    action_seq_array = np.zeros((len(action_seq_list), 54), np.int8)
-    for row, cards in enumerate(action_seq_list):
-        action_seq_array[row, :] = _cards2array(cards)
-    action_seq_array = action_seq_array.flatten()
-    return action_seq_array
-
-def _process_action_seq(sequence, length=9):
-    sequence = [action[1] for action in sequence[-length:]]
-    if len(sequence) < length:
-        empty_sequence = ['' for _ in range(length - len(sequence))]
-        empty_sequence.extend(sequence)
-        sequence = empty_sequence
-    return sequence
+_ACTION_FEATURE_TABLE = None
+
+def _get_action_feature_table():
+    ''' Get the features of all the actions. The (27472, 54) table is built
+        once per process on first use.
+    '''
+    global _ACTION_FEATURE_TABLE
+    if _ACTION_FEATURE_TABLE is None:
+        from rlcard.games.doudizhu.utils import ID_2_ACTION
+        table = np.stack([_cards2array(action) for action in ID_2_ACTION])
+        table.flags.writeable = False
+        _ACTION_FEATURE_TABLE = table
+    return _ACTION_FEATURE_TABLE
+
+_NUM_ONES = np.stack([NumOnes2Array[num_times] for num_times in range(5)]).astype(np.int8)
+_NO_CARDS = np.zeros(54, dtype=np.int8)
+
+def _action2array(action):
+    if action in ('', 'pass'):
+        return _NO_CARDS
+    from rlcard.games.doudizhu.utils import ACTION_2_ID
+    return _get_action_feature_table()[ACTION_2_ID[action]]
+
+def _counts2array(counts):
+    ''' Encode rows of counts of the 15 ranks like _cards2array()
+    '''
+    arrays = np.empty((len(counts), 54), dtype=np.int8)
+    arrays[:, :52] = _NUM_ONES[counts[:, :13]].reshape(-1, 52)
+    arrays[:, 52:] = counts[:, 13:] > 0
+    return arrays
+
+class DoudizhuObservationEncoder:
+    ''' Keep the observations of the three seats up to date as the game moves,
+    instead of encoding them from the state at every step.
+
+    The observations are the rows of one (3, 901) buffer, the landlord's
+    being the first 790 entries of the first row. The game calls reset(),
+    step() and step_back(), which only rewrite the parts that a move
+    changes: the window of the last 9 actions and the last actions, and
+    after cards were played, the cards and the number of cards left.
+    get_obs() returns the observation of a seat as a read-only view, which
+    changes with the game.
+    '''
+    # The layout after the 9 last actions. The landlord (seat 0) sees the
+    # played cards and the number of cards left of the seats up (2) and down
+    # (1), a peasant those of the landlord and the teammate, and also their
+    # last actions.
+    PLAYED_CARDS = [{2: 648, 1: 702}, {0: 648, 2: 702}, {0: 648, 1: 702}]
+    LAST_ACTIONS = [{}, {0: 756, 2: 810}, {0: 756, 1: 810}]
+    NUM_CARDS_LEFT = [{2: (756, 17), 1: (773, 17)}, {0: (864, 20), 2: (884, 17)}, {0: (864, 20), 1: (884, 17)}]
+
+    def __init__(self):
+        self.buffer = np.zeros((3, 901), dtype=np.int8)
+        self._flat = self.buffer.reshape(-1)
+        self._views = []
+        for seat, size in enumerate((790, 901, 901)):
+            view = self.buffer[seat, :size]
+            view.flags.writeable = False
+            self._views.append(view)
+        self.players = []
+        self.played_cards = []
+        self.trace = []
+
+        # The rows of the counts of the hands, the hands of the others and
+        # the played cards, and where their encodings go in the buffer
+        rows, offsets = [], []
+        for seat in range(3):
+            rows.extend([seat, 3 + seat])
+            offsets.extend([901 * seat, 901 * seat + 54])
+            for player_id, offset in self.PLAYED_CARDS[seat].items():
+                rows.append(6 + player_id)
+                offsets.append(901 * seat + offset)
+        self._card_rows = np.array(rows)
+        self._card_slots = np.array(offsets)[:, None] + np.arange(54)
+
+        players, bases, sizes = [], [], []
+        for seat in range(3):
+            for player_id, (offset, size) in self.NUM_CARDS_LEFT[seat].items():
+                players.append(player_id)
+                bases.append(901 * seat + offset)
+                sizes.append(size)
+        self._one_hot_players = np.array(players)
+        self._one_hot_bases = np.array(bases)
+        self._one_hot_sizes = np.array(sizes)
+        self._one_hot_slots = np.concatenate([np.arange(base, base + size) for base, size in zip(bases, sizes)])
+
+        self._last_action_slots = {player_id: [] for player_id in range(3)}
+        for seat in range(3):
+            for player_id, offset in self.LAST_ACTIONS[seat].items():
+                self._last_action_slots[player_id].append(901 * seat + offset)
+        self._last_action_slots = {
+            player_id: np.array(offsets, dtype=np.int64)[:, None] + np.arange(54)
+            for player_id, offsets in self._last_action_slots.items()
+        }
+
+    def get_obs(self, player_id):
+        ''' Returns:
+            (numpy.array): A read-only view of the observation of a seat
+        '''
+        return self._views[player_id]
+
+    def reset(self, game):
+        ''' Encode the observations of a new game from scratch
+        '''
+        self.players = game.players
+        self.played_cards = game.played_cards
+        self.trace = game.round.trace
+        self.buffer[:] = 0
+        self._write_cards()
+
+    def step(self, player_id, action):
+        ''' Update the observations after a player took an action, which is
+        already in the trace
+        '''
+        action_array = _action2array(action)
+        self.buffer[:, 162:594] = self.buffer[:, 216:648]
+        self.buffer[:, 594:648] = action_array
+        if action != 'pass':
+            self._write_cards()
+        self._write_last_action()
+        self._flat[self._last_action_slots[player_id]] = action_array
+
+    def step_back(self, player_id, action):
+        ''' Update the observations after the last action of a player was
+        removed from the trace
+        '''
+        self.buffer[:, 216:648] = self.buffer[:, 162:594]
+        self.buffer[:, 162:216] = _action2array(self.trace[-9][1]) if len(self.trace) >= 9 else _NO_CARDS
+        if action != 'pass':
+            self._write_cards()
+        self._write_last_action()
+        last_action = ''
+        for i, previous_action in reversed(self.trace):
+            if i == player_id:
+                last_action = previous_action
+                break
+        self._flat[self._last_action_slots[player_id]] = _action2array(last_action)
+
+    def _write_cards(self):
+        ''' Rewrite the cards and the numbers of cards left in every
+        observation
+        '''
+        hand_counts = np.stack([player.hand_counts for player in self.players])
+        counts = np.concatenate((
+            hand_counts,
+            hand_counts.sum(0) - hand_counts,
+            np.stack(self.played_cards),
+        ))
+        self._flat[self._card_slots] = _counts2array(counts)[self._card_rows]
+        num_left_cards = hand_counts.sum(1)[self._one_hot_players]
+        self._flat[self._one_hot_slots] = 0
+        self._flat[self._one_hot_bases + (num_left_cards - 1) % self._one_hot_sizes] = 1
+
+    def _write_last_action(self):
+        last_action = ''
+        if self.trace:
+            if self.trace[-1][1] != 'pass':
+                last_action = self.trace[-1][1]
+            elif len(self.trace) > 1:
+                last_action = self.trace[-2][1]
+        self.buffer[:, 108:162] = _action2array(last_action)
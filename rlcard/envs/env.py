@@ -225,6 +225,17 @@ class Env(object):
         feature[action] = 1
         return feature
 
+    def get_action_features(self, actions):
+        ''' Get the features of several actions at once
+
+        Args:
+            actions (list): A list of action ids
+
+        Returns:
+            (numpy.array): The action features, one row for each action
+        '''
+        return np.stack([self.get_action_feature(action) for action in actions])
+
     def seed(self, seed=None):
         self.np_random, seed = seeding.np_random(seed)
         self.game.np_random = self.np_random
@@ -4,7 +4,7 @@ from collections import OrderedDict
 from rlcard.envs import Env
 from rlcard.games.mahjong import Game
 from rlcard.games.mahjong import Card
-from rlcard.games.mahjong.utils import card_encoding_dict, encode_cards, pile2list
+from rlcard.games.mahjong.utils import card_encoding_dict, encode_counts
 
 class MahjongEnv(Env):
     ''' Mahjong Environment
@@ -32,16 +32,7 @@ class MahjongEnv(Env):
                              the recent three actions
                              the union of all played cards
         '''
-        players_pile = state['players_pile']
-        hand_rep = encode_cards(state['current_hand'])
-        piles_rep = []
-        for p in players_pile.keys():
-            piles_rep.append(encode_cards(pile2list(players_pile[p])))
-        piles_rep = np.array(piles_rep)
-        table_rep = encode_cards(state['table'])
-        rep = [hand_rep, table_rep]
-        rep.extend(piles_rep)
-        obs = np.array(rep)
+        obs = self.get_obs(state['hand_player'])
 
         extracted_state = {'obs': obs, 'legal_actions': self._get_legal_actions()}
         extracted_state['raw_obs'] = state
@@ -50,6 +41,22 @@ class MahjongEnv(Env):
 
         return extracted_state
 
+    def get_obs(self, player_id=None, out=None):
+        ''' Encode the observation of a player from the tile counts of the round
+
+        Args:
+            player_id (int): The id of the player, the current player by default
+            out (numpy.array): A (6, 34, 4) array to write the observation in,
+                such as a slice of a shared buffer
+
+        Returns:
+            (numpy.array): The observation. The planes are the hand of the
+                player, the table and the piles of the four players
+        '''
+        if player_id is None:
+            player_id = self.game.round.current_player
+        return encode_counts(self.game.round.get_zone_counts(player_id), out=out)
+
     def get_payoffs(self):
         ''' Get the payoffs of players. Must be implemented in the child class.
 
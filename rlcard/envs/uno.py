@@ -3,8 +3,8 @@ from collections import OrderedDict
 
 from rlcard.envs import Env
 from rlcard.games.uno import Game
-from rlcard.games.uno.utils import encode_hand, encode_target
-from rlcard.games.uno.utils import ACTION_SPACE, ACTION_LIST
+from rlcard.games.uno.utils import encode_hand_counts, encode_target
+from rlcard.games.uno.utils import ACTION_LIST
 from rlcard.games.uno.utils import cards2list
 
 DEFAULT_GAME_CONFIG = {
@@ -23,7 +23,7 @@ class UnoEnv(Env):
 
     def _extract_state(self, state):
         obs = np.zeros((4, 4, 15), dtype=int)
-        encode_hand(obs[:3], state['hand'])
+        encode_hand_counts(obs[:3], self.game.round.hand_counts[state['player_id']])
         encode_target(obs[3], state['target'])
         legal_action_id = self._get_legal_actions()
         extracted_state = {'obs': obs, 'legal_actions': legal_action_id}
@@ -45,9 +45,8 @@ class UnoEnv(Env):
         return ACTION_LIST[np.random.choice(legal_ids)]
 
     def _get_legal_actions(self):
-        legal_actions = self.game.get_legal_actions()
-        legal_ids = {ACTION_SPACE[action]: None for action in legal_actions}
-        return OrderedDict(legal_ids)
+        legal_ids = self.game.get_legal_action_mask().nonzero()[0]
+        return OrderedDict.fromkeys(legal_ids.tolist())
 
     def get_perfect_information(self):
         ''' Get the perfect information of the current state
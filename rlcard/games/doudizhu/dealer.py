@@ -4,7 +4,7 @@
 import functools
 
 from rlcard.utils import init_54_deck
-from rlcard.games.doudizhu.utils import cards2str, doudizhu_sort_card
+from rlcard.games.doudizhu.utils import doudizhu_sort_card
 
 class DoudizhuDealer:
     ''' Dealer will shuffle, deal cards, and determine players' roles
@@ -33,10 +33,8 @@ class DoudizhuDealer:
         '''
         hand_num = (len(self.deck) - 3) // len(players)
         for index, player in enumerate(players):
-            current_hand = self.deck[index*hand_num:(index+1)*hand_num]
-            current_hand.sort(key=functools.cmp_to_key(doudizhu_sort_card))
-            player.set_current_hand(current_hand)
-            player.initial_hand = cards2str(player.current_hand)
+            player.set_current_hand(self.deck[index*hand_num:(index+1)*hand_num])
+            player.initial_hand = player.current_hand_str
 
     def determine_role(self, players):
         ''' Determine landlord and peasants according to players' hand
@@ -70,7 +68,6 @@ class DoudizhuDealer:
         #self.landlord.role = 'landlord'
 
         # give the 'landlord' the  three cards
-        self.landlord.current_hand.extend(self.deck[-3:])
-        self.landlord.current_hand.sort(key=functools.cmp_to_key(doudizhu_sort_card))
-        self.landlord.initial_hand = cards2str(self.landlord.current_hand)
+        self.landlord.set_current_hand(list(self.landlord.current_hand) + self.deck[-3:])
+        self.landlord.initial_hand = self.landlord.current_hand_str
         return self.landlord.player_id
@@ -1,11 +1,9 @@
 # -*- coding: utf-8 -*-
 ''' Implement Doudizhu Game class
 '''
-import functools
-from heapq import merge
 import numpy as np
 
-from rlcard.games.doudizhu.utils import cards2str, doudizhu_sort_card, CARD_RANK_STR
+from rlcard.games.doudizhu.utils import counts2str, CARD_RANK_STR, ID_2_ACTION
 from rlcard.games.doudizhu import Player
 from rlcard.games.doudizhu import Round
 from rlcard.games.doudizhu import Judger
@@ -19,6 +17,8 @@ class DoudizhuGame:
         self.allow_step_back = allow_step_back
         self.np_random = np.random.RandomState()
         self.num_players = 3
+        # Optional encoder of the observations, updated on every move
+        self.encoder = None
 
     def init_game(self):
         ''' Initialize players and state.
@@ -40,16 +40,27 @@ class DoudizhuGame:
                                 for _ in range(self.num_players)]
         self.round = Round(self.np_random, self.played_cards)
         self.round.initiate(self.players)
+        if self.encoder is not None:
+            self.encoder.reset(self)
 
         # initialize judger
         self.judger = Judger(self.players, self.np_random)
 
+        # the states and legal actions are computed on demand
+        self._states = {}
+        self._legal_action_ids = {}
+
         # get state of first player
         player_id = self.round.current_player
-        self.state = self.get_state(player_id)
 
         return self.state, player_id
 
+    @property
+    def state(self):
+        ''' The state of the current player, computed on first access
+        '''
+        return self.get_state(self.round.current_player)
+
     def step(self, action):
         ''' Perform one draw of the game
 
@@ -67,18 +78,18 @@ class DoudizhuGame:
         # perfrom action
         player = self.players[self.round.current_player]
         self.round.proceed_round(player, action)
+        if self.encoder is not None:
+            self.encoder.step(player.player_id, action)
         if (action != 'pass'):
-            self.judger.calc_playable_cards(player)
+            self.judger.invalidate_playable_cards(player)
         if self.judger.judge_game(self.players, self.round.current_player):
             self.winner_id = self.round.current_player
         next_id = (player.player_id+1) % len(self.players)
         self.round.current_player = next_id
+        self._states = {}
+        self._legal_action_ids = {}
 
-        # get next state
-        state = self.get_state(next_id)
-        self.state = state
-
-        return state, next_id
+        return self.state, next_id
 
     def step_back(self):
         ''' Return to the previous state of the game
@@ -104,11 +115,15 @@ class DoudizhuGame:
         if (cards != 'pass'):
             self.judger.restore_playable_cards(player_id)
 
-        self.state = self.get_state(self.round.current_player)
+        if self.encoder is not None:
+            self.encoder.step_back(player_id, cards)
+
+        self._states = {}
+        self._legal_action_ids = {}
         return True
 
     def get_state(self, player_id):
-        ''' Return player's state
+        ''' Return player's state, which is kept until the next step
 
         Args:
             player_id (int): player id
@@ -116,17 +131,38 @@ class DoudizhuGame:
         Returns:
             (dict): The state of the player
         '''
+        if player_id in self._states:
+            return self._states[player_id]
         player = self.players[player_id]
         others_hands = self._get_others_current_hand(player)
-        num_cards_left = [len(self.players[i].current_hand) for i in range(self.num_players)]
-        if self.is_over():
-            actions = []
-        else:
-            actions = list(player.available_actions(self.round.greater_player, self.judger))
+        num_cards_left = [self.players[i].num_cards for i in range(self.num_players)]
+        actions = [ID_2_ACTION[i] for i in self.get_legal_action_ids(player_id)]
         state = player.get_state(self.round.public, others_hands, num_cards_left, actions)
+        self._states[player_id] = state
 
         return state
 
+    def get_legal_action_ids(self, player_id=None):
+        ''' Return the ids of the legal actions of a player, which are kept
+        until the next step
+
+        Args:
+            player_id (int): player id, the current player by default
+
+        Returns:
+            (numpy.array): The ids of the legal actions
+        '''
+        if player_id is None:
+            player_id = self.round.current_player
+        if player_id not in self._legal_action_ids:
+            if self.is_over():
+                action_ids = np.zeros(0, dtype=np.int64)
+            else:
+                player = self.players[player_id]
+                action_ids = player.available_action_ids(self.round.greater_player, self.judger)
+            self._legal_action_ids[player_id] = action_ids
+        return self._legal_action_ids[player_id]
+
     @staticmethod
     def get_num_actions():
         ''' Return the total number of abstract acitons
@@ -165,5 +201,4 @@ class DoudizhuGame:
     def _get_others_current_hand(self, player):
         player_up = self.players[(player.player_id+1) % len(self.players)]
         player_down = self.players[(player.player_id-1) % len(self.players)]
-        others_hand = merge(player_up.current_hand, player_down.current_hand, key=functools.cmp_to_key(doudizhu_sort_card))
-        return cards2str(others_hand)
+        return counts2str(player_up.hand_counts + player_down.hand_counts)
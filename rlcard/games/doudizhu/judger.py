@@ -7,7 +7,8 @@ from itertools import combinations
 from bisect import bisect_left
 
 from rlcard.games.doudizhu.utils import CARD_RANK_STR, CARD_RANK_STR_INDEX
-from rlcard.games.doudizhu.utils import cards2str, contains_cards
+from rlcard.games.doudizhu.utils import ID_2_ACTION
+from rlcard.games.doudizhu.utils import cards2counts, playable_action_ids
 
 
 
@@ -257,55 +258,66 @@ class DoudizhuJudger:
             playable_cards.add(CARD_RANK_STR[13] + CARD_RANK_STR[14])
         return playable_cards
 
+    @staticmethod
+    def playable_action_ids_from_hand(current_hand):
+        ''' Get the ids of the playable cards from hand, the same cards as
+        playable_cards_from_hand() but looked up in the table of the actions
+
+        Args:
+            current_hand (string): string of the cards of the hand
+
+        Returns:
+            numpy.array: sorted ids of playable cards
+        '''
+        return playable_action_ids(cards2counts(current_hand))
+
     def __init__(self, players, np_random):
         ''' Initilize the Judger class for Dou Dizhu
         '''
-        self.playable_cards = [set() for _ in range(3)]
-        self._recorded_removed_playable_cards = [[] for _ in range(3)]
+        self.players = players
+        self.playable_action_ids = [None for _ in range(3)]
+        # Whether the playable cards of a player are recalculated on demand
+        self._stale = [False for _ in range(3)]
+        self._recorded_playable_action_ids = [[] for _ in range(3)]
         for player in players:
             player_id = player.player_id
-            current_hand = cards2str(player.current_hand)
-            self.playable_cards[player_id] = self.playable_cards_from_hand(current_hand)
+            self.playable_action_ids[player_id] = playable_action_ids(player.hand_counts)
+
+    @property
+    def playable_cards(self):
+        ''' The sets of string of playable cards of the players
+        '''
+        return [set(ID_2_ACTION[i] for i in self.get_playable_action_ids(player)) for player in self.players]
 
     def calc_playable_cards(self, player):
         ''' Recalculate all legal cards the player can play according to his
         current hand.
 
+        The hand only loses cards, so the playable cards are the previous ones
+        that the hand still contains.
+
         Args:
             player (DoudizhuPlayer object): object of DoudizhuPlayer
-            init_flag (boolean): For the first time, set it True to accelerate
-              the preocess.
 
         Returns:
             list: list of string of playable cards
         '''
-        removed_playable_cards = []
-
-        player_id = player.player_id
-        current_hand = cards2str(player.current_hand)
-        missed = None
-        for single in player.singles:
-            if single not in current_hand:
-                missed = single
-                break
+        self.invalidate_playable_cards(player)
+        return self.get_playable_cards(player)
 
-        playable_cards = self.playable_cards[player_id].copy()
+    def invalidate_playable_cards(self, player):
+        ''' Record the playable cards of the player for
+        restore_playable_cards(), and recalculate them only when they are
+        needed next. The playable cards of a hand are also playable cards of
+        the hands it came from, so the previous ones are narrowed down.
 
-        if missed is not None:
-            position = player.singles.find(missed)
-            player.singles = player.singles[position+1:]
-            for cards in playable_cards:
-                if missed in cards or (not contains_cards(current_hand, cards)):
-                    removed_playable_cards.append(cards)
-                    self.playable_cards[player_id].remove(cards)
-        else:
-            for cards in playable_cards:
-                if not contains_cards(current_hand, cards):
-                    #del self.playable_cards[player_id][cards]
-                    removed_playable_cards.append(cards)
-                    self.playable_cards[player_id].remove(cards)
-        self._recorded_removed_playable_cards[player_id].append(removed_playable_cards)
-        return self.playable_cards[player_id]
+        Args:
+            player (DoudizhuPlayer object): object of DoudizhuPlayer
+        '''
+        player_id = player.player_id
+        self._recorded_playable_action_ids[player_id].append(
+            (self.playable_action_ids[player_id], self._stale[player_id]))
+        self._stale[player_id] = True
 
     def restore_playable_cards(self, player_id):
         ''' restore playable_cards for judger for game.step_back().
@@ -313,8 +325,8 @@ class DoudizhuJudger:
         Args:
             player_id: The id of the player whose playable_cards need to be restored
         '''
-        removed_playable_cards = self._recorded_removed_playable_cards[player_id].pop()
-        self.playable_cards[player_id].update(removed_playable_cards)
+        self.playable_action_ids[player_id], self._stale[player_id] = \
+            self._recorded_playable_action_ids[player_id].pop()
 
     def get_playable_cards(self, player):
         ''' Provide all legal cards the player can play according to his
@@ -322,14 +334,28 @@ class DoudizhuJudger:
 
         Args:
             player (DoudizhuPlayer object): object of DoudizhuPlayer
-            init_flag (boolean): For the first time, set it True to accelerate
-              the preocess.
 
         Returns:
             list: list of string of playable cards
         '''
-        return self.playable_cards[player.player_id]
+        return [ID_2_ACTION[i] for i in self.get_playable_action_ids(player)]
+
+    def get_playable_action_ids(self, player):
+        ''' Provide the ids of all legal cards the player can play according
+        to his current hand.
 
+        Args:
+            player (DoudizhuPlayer object): object of DoudizhuPlayer
+
+        Returns:
+            numpy.array: sorted ids of playable cards
+        '''
+        player_id = player.player_id
+        if self._stale[player_id]:
+            self.playable_action_ids[player_id] = playable_action_ids(
+                player.hand_counts, self.playable_action_ids[player_id])
+            self._stale[player_id] = False
+        return self.playable_action_ids[player_id]
 
     @staticmethod
     def judge_game(players, player_id):
@@ -343,7 +369,7 @@ class DoudizhuJudger:
             (bool): True if the game is over
         '''
         player = players[player_id]
-        if not player.current_hand:
+        if player.num_cards == 0:
             return True
         return False
 
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 ''' Implement Doudizhu Player class
 '''
-import functools
+import numpy as np
 
-from rlcard.games.doudizhu.utils import get_gt_cards
-from rlcard.games.doudizhu.utils import cards2str, doudizhu_sort_card
+from rlcard.games.doudizhu.utils import ACTION_2_ID, ID_2_ACTION, get_gt_action_ids
+from rlcard.games.doudizhu.utils import CARD_RANK, CARD_RANK_STR_INDEX, counts2str
 
 
 class DoudizhuPlayer:
@@ -22,26 +22,50 @@ class DoudizhuPlayer:
             1. role: A player's temporary role in one game(landlord or peasant)
             2. played_cards: The cards played in one round
             3. hand: Initial cards
-            4. _current_hand: The rest of the cards after playing some of them
+            4. hand_counts: The numbers of the rest of the cards of each rank
+              after playing some of them, in the order of CARD_RANK_STR
+            5. _cards_by_rank: The Card objects of the rest of the cards
+              of each rank, only kept for their suits
         '''
         self.np_random = np_random
         self.player_id = player_id
         self.initial_hand = None
-        self._current_hand = []
+        self.hand_counts = np.zeros(len(CARD_RANK), dtype=np.int8)
+        self.num_cards = 0
+        self._cards_by_rank = [[] for _ in CARD_RANK]
+        self._hand_str = ''
         self.role = ''
         self.played_cards = None
-        self.singles = '3456789TJQKA2BR'
 
-        #record cards removed from self._current_hand for each play()
-        # and restore cards back to self._current_hand when play_back()
+        #record cards removed from the hand for each play()
+        # and restore cards back to the hand when play_back()
         self._recorded_played_cards = []
 
     @property
     def current_hand(self):
-        return self._current_hand
+        ''' The Card objects of the rest of the cards, sorted by rank. The
+            hand is kept as the counts of the ranks, so this is a read-only
+            tuple built on every call. Use set_current_hand() to change it
+        '''
+        return tuple(card for cards in self._cards_by_rank for card in cards)
+
+    @property
+    def current_hand_str(self):
+        ''' The string of the rest of the cards, sorted by rank. Eg: '3345BR'
+        '''
+        if self._hand_str is None:
+            self._hand_str = counts2str(self.hand_counts)
+        return self._hand_str
 
     def set_current_hand(self, value):
-        self._current_hand = value
+        ''' Set the hand from a list of Card objects
+        '''
+        self._cards_by_rank = [[] for _ in CARD_RANK]
+        for card in value:
+            self._cards_by_rank[CARD_RANK.index(card.rank or card.suit)].append(card)
+        self.hand_counts = np.array([len(cards) for cards in self._cards_by_rank], dtype=np.int8)
+        self.num_cards = len(value)
+        self._hand_str = None
 
     def get_state(self, public, others_hands, num_cards_left, actions):
         state = {}
@@ -50,7 +74,7 @@ class DoudizhuPlayer:
         state['trace'] = public['trace'].copy()
         state['played_cards'] = public['played_cards']
         state['self'] = self.player_id
-        state['current_hand'] = cards2str(self._current_hand)
+        state['current_hand'] = self.current_hand_str
         state['others_hand'] = others_hands
         state['num_cards_left'] = num_cards_left
         state['actions'] = actions
@@ -68,12 +92,24 @@ class DoudizhuPlayer:
         Returns:
             list: list of string of actions. Eg: ['pass', '8', '9', 'T', 'J']
         '''
-        actions = []
+        return [ID_2_ACTION[i] for i in self.available_action_ids(greater_player, judger)]
+
+    def available_action_ids(self, greater_player=None, judger=None):
+        ''' Get the ids of the actions can be made based on the rules
+
+        Args:
+            greater_player (DoudizhuPlayer object): player who played
+        current biggest cards.
+            judger (DoudizhuJudger object): object of DoudizhuJudger
+
+        Returns:
+            numpy.array: ids of actions, starting with 'pass' if the player
+              can pass
+        '''
         if greater_player is None or greater_player.player_id == self.player_id:
-            actions = judger.get_playable_cards(self)
-        else:
-            actions = get_gt_cards(self, greater_player)
-        return actions
+            return judger.get_playable_action_ids(self)
+        gt_action_ids = get_gt_action_ids(self.hand_counts, greater_player.played_cards)
+        return np.concatenate(([ACTION_2_ID['pass']], gt_action_ids))
 
     def play(self, action, greater_player=None):
         ''' Perfrom action
@@ -85,7 +121,6 @@ class DoudizhuPlayer:
         Returns:
             object of DoudizhuPlayer: If there is a new greater_player, return it, if not, return None
         '''
-        trans = {'B': 'BJ', 'R': 'RJ'}
         if action == 'pass':
             self._recorded_played_cards.append([])
             return greater_player
@@ -93,23 +128,23 @@ class DoudizhuPlayer:
             removed_cards = []
             self.played_cards = action
             for play_card in action:
-                if play_card in trans:
-                    play_card = trans[play_card]
-                for _, remain_card in enumerate(self._current_hand):
-                    if remain_card.rank != '':
-                        remain_card = remain_card.rank
-                    else:
-                        remain_card = remain_card.suit
-                    if play_card == remain_card:
-                        removed_cards.append(self.current_hand[_])
-                        self._current_hand.remove(self._current_hand[_])
-                        break
+                rank = CARD_RANK_STR_INDEX[play_card]
+                if self._cards_by_rank[rank]:
+                    removed_cards.append(self._cards_by_rank[rank].pop(0))
+                    self.hand_counts[rank] -= 1
+            self.num_cards -= len(removed_cards)
+            self._hand_str = None
             self._recorded_played_cards.append(removed_cards)
             return self
 
     def play_back(self):
-        ''' Restore recorded cards back to self._current_hand
+        ''' Restore recorded cards back to the hand
         '''
         removed_cards = self._recorded_played_cards.pop()
-        self._current_hand.extend(removed_cards)
-        self._current_hand.sort(key=functools.cmp_to_key(doudizhu_sort_card))
+        for card in reversed(removed_cards):
+            rank = CARD_RANK.index(card.rank or card.suit)
+            self._cards_by_rank[rank].insert(0, card)
+            self.hand_counts[rank] += 1
+        if removed_cards:
+            self.num_cards += len(removed_cards)
+            self._hand_str = None
@@ -2,41 +2,18 @@
 '''
 import os
 import json
+import zipfile
+import functools
 from collections import OrderedDict
 import threading
 import collections
 
+import numpy as np
+
 import rlcard
 
-# Read required docs
 ROOT_PATH = rlcard.__path__[0]
 
-if not os.path.isfile(os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/action_space.txt')) \
-        or not os.path.isfile(os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/card_type.json')) \
-        or not os.path.isfile(os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/type_card.json')):
-    import zipfile
-    with zipfile.ZipFile(os.path.join(ROOT_PATH, 'games/doudizhu/jsondata.zip'),"r") as zip_ref:
-        zip_ref.extractall(os.path.join(ROOT_PATH, 'games/doudizhu/'))
-
-# Action space
-action_space_path = os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/action_space.txt')
-with open(action_space_path, 'r') as f:
-    ID_2_ACTION = f.readline().strip().split()
-    ACTION_2_ID = {}
-    for i, action in enumerate(ID_2_ACTION):
-        ACTION_2_ID[action] = i
-
-# a map of card to its type. Also return both dict and list to accelerate
-card_type_path = os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/card_type.json')
-with open(card_type_path, 'r') as f:
-    data = json.load(f, object_pairs_hook=OrderedDict)
-    CARD_TYPE = (data, list(data), set(data))
-
-# a map of type to its cards
-type_card_path = os.path.join(ROOT_PATH, 'games/doudizhu/jsondata/type_card.json')
-with open(type_card_path, 'r') as f:
-    TYPE_CARD = json.load(f, object_pairs_hook=OrderedDict)
-
 # rank list of solo character of cards
 CARD_RANK_STR = ['3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K',
                  'A', '2', 'B', 'R']
@@ -53,6 +30,171 @@ INDEX = {'3': 0, '4': 1, '5': 2, '6': 3, '7': 4,
 INDEX = OrderedDict(sorted(INDEX.items(), key=lambda t: t[1]))
 
 
+# The rule tables: the action space, and the type and weight of every action.
+# They are shipped as arrays in rule_tables.npz, which build_rule_tables()
+# derives from the JSON files in jsondata.zip, and only loaded on first use.
+RULE_TABLES_PATH = os.path.join(ROOT_PATH, 'games/doudizhu/rule_tables.npz')
+JSONDATA_PATH = os.path.join(ROOT_PATH, 'games/doudizhu/jsondata.zip')
+
+def _pool(strings):
+    offsets = np.zeros(len(strings) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(string) for string in strings])
+    chars = np.frombuffer(''.join(strings).encode('ascii'), dtype=np.uint8)
+    return chars, offsets
+
+def _unpool(chars, offsets):
+    pool = chars.tobytes().decode('ascii')
+    offsets = offsets.tolist()
+    return [pool[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+def build_rule_tables(jsondata_path=JSONDATA_PATH):
+    ''' Read the rule tables from the JSON files in jsondata.zip, without
+    extracting them
+
+    Args:
+        jsondata_path (str): The path of jsondata.zip
+
+    Returns:
+        dict: The arrays of the rule tables
+    '''
+    with zipfile.ZipFile(jsondata_path, 'r') as zip_ref:
+        id_2_action = zip_ref.read('jsondata/action_space.txt').decode('ascii').split()
+        card_type = json.loads(zip_ref.read('jsondata/card_type.json'), object_pairs_hook=OrderedDict)
+        type_card = json.loads(zip_ref.read('jsondata/type_card.json'), object_pairs_hook=OrderedDict)
+    action_2_id = {action: i for i, action in enumerate(id_2_action)}
+    if id_2_action[-1] != 'pass':
+        raise ValueError('The last action should be pass')
+    # Only the types of type_card.json are stored, so they should be the
+    # single type of every action in card_type.json
+    types_of_cards = {
+        cards: [card_type, weight]
+        for card_type, weights in type_card.items()
+        for weight, cards_list in weights.items()
+        for cards in cards_list
+    }
+    for cards, types in card_type.items():
+        if types != [types_of_cards.get(cards)]:
+            raise ValueError('Every action should have exactly one type: ' + cards)
+
+    # The ids of every type are sorted by weight, so that the greater
+    # actions of a type are found by a binary search
+    type_card_ids, type_card_weights, type_card_offsets = [], [], [0]
+    for weights in type_card.values():
+        for weight, cards_list in sorted(weights.items(), key=lambda item: int(item[0])):
+            type_card_ids.extend(action_2_id[cards] for cards in cards_list)
+            type_card_weights.extend(int(weight) for _ in cards_list)
+        type_card_offsets.append(len(type_card_ids))
+
+    action_chars, action_offsets = _pool(id_2_action)
+    type_chars, type_offsets = _pool(list(type_card))
+    return {
+        'action_chars': action_chars,
+        'action_offsets': action_offsets,
+        'action_card_counts': np.stack([cards2counts(action) for action in id_2_action[:-1]]),
+        'type_chars': type_chars,
+        'type_offsets': type_offsets,
+        'type_card_ids': np.array(type_card_ids, dtype=np.int32),
+        'type_card_weights': np.array(type_card_weights, dtype=np.int8),
+        'type_card_offsets': np.array(type_card_offsets, dtype=np.int32),
+        'card_type_ids': np.array([action_2_id[cards] for cards in card_type], dtype=np.int32),
+    }
+
+def save_rule_tables(path=RULE_TABLES_PATH, jsondata_path=JSONDATA_PATH):
+    ''' Regenerate rule_tables.npz from jsondata.zip
+    '''
+    np.savez_compressed(path, **build_rule_tables(jsondata_path))
+
+@functools.lru_cache(maxsize=None)
+def _rule_tables():
+    if os.path.isfile(RULE_TABLES_PATH):
+        with np.load(RULE_TABLES_PATH) as tables:
+            return {key: tables[key] for key in tables.files}
+    return build_rule_tables()
+
+@functools.lru_cache(maxsize=None)
+def _id_2_action():
+    tables = _rule_tables()
+    return _unpool(tables['action_chars'], tables['action_offsets'])
+
+@functools.lru_cache(maxsize=None)
+def _action_2_id():
+    return {action: i for i, action in enumerate(_id_2_action())}
+
+@functools.lru_cache(maxsize=None)
+def _type_names():
+    tables = _rule_tables()
+    return _unpool(tables['type_chars'], tables['type_offsets'])
+
+@functools.lru_cache(maxsize=None)
+def _type_action_ids():
+    tables = _rule_tables()
+    offsets = tables['type_card_offsets'].tolist()
+    ids = tables['type_card_ids'].astype(np.int64)
+    weights = tables['type_card_weights'].astype(np.int64)
+    for card_type, start, end in zip(_type_names(), offsets[:-1], offsets[1:]):
+        if np.any(np.diff(weights[start:end]) < 0):
+            raise ValueError('The actions of type %s are not sorted by weight, '
+                             'regenerate the rule tables with save_rule_tables()' % card_type)
+    return OrderedDict(
+        (card_type, (ids[start:end], weights[start:end]))
+        for card_type, start, end in zip(_type_names(), offsets[:-1], offsets[1:])
+    )
+
+@functools.lru_cache(maxsize=None)
+def _action_types():
+    ''' The index of the type and the weight of every action except pass '''
+    tables = _rule_tables()
+    num_actions = len(tables['action_card_counts'])
+    types = np.zeros(num_actions, dtype=np.int8)
+    weights = np.zeros(num_actions, dtype=np.int8)
+    offsets = tables['type_card_offsets']
+    ids = tables['type_card_ids']
+    types[ids] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    weights[ids] = tables['type_card_weights']
+    return types, weights
+
+def _card_type():
+    id_2_action = _id_2_action()
+    type_names = _type_names()
+    types, weights = _action_types()
+    data = OrderedDict()
+    for i in _rule_tables()['card_type_ids'].tolist():
+        data[id_2_action[i]] = [[type_names[types[i]], str(weights[i])]]
+    return (data, list(data), set(data))
+
+def _type_card():
+    id_2_action = _id_2_action()
+    type_card = OrderedDict()
+    for card_type, (ids, weights) in _type_action_ids().items():
+        type_card[card_type] = OrderedDict()
+        for i, weight in zip(ids.tolist(), weights.tolist()):
+            type_card[card_type].setdefault(str(weight), []).append(id_2_action[i])
+    return type_card
+
+_LAZY_TABLES = {
+    # Action space
+    'ID_2_ACTION': _id_2_action,
+    'ACTION_2_ID': _action_2_id,
+    # The counts of the cards of every action except 'pass', which is the
+    # last action. Every way of playing cards that the rules allow is an
+    # action, so the actions that a hand can play are the ones it contains.
+    'ACTION_CARD_COUNTS': lambda: _rule_tables()['action_card_counts'],
+    # The action ids of every card type sorted by weight, and their weights,
+    # so that the actions of a type greater than a weight are a slice
+    'TYPE_ACTION_IDS': _type_action_ids,
+    # a map of card to its type. Also return both dict and list to accelerate
+    'CARD_TYPE': _card_type,
+    # a map of type to its cards
+    'TYPE_CARD': _type_card,
+}
+
+def __getattr__(name):
+    if name in _LAZY_TABLES:
+        value = _LAZY_TABLES[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
 def doudizhu_sort_str(card_1, card_2):
     ''' Compare the rank of two cards of str representation
 
@@ -192,6 +334,47 @@ def contains_cards(candidate, target):
         return False
     return True
 
+def cards2counts(cards):
+    ''' Get the number of cards of each rank
+
+    Args:
+        cards (string): A string representing the cards. Eg: '33345'
+
+    Returns:
+        numpy.array: The counts of the 15 ranks in the order of CARD_RANK_STR
+    '''
+    counts = np.zeros(len(CARD_RANK_STR), dtype=np.int8)
+    for card in cards:
+        counts[CARD_RANK_STR_INDEX[card]] += 1
+    return counts
+
+def counts2str(counts):
+    ''' Get the string of cards from the number of cards of each rank
+
+    Args:
+        counts (numpy.array): The counts of the 15 ranks in the order of CARD_RANK_STR
+
+    Returns:
+        string: string representation of cards, sorted by rank
+    '''
+    return ''.join([rank * count for rank, count in zip(CARD_RANK_STR, counts.tolist())])
+
+def playable_action_ids(counts, candidates=None):
+    ''' Get the ids of the actions that can be played from a hand
+
+    Args:
+        counts (numpy.array): The counts of the ranks of the hand
+        candidates (numpy.array): Only consider these action ids, all actions
+          except 'pass' by default
+
+    Returns:
+        numpy.array: The sorted ids of the playable actions
+    '''
+    action_card_counts = _rule_tables()['action_card_counts']
+    if candidates is None:
+        return np.flatnonzero((action_card_counts <= counts).all(1))
+    return candidates[(action_card_counts[candidates] <= counts).all(1)]
+
 def encode_cards(plane, cards):
     ''' Encode cards and represerve it into plane.
 
@@ -222,6 +405,34 @@ def encode_cards(plane, cards):
         plane[0][rank] = 0
 
 
+def get_gt_action_ids(current_counts, target_cards):
+    ''' Provide the ids of the actions of a hand which are greater than
+    the target cards
+
+    Args:
+        current_counts (numpy.array): The counts of the ranks of the hand
+        target_cards (string): The cards to beat
+
+    Returns:
+        numpy.array: ids of greater cards, without 'pass'
+    '''
+    target_id = _action_2_id()[target_cards]
+    types, weights = _action_types()
+    target_type = _type_names()[types[target_id]]
+    if target_type == 'rocket':
+        return np.zeros(0, dtype=np.int64)
+    type_dict = OrderedDict([(target_type, int(weights[target_id]))])
+    type_dict.setdefault('rocket', -1)
+    type_dict.setdefault('bomb', -1)
+    candidates = []
+    type_action_ids = _type_action_ids()
+    for card_type, weight in type_dict.items():
+        ids, type_weights = type_action_ids[card_type]
+        candidates.append(ids[np.searchsorted(type_weights, weight, side='right'):])
+    # Every action has a single type, so the candidates are distinct
+    candidates = np.concatenate(candidates)
+    return playable_action_ids(current_counts, candidates)
+
 def get_gt_cards(player, greater_player):
     ''' Provide player's cards which are greater than the ones played by
     previous player in one round
@@ -237,26 +448,6 @@ def get_gt_cards(player, greater_player):
         1. return value contains 'pass'
     '''
     # add 'pass' to legal actions
-    gt_cards = ['pass']
-    current_hand = cards2str(player.current_hand)
-    target_cards = greater_player.played_cards
-    target_types = CARD_TYPE[0][target_cards]
-    type_dict = {}
-    for card_type, weight in target_types:
-        if card_type not in type_dict:
-            type_dict[card_type] = weight
-    if 'rocket' in type_dict:
-        return gt_cards
-    type_dict['rocket'] = -1
-    if 'bomb' not in type_dict:
-        type_dict['bomb'] = -1
-    for card_type, weight in type_dict.items():
-        candidate = TYPE_CARD[card_type]
-        for can_weight, cards_list in candidate.items():
-            if int(can_weight) > int(weight):
-                for cards in cards_list:
-                    # TODO: improve efficiency
-                    if cards not in gt_cards and contains_cards(current_hand, cards):
-                        # if self.contains_cards(current_hand, cards):
-                        gt_cards.append(cards)
-    return gt_cards
+    gt_action_ids = get_gt_action_ids(player.hand_counts, greater_player.played_cards)
+    id_2_action = _id_2_action()
+    return ['pass'] + [id_2_action[i] for i in gt_action_ids]
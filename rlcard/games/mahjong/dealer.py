@@ -25,6 +25,29 @@ class MahjongDealer:
         for _ in range(num):
             player.hand.append(self.deck.pop())
 
+    def snapshot(self):
+        ''' Save what one step can change in the dealer. A step deals at most
+            one card from the deck and plays or takes back at most one card of
+            the table, so the lengths and the last cards are enough
+
+        Returns:
+            (tuple): The snapshot for `restore`
+        '''
+        return len(self.deck), self.deck[-1:], len(self.table), self.table[-1:]
+
+    def restore(self, snapshot):
+        ''' Restore the deck and the table of a snapshot
+
+        Args:
+            snapshot (tuple): The snapshot taken by `snapshot`
+        '''
+        num_deck, deck_top, num_table, table_top = snapshot
+        if len(self.deck) < num_deck:
+            self.deck.extend(deck_top)
+        del self.table[num_table:]
+        if len(self.table) < num_table:
+            self.table.extend(table_top)
+
 
 ## For test
 #if __name__ == '__main__':
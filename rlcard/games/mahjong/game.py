@@ -1,5 +1,4 @@
 import numpy as np
-from copy import deepcopy
 
 from rlcard.games.mahjong import Dealer
 from rlcard.games.mahjong import Player
@@ -37,12 +36,12 @@ class MahjongGame:
 
         # Deal 13 cards to each player to prepare for the game
         for player in self.players:
-            self.dealer.deal_cards(player, 13)
+            self.round.deal_cards(player, 13)
 
         # Save the hisory for stepping back to the last state.
         self.history = []
 
-        self.dealer.deal_cards(self.players[self.round.current_player], 1)
+        self.round.deal_cards(self.players[self.round.current_player], 1)
         state = self.get_state(self.round.current_player)
         self.cur_state = state
         return state, self.round.current_player
@@ -61,10 +60,8 @@ class MahjongGame:
         '''
         # First snapshot the current state
         if self.allow_step_back:
-            hist_dealer = deepcopy(self.dealer)
-            hist_round = deepcopy(self.round)
-            hist_players = deepcopy(self.players)
-            self.history.append((hist_dealer, hist_players, hist_round))
+            hist_players = [player.snapshot() for player in self.players]
+            self.history.append((self.dealer.snapshot(), hist_players, self.round.snapshot()))
         self.round.proceed_round(self.players, action)
         state = self.get_state(self.round.current_player)
         self.cur_state = state
@@ -78,7 +75,11 @@ class MahjongGame:
         '''
         if not self.history:
             return False
-        self.dealer, self.players, self.round = self.history.pop()
+        hist_dealer, hist_players, hist_round = self.history.pop()
+        self.dealer.restore(hist_dealer)
+        for player, snapshot in zip(self.players, hist_players):
+            player.restore(snapshot)
+        self.round.restore(hist_round)
         return True
 
     def get_state(self, player_id):
@@ -2,7 +2,9 @@
 ''' Implement Mahjong Judger class
 '''
 from collections import defaultdict
-import numpy as np
+from functools import lru_cache
+
+from rlcard.games.mahjong.utils import card_encoding_dict, cards2counts
 
 class MahjongJudger:
     ''' Determine what cards a player can play
@@ -14,38 +16,39 @@ class MahjongJudger:
         self.np_random = np_random
 
     @staticmethod
-    def judge_pong_gong(dealer, players, last_player):
+    def judge_pong_gong(dealer, players, last_player, hand_counts=None):
         ''' Judge which player has pong/gong
         Args:
             dealer (object): The dealer object.
             players (list): List of all players
             last_player (int): The player id of last player
+            hand_counts (numpy.array): The tile counts of the hands of the players,
+                counted from the hands if not given
 
         '''
         last_card = dealer.table[-1]
-        last_card_str = last_card.get_str()
-        #last_card_value = last_card_str.split("-")[-1]
-        #last_card_type = last_card_str.split("-")[0]
+        tile = card_encoding_dict[last_card.get_str()]
         for player in players:
-            hand = [card.get_str() for card in player.hand]
-            hand_dict = defaultdict(list)
-            for card in hand:
-                hand_dict[card.split("-")[0]].append(card.split("-")[1])
-            #pile = player.pile
+            if hand_counts is None:
+                count = cards2counts(player.hand)[tile]
+            else:
+                count = hand_counts[player.player_id, tile]
             # check gong
-            if hand.count(last_card_str) == 3 and last_player != player.player_id:
+            if count == 3 and last_player != player.player_id:
                 return 'gong', player, [last_card]*4
             # check pong
-            if hand.count(last_card_str) == 2 and last_player != player.player_id:
+            if count == 2 and last_player != player.player_id:
                 return 'pong', player, [last_card]*3
         return False, None, None
 
-    def judge_chow(self, dealer, players, last_player):
+    def judge_chow(self, dealer, players, last_player, hand_counts=None):
         ''' Judge which player has chow
         Args:
             dealer (object): The dealer object.
             players (list): List of all players
             last_player (int): The player id of last player
+            hand_counts (numpy.array): The tile counts of the hands of the players,
+                counted from the hands if not given
         '''
 
         last_card = dealer.table[-1]
@@ -58,11 +61,11 @@ class MahjongJudger:
                 # Numbers in each dimension represent how many of that card the player has it in hand
                 # If the last_card_type is 'characters' for example, and the player has cards: characters_3, characters_6, characters_3,
                 # The hand_list vector looks like: [0,0,2,0,0,1,0,0,0]
-                hand_list = np.zeros(9)
-
-                for card in player.hand:
-                    if card.get_str().split("-")[0] == last_card_type:
-                        hand_list[card.index_num] = hand_list[card.index_num]+1
+                start = card_encoding_dict[last_card_type+'-1']
+                if hand_counts is None:
+                    hand_list = cards2counts(player.hand)[start:start+9]
+                else:
+                    hand_list = hand_counts[player.player_id, start:start+9]
 
                 #pile = player.pile
                 #check chow
@@ -101,7 +104,7 @@ class MahjongJudger:
         players_val = []
         win_player = -1
         for player in game.players:
-            win, val = self.judge_hu(player)
+            win, val = game.round.judge_hu(player)
             players_val.append(val)
             if win:
                 win_player = player.player_id
@@ -120,34 +123,104 @@ class MahjongJudger:
             Result (bool): Win or not
             Maximum_score (int): Set count score of the player
         '''
-        set_count = 0
-        hand = [card.get_str() for card in player.hand]
-        count_dict = {card: hand.count(card) for card in hand}
-        set_count = len(player.pile)
-        if set_count >= 4:
-            return True, set_count
-        used = []
+        counts = [0] * 34
+        order = []
+        for card in player.hand:
+            tile = card_encoding_dict[card.get_str()]
+            if not counts[tile]:
+                order.append(tile)
+            counts[tile] += 1
+        return self.judge_hu_from_counts(counts, len(player.pile), order)
+
+    @staticmethod
+    def judge_hu_from_counts(counts, num_piles, order=None):
+        ''' Judge whether a hand wins from its tile counts
+
+        It gives the same results as `cal_set` tried on every pair of the
+        hand, without building any string. Pairs are tried in `order`,
+        the tiles in the order they first appear in the hand, since the tiles
+        used by the chows of a pair are not tried as pairs any more.
+
+        Args:
+            counts (list): The number of every tile in hand, indexed by `card_encoding_dict`
+            num_piles (int): The number of sets in the pile of the player
+            order (list): The tiles to try as pairs. All the tiles by default
+
+        Return:
+            Result (bool): Win or not
+            Maximum_score (int): Set count score of the player
+        '''
+        if num_piles >= 4:
+            return True, num_piles
+        if order is None:
+            order = range(34)
+        suit_sets = [MahjongJudger._cal_suit_set(tuple(counts[start:start+9])) for start in (0, 9, 18)]
+        base_count = num_piles + sum(1 for count in counts[27:] if count >= 3)
+        used = [0, 0, 0]
         maximum = 0
-        for each in count_dict:
-            if each in used:
+        for tile in order:
+            if counts[tile] != 2:
                 continue
-            tmp_set_count = 0
-            tmp_hand = hand.copy()
-            if count_dict[each] == 2:
-                for _ in range(count_dict[each]):
-                    tmp_hand.pop(tmp_hand.index(each))
-                tmp_set_count, _set = self.cal_set(tmp_hand)
-                used.extend(_set)
-                if tmp_set_count + set_count > maximum:
-                    maximum = tmp_set_count + set_count
-                if tmp_set_count + set_count >= 4:
-                    #print(player.get_player_id(), sorted([card.get_str() for card in player.hand]))
-                    #print([[c.get_str() for c in s] for s in player.pile])
-                    #print(len(player.hand), sum([len(s) for s in player.pile]))
-                    #exit()
-                    return True, maximum
+            suit, rank = divmod(tile, 9)
+            sets = suit_sets
+            if suit < 3:  # Dragons and winds never make a chow
+                if used[suit] >> rank & 1:
+                    continue
+                suit_counts = list(counts[9*suit:9*suit+9])
+                suit_counts[rank] -= 2
+                sets = list(suit_sets)
+                sets[suit] = MahjongJudger._cal_suit_set(tuple(suit_counts))
+            set_count = base_count + sets[0][0] + sets[1][0] + sets[2][0]
+            for i in range(3):
+                used[i] |= sets[i][1]
+            if set_count > maximum:
+                maximum = set_count
+            if set_count >= 4:
+                return True, maximum
         return False, maximum
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cal_suit_set(counts):
+        ''' Calculate the sets of one suit like `cal_set`
+
+        Pongs and gangs are taken first, then the chows are found by the same
+        scan over the sorted ranks. Suits are independent in `cal_set`, so the
+        result only depends on the counts of the suit and is cached.
+
+        Args:
+            counts (tuple): The number of every rank of the suit
+
+        Return:
+            Set_count (int): The number of sets
+            Used (int): The bit mask of the ranks used by the chows
+        '''
+        set_count = 0
+        values = []
+        for rank, count in enumerate(counts):
+            if count == 3 or count == 4:
+                set_count += 1
+            else:
+                values.extend([rank] * count)
+        used = 0
+        if len(values) > 2:
+            # The list shrinks while it is scanned, as in `cal_set`
+            index = 0
+            while index < len(values):
+                if index == 0:
+                    test_case = values[0:3]
+                elif index == len(values)-1:
+                    test_case = [values[index-2], values[index-1], values[index]]
+                else:
+                    test_case = values[index-1:index+2]
+                if sorted(test_case) == list(range(min(test_case), max(test_case)+1)):
+                    set_count += 1
+                    for rank in test_case:
+                        values.remove(rank)
+                        used |= 1 << rank
+                index += 1
+        return set_count, used
+
     @staticmethod
     def check_consecutive(_list):
         ''' Check if list is consecutive
@@ -28,6 +28,24 @@ class MahjongPlayer:
         '''
         print([[c.get_str() for c in s]for s in self.pile])
 
+    def snapshot(self):
+        ''' Save the hand and the number of sets in the pile. Sets are only
+            appended to the pile
+
+        Returns:
+            (tuple): The snapshot for `restore`
+        '''
+        return list(self.hand), len(self.pile)
+
+    def restore(self, snapshot):
+        ''' Restore the hand and the pile of a snapshot
+
+        Args:
+            snapshot (tuple): The snapshot taken by `snapshot`
+        '''
+        self.hand, num_piles = snapshot
+        del self.pile[num_piles:]
+
     def play_card(self, dealer, card):
         ''' Play one card
         Args:
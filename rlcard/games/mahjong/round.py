@@ -1,3 +1,6 @@
+import numpy as np
+
+from rlcard.games.mahjong.utils import card_encoding_dict, cards2counts
 
 class MahjongRound:
 
@@ -23,6 +26,91 @@ class MahjongRound:
         self.prev_status = None
         self.valid_act = False
         self.last_cards = []
+        # The number of every tile in the hand of every player
+        self.hand_counts = np.zeros((num_players, 34), dtype=np.int8)
+        # The number of every tile on the table and in the pile of every player
+        self.table_counts = np.zeros(34, dtype=np.int8)
+        self.pile_counts = np.zeros((num_players, 34), dtype=np.int8)
+        self.hu_results = [None for _ in range(num_players)]
+
+    def snapshot(self):
+        ''' Save the attributes that `proceed_round` changes
+
+        Returns:
+            (tuple): The snapshot for `restore`
+        '''
+        return (self.current_player, self.last_player, self.player_before_act,
+                self.valid_act, self.last_cards, self.hand_counts.copy(), list(self.hu_results),
+                self.table_counts.copy(), self.pile_counts.copy())
+
+    def restore(self, snapshot):
+        ''' Restore the attributes of a snapshot
+
+        Args:
+            snapshot (tuple): The snapshot taken by `snapshot`
+        '''
+        (self.current_player, self.last_player, self.player_before_act,
+         self.valid_act, self.last_cards, self.hand_counts, self.hu_results,
+         self.table_counts, self.pile_counts) = snapshot
+
+    def deal_cards(self, player, num):
+        ''' Deal some cards from the dealer to one player and count them
+
+        Args:
+            player (object): object of MahjongPlayer
+            num (int): The number of cards to be dealed
+        '''
+        self.dealer.deal_cards(player, num)
+        counts = self.hand_counts[player.player_id]
+        for card in player.hand[len(player.hand)-num:]:
+            counts[card_encoding_dict[card.get_str()]] += 1
+        self.hu_results[player.player_id] = None
+
+    def count_claim(self, player, cards):
+        ''' Count the hand of a player again and the set added to the pile
+            after a pong, gong or chow
+
+        Args:
+            player (object): object of MahjongPlayer
+            cards (list): The cards of the set
+        '''
+        self.hand_counts[player.player_id] = cards2counts(player.hand)
+        self.pile_counts[player.player_id] += cards2counts(cards)
+        self.hu_results[player.player_id] = None
+
+    def get_zone_counts(self, player_id):
+        ''' Get the tile counts observed by a player
+
+        Args:
+            player_id (int): The id of the player
+
+        Returns:
+            (numpy.array): The counts of the hand of the player, the table and
+                the pile of every player, one zone per row
+        '''
+        zones = np.empty((2 + self.num_players, 34), dtype=np.int8)
+        zones[0] = self.hand_counts[player_id]
+        zones[1] = self.table_counts
+        zones[2:] = self.pile_counts
+        return zones
+
+    def judge_hu(self, player):
+        ''' Judge whether the player has win the game. The result is only
+            calculated again when the hand or the pile of the player changed
+
+        Args:
+            player (object): object of MahjongPlayer
+
+        Return:
+            Result (bool): Win or not
+            Maximum_score (int): Set count score of the player
+        '''
+        result = self.hu_results[player.player_id]
+        if result is None:
+            order = dict.fromkeys(card_encoding_dict[card.get_str()] for card in player.hand)
+            result = self.judger.judge_hu_from_counts(self.hand_counts[player.player_id].tolist(), len(player.pile), order)
+            self.hu_results[player.player_id] = result
+        return result
 
     def proceed_round(self, players, action):
         ''' Call other Classes's functions to keep one round running
@@ -35,7 +123,7 @@ class MahjongRound:
         #pile_len = [sum([len([c for c in p]) for p in pp.pile]) for pp in players]
         #total_len = [i + j for i, j in zip(hand_len, pile_len)]
         if action == 'stand':
-            (valid_act, player, cards) = self.judger.judge_chow(self.dealer, players, self.last_player)
+            (valid_act, player, cards) = self.judger.judge_chow(self.dealer, players, self.last_player, self.hand_counts)
             if valid_act:
                 self.valid_act = valid_act
                 self.last_cards = cards
@@ -44,29 +132,37 @@ class MahjongRound:
             else:
                 self.last_player = self.current_player
                 self.current_player = (self.player_before_act + 1) % 4
-                self.dealer.deal_cards(players[self.current_player], 1)
+                self.deal_cards(players[self.current_player], 1)
                 self.valid_act = False
 
         elif action == 'gong':
             players[self.current_player].gong(self.dealer, self.last_cards)
+            self.count_claim(players[self.current_player], self.last_cards)
             self.last_player = self.current_player
             self.valid_act = False
 
         elif action == 'pong':
             players[self.current_player].pong(self.dealer, self.last_cards)
+            self.count_claim(players[self.current_player], self.last_cards)
             self.last_player = self.current_player
             self.valid_act = False
 
         elif action == 'chow':
+            self.table_counts[card_encoding_dict[self.dealer.table[-1].get_str()]] -= 1
             players[self.current_player].chow(self.dealer, self.last_cards)
+            self.count_claim(players[self.current_player], self.last_cards)
             self.last_player = self.current_player
             self.valid_act = False
 
         else: # Play game: Proceed to next player
             players[self.current_player].play_card(self.dealer, action)
+            tile = card_encoding_dict[action.get_str()]
+            self.hand_counts[self.current_player, tile] -= 1
+            self.table_counts[tile] += 1
+            self.hu_results[self.current_player] = None
             self.player_before_act = self.current_player
             self.last_player = self.current_player
-            (valid_act, player, cards) = self.judger.judge_pong_gong(self.dealer, players, self.last_player)
+            (valid_act, player, cards) = self.judger.judge_pong_gong(self.dealer, players, self.last_player, self.hand_counts)
             if valid_act:
                 self.valid_act = valid_act
                 self.last_cards = cards
@@ -75,7 +171,7 @@ class MahjongRound:
             else:
                 self.last_player = self.current_player
                 self.current_player = (self.current_player + 1) % 4
-                self.dealer.deal_cards(players[self.current_player], 1)
+                self.deal_cards(players[self.current_player], 1)
 
         #hand_len = [len(p.hand) for p in players]
         #pile_len = [sum([len([c for c in p]) for p in pp.pile]) for pp in players]
@@ -97,6 +193,7 @@ class MahjongRound:
             state['table'] = self.dealer.table
             state['player'] = self.current_player
             state['current_hand'] = players[self.current_player].hand
+            state['hand_player'] = self.current_player
             state['players_pile'] = {p.player_id: p.pile for p in players}
             state['action_cards'] = self.last_cards # For doing action (pong, chow, gong)
         else: # Regular Play
@@ -104,6 +201,7 @@ class MahjongRound:
             state['table'] = self.dealer.table
             state['player'] = self.current_player
             state['current_hand'] = players[player_id].hand
+            state['hand_player'] = player_id
             state['players_pile'] = {p.player_id: p.pile for p in players}
             state['action_cards'] = players[player_id].hand # For doing action (pong, chow, gong)
         return state
@@ -64,6 +64,33 @@ def cards2list(cards):
         cards_list.append(each.get_str())
     return cards_list
 
+def cards2counts(cards):
+    ''' Count every tile of a list of cards
+
+    Args:
+        cards (list): List of MahjongCard
+
+    Returns:
+        (numpy.array): The number of every tile, indexed by `card_encoding_dict`
+    '''
+    counts = np.zeros(34, dtype=np.int8)
+    for card in cards:
+        counts[card_encoding_dict[card.get_str()]] += 1
+    return counts
+
+def encode_counts(counts, out=None):
+    ''' Encode tile counts like `encode_cards`, for any number of zones at once
+
+    Args:
+        counts (numpy.array): The tile counts, with 34 tiles in the last axis
+        out (numpy.array): The array to write the planes in, of shape counts.shape + (4,)
+
+    Returns:
+        (numpy.array): One plane of 34*4 per zone, the first `count` columns of a tile are 1
+    '''
+    if out is None:
+        out = np.empty(counts.shape + (4,), dtype=int)
+    return np.greater(counts[..., np.newaxis], np.arange(4), out=out)
 
 def encode_cards(cards):
     plane = np.zeros((34,4), dtype=int)
@@ -37,13 +37,13 @@ class UnoGame:
         # Initialize four players to play the game
         self.players = [Player(i, self.np_random) for i in range(self.num_players)]
 
-        # Deal 7 cards to each player to prepare for the game
-        for player in self.players:
-            self.dealer.deal_cards(player, 7)
-
         # Initialize a Round
         self.round = Round(self.dealer, self.num_players, self.np_random)
 
+        # Deal 7 cards to each player to prepare for the game
+        for player in self.players:
+            self.round.deal_cards(player, 7)
+
         # flip and perfrom top card
         top_card = self.round.flip_top_card()
         self.round.perform_top_card(self.players, top_card)
@@ -126,6 +126,14 @@ class UnoGame:
 
         return self.round.get_legal_actions(self.players, self.round.current_player)
 
+    def get_legal_action_mask(self):
+        ''' Return the legal actions for current player as a mask
+
+        Returns:
+            (numpy.array): A boolean array over the 61 actions
+        '''
+        return self.round.get_legal_action_mask(self.players, self.round.current_player)
+
     def get_num_players(self):
         ''' Return the number of players in Limit Texas Hold'em
 
@@ -1,5 +1,8 @@
+import numpy as np
+
 from rlcard.games.uno.card import UnoCard
-from rlcard.games.uno.utils import cards2list, WILD, WILD_DRAW_4
+from rlcard.games.uno.utils import cards2list, card2id, ACTION_LIST, COLOR_MAP, TRAIT_MAP
+from rlcard.games.uno.utils import COMPATIBLE_CARDS, NUM_CARD_IDS, WILD_IDS, WILD_DRAW_4_IDS, DRAW_ID
 
 
 class UnoRound:
@@ -18,8 +21,36 @@ class UnoRound:
         self.num_players = num_players
         self.direction = 1
         self.played_cards = []
+        # The strings of the played cards. Played cards keep their color
+        # until they are shuffled back into the deck
+        self.played_cards_str = []
         self.is_over = False
         self.winner = None
+        # The number of every card id in the hand of every player
+        self.hand_counts = np.zeros((num_players, NUM_CARD_IDS), dtype=np.int8)
+        # The legal action masks of the players since the last change
+        self.legal_action_masks = {}
+
+    def deal_cards(self, player, num):
+        ''' Deal some cards from the dealer to one player and count them
+
+        Args:
+            player (object): object of UnoPlayer
+            num (int): The number of cards to be dealed
+        '''
+        self.dealer.deal_cards(player, num)
+        self.legal_action_masks.clear()
+        for card in player.hand[len(player.hand)-num:]:
+            self.hand_counts[player.player_id, card2id(card)] += 1
+
+    def add_played_card(self, card):
+        ''' Put a card on the played cards
+
+        Args:
+            card (object): object of UnoCard
+        '''
+        self.played_cards.append(card)
+        self.played_cards_str.append(card.get_str())
 
     def flip_top_card(self):
         ''' Flip the top card of the card pile
@@ -29,10 +60,11 @@ class UnoRound:
 
         '''
         top = self.dealer.flip_top_card()
+        self.legal_action_masks.clear()
         if top.trait == 'wild':
             top.color = self.np_random.choice(UnoCard.info['color'])
         self.target = top
-        self.played_cards.append(top)
+        self.add_played_card(top)
         return top
 
     def perform_top_card(self, players, top_card):
@@ -49,7 +81,7 @@ class UnoRound:
             self.current_player = (0 + self.direction) % self.num_players
         elif top_card.trait == 'draw_2':
             player = players[self.current_player]
-            self.dealer.deal_cards(player, 2)
+            self.deal_cards(player, 2)
 
     def proceed_round(self, players, action):
         ''' Call other Classes' functions to keep one round running
@@ -58,6 +90,7 @@ class UnoRound:
             player (object): object of UnoPlayer
             action (str): string of legal action
         '''
+        self.legal_action_masks.clear()
         if action == 'draw':
             self._perform_draw_action(players)
             return None
@@ -79,10 +112,11 @@ class UnoRound:
                     remove_index = index
                     break
         card = player.hand.pop(remove_index)
+        self.hand_counts[self.current_player, card2id(card)] -= 1
         if not player.hand:
             self.is_over = True
             self.winner = [self.current_player]
-        self.played_cards.append(card)
+        self.add_played_card(card)
 
         # perform the number action
         if card.type == 'number':
@@ -93,46 +127,48 @@ class UnoRound:
         else:
             self._preform_non_number_action(players, card)
 
-    def get_legal_actions(self, players, player_id):
-        wild_flag = 0
-        wild_draw_4_flag = 0
-        legal_actions = []
-        wild_4_actions = []
-        hand = players[player_id].hand
+    def get_legal_action_mask(self, players, player_id):
+        ''' Get the legal actions of a player as a mask of the action space.
+            Wild draw 4 is only legal without any other card to play
+
+        Args:
+            players (list): The list of UnoPlayer
+            player_id (int): The id of the player
+
+        Returns:
+            (numpy.array): A read-only boolean array, True for the legal action ids
+        '''
+        if player_id in self.legal_action_masks:
+            return self.legal_action_masks[player_id]
+        counts = self.hand_counts[player_id]
         target = self.target
-        if target.type == 'wild':
-            for card in hand:
-                if card.type == 'wild':
-                    if card.trait == 'wild_draw_4':
-                        if wild_draw_4_flag == 0:
-                            wild_draw_4_flag = 1
-                            wild_4_actions.extend(WILD_DRAW_4)
-                    else:
-                        if wild_flag == 0:
-                            wild_flag = 1
-                            legal_actions.extend(WILD)
-                elif card.color == target.color:
-                    legal_actions.append(card.str)
-
-        # target is aciton card or number card
-        else:
-            for card in hand:
-                if card.type == 'wild':
-                    if card.trait == 'wild_draw_4':
-                        if wild_draw_4_flag == 0:
-                            wild_draw_4_flag = 1
-                            wild_4_actions.extend(WILD_DRAW_4)
-                    else:
-                        if wild_flag == 0:
-                            wild_flag = 1
-                            legal_actions.extend(WILD)
-                elif card.color == target.color or card.trait == target.trait:
-                    legal_actions.append(card.str)
-        if not legal_actions:
-            legal_actions = wild_4_actions
-        if not legal_actions:
-            legal_actions = ['draw']
-        return legal_actions
+        mask = np.zeros(len(ACTION_LIST), dtype=bool)
+        # The color of a wild target is the one chosen when it was played
+        target_id = COLOR_MAP[target.color] * 15 + TRAIT_MAP[target.trait]
+        np.logical_and(COMPATIBLE_CARDS[target_id], counts > 0, out=mask[:NUM_CARD_IDS])
+        if counts[WILD_IDS[0]]:
+            mask[WILD_IDS] = True
+        if not mask.any():
+            if counts[WILD_DRAW_4_IDS[0]]:
+                mask[WILD_DRAW_4_IDS] = True
+            else:
+                mask[DRAW_ID] = True
+        mask.flags.writeable = False
+        self.legal_action_masks[player_id] = mask
+        return mask
+
+    def get_legal_actions(self, players, player_id):
+        ''' Get the legal actions of a player
+
+        Args:
+            players (list): The list of UnoPlayer
+            player_id (int): The id of the player
+
+        Returns:
+            (list): The string of every legal action, in the order of the action ids
+        '''
+        mask = self.get_legal_action_mask(players, player_id)
+        return [ACTION_LIST[action_id] for action_id in mask.nonzero()[0].tolist()]
 
     def get_state(self, players, player_id):
         ''' Get player's state
@@ -143,9 +179,10 @@ class UnoRound:
         '''
         state = {}
         player = players[player_id]
+        state['player_id'] = player_id
         state['hand'] = cards2list(player.hand)
         state['target'] = self.target.str
-        state['played_cards'] = cards2list(self.played_cards)
+        state['played_cards'] = list(self.played_cards_str)
         state['legal_actions'] = self.get_legal_actions(players, player_id)
         state['num_cards'] = []
         for player in players:
@@ -158,6 +195,7 @@ class UnoRound:
         self.dealer.deck.extend(self.played_cards)
         self.dealer.shuffle()
         self.played_cards = []
+        self.played_cards_str = []
 
     def _perform_draw_action(self, players):
         # replace deck if there is no card in draw pile
@@ -173,22 +211,23 @@ class UnoRound:
         if card.type == 'wild':
             card.color = self.np_random.choice(UnoCard.info['color'])
             self.target = card
-            self.played_cards.append(card)
+            self.add_played_card(card)
             self.current_player = (self.current_player + self.direction) % self.num_players
 
         # draw a card with the same color of target
         elif card.color == self.target.color:
             if card.type == 'number':
                 self.target = card
-                self.played_cards.append(card)
+                self.add_played_card(card)
                 self.current_player = (self.current_player + self.direction) % self.num_players
             else:
-                self.played_cards.append(card)
+                self.add_played_card(card)
                 self._preform_non_number_action(players, card)
 
         # draw a card with the diffrent color of target
         else:
             players[self.current_player].hand.append(card)
+            self.hand_counts[self.current_player, card2id(card)] += 1
             self.current_player = (self.current_player + self.direction) % self.num_players
 
     def _preform_non_number_action(self, players, card):
@@ -211,7 +250,7 @@ class UnoRound:
                 #self.is_over = True
                 #self.winner = UnoJudger.judge_winner(players)
                 #return None
-            self.dealer.deal_cards(players[(current + direction) % num_players], 2)
+            self.deal_cards(players[(current + direction) % num_players], 2)
             current = (current + direction) % num_players
 
         # perfrom wild_draw_4 card
@@ -221,7 +260,7 @@ class UnoRound:
                 #self.is_over = True
                 #self.winner = UnoJudger.judge_winner(players)
                 #return None
-            self.dealer.deal_cards(players[(current + direction) % num_players], 4)
+            self.deal_cards(players[(current + direction) % num_players], 4)
             current = (current + direction) % num_players
         self.current_player = (current + self.direction) % num_players
         self.target = card
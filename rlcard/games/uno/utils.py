@@ -27,6 +27,28 @@ WILD = ['r-wild', 'g-wild', 'b-wild', 'y-wild']
 
 WILD_DRAW_4 = ['r-wild_draw_4', 'g-wild_draw_4', 'b-wild_draw_4', 'y-wild_draw_4']
 
+WILD_IDS = [ACTION_SPACE[action] for action in WILD]
+
+WILD_DRAW_4_IDS = [ACTION_SPACE[action] for action in WILD_DRAW_4]
+
+DRAW_ID = ACTION_SPACE['draw']
+
+# The number of card ids, the actions that play a card
+NUM_CARD_IDS = DRAW_ID
+
+# The cards that can be played on every target, indexed by card id. A card
+# matches the color of the target, or its trait unless the target is wild.
+# Wild cards match any target and are left out
+COMPATIBLE_CARDS = np.zeros((NUM_CARD_IDS, NUM_CARD_IDS), dtype=bool)
+for _target in ACTION_LIST[:NUM_CARD_IDS]:
+    _target_color, _target_trait = _target.split('-')
+    for _card in ACTION_LIST[:NUM_CARD_IDS]:
+        _color, _trait = _card.split('-')
+        if _trait in ('wild', 'wild_draw_4'):
+            continue
+        if _color == _target_color or (_trait == _target_trait and _target_trait not in ('wild', 'wild_draw_4')):
+            COMPATIBLE_CARDS[ACTION_SPACE[_target], ACTION_SPACE[_card]] = True
+
 
 def init_deck():
     ''' Generate uno deck of 108 cards
@@ -52,6 +74,21 @@ def init_deck():
     return deck
 
 
+def card2id(card):
+    ''' Get the id of a card, the id of the action that plays it. Wild cards
+        take a color when they are played, so they are counted apart from
+        their color, under the ids of the red ones
+
+    Args:
+        card (object): The object of UnoCard
+
+    Returns:
+        (int): The id of the card
+    '''
+    if card.type == 'wild':
+        return TRAIT_MAP[card.trait]
+    return ACTION_SPACE[card.str]
+
 def cards2list(cards):
     ''' Get the corresponding string representation of cards
 
@@ -110,6 +147,20 @@ def encode_hand(plane, hand):
             plane[count][color][trait] = 1
     return plane
 
+def encode_hand_counts(plane, counts):
+    ''' Encode the card id counts of a hand like `encode_hand`
+
+    Args:
+        plane (array): 3*4*15 numpy array
+        counts (array): The number of every card id in hand
+
+    Returns:
+        (array): 3*4*15 numpy array
+    '''
+    counts = counts.reshape(4, 15).copy()
+    counts[:, 13:] = counts[0, 13:] > 0  # Any wild card is in every color
+    return np.equal(counts, np.arange(3).reshape(3, 1, 1), out=plane)
+
 def encode_target(plane, target):
     ''' Encode target and represerve it into plane
 
@@ -0,0 +1,208 @@
+import glob
+import json
+import os
+import re
+import time
+import traceback
+
+def load_agent(model_path, env=None, position=None, device=None):
+    ''' Load an agent from a model file, a CFR model directory, `random`
+        or the name of a model in the model zoo
+
+    Args:
+        model_path (str): The path or name of the model
+        env (Env): The environment the agent plays in
+        position (int): The position of the agent, for the models of the zoo
+        device (torch.device): The device of a torch model
+
+    Returns:
+        (Agent): The agent
+    '''
+    if os.path.isfile(model_path):  # Torch model
+        import torch
+        agent = torch.load(model_path, map_location=device, weights_only=False)
+        if isinstance(agent, dict):  # Checkpoint attributes
+            agent_type = agent.get('agent_type')
+            if agent_type == 'DMCAgent':
+                from rlcard.agents.dmc_agent.model import DMCAgent
+                agent = DMCAgent.from_checkpoint(agent)
+            elif agent_type == 'DQNAgent':
+                from rlcard.agents import DQNAgent
+                agent = DQNAgent.from_checkpoint(agent)
+            elif agent_type == 'NFSPAgent':
+                from rlcard.agents import NFSPAgent
+                agent = NFSPAgent.from_checkpoint(agent)
+            else:
+                raise ValueError('Unknown checkpoint in ' + model_path)
+        agent.set_device(device)
+    elif os.path.isdir(model_path):  # CFR model
+        from rlcard.agents import CFRAgent
+        agent = CFRAgent(env, model_path)
+        agent.load()
+    elif model_path == 'random':  # Random model
+        from rlcard.agents import RandomAgent
+        agent = RandomAgent(num_actions=env.num_actions)
+    else:  # A model in the model zoo
+        from rlcard import models
+        agent = models.load(model_path).agents[position]
+
+    return agent
+
+def find_latest_checkpoint(pattern):
+    ''' Find the most recently written file matching a glob pattern
+
+    Returns:
+        (tuple): The path and modification time of the file, or None
+    '''
+    latest = None
+    for path in glob.glob(pattern):
+        if path.endswith('.tmp'):
+            continue
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:  # Replaced or pruned in the meantime
+            continue
+        if latest is None or mtime > latest[1]:
+            latest = (path, mtime)
+    return latest
+
+def _checkpoint_frames(path, agent=None):
+    ''' The number of frames of a checkpoint, from the number at the end of
+        its file name such as `0_1000.pth`, or else from the step counter of
+        the agent, such as `total_t` of the DQN and NFSP agents
+    '''
+    match = re.search(r'_(\d+)\.[^.]*$', os.path.basename(path))
+    if match:
+        return int(match.group(1))
+    return getattr(agent, 'total_t', None)
+
+def _evaluate_checkpoint(env, path, opponents, position, num_games, device):
+    from rlcard.utils.utils import tournament
+    agents = []
+    opponents = list(opponents)
+    for player_id in range(env.num_players):
+        if player_id == position:
+            agent = load_agent(path, env, player_id, device)
+            agents.append(agent)
+        else:
+            agents.append(load_agent(opponents.pop(0), env, player_id, device))
+    env.set_agents(agents)
+    return tournament(env, num_games)[position], agent
+
+def evaluate_checkpoint(env, path, opponents, position=0, num_games=1000, device=None):
+    ''' Play the agent of a checkpoint against opponents
+
+    Args:
+        env (Env): The environment
+        path (str): The checkpoint of the evaluated agent
+        opponents (list): The models of the other positions, in the order of
+          the positions, as accepted by `load_agent`
+        position (int): The position of the evaluated agent
+        num_games (int): The number of games to play
+        device (torch.device): The device of the evaluated agent
+
+    Returns:
+        (float): The average payoff of the evaluated agent
+    '''
+    return _evaluate_checkpoint(env, path, opponents, position, num_games, device)[0]
+
+def evaluation_worker(
+    env_id,
+    checkpoint_pattern,
+    opponents,
+    log_path,
+    position=0,
+    num_games=1000,
+    interval=60,
+    seed=None,
+    stop_event=None,
+):
+    ''' Evaluate the latest checkpoint matching `checkpoint_pattern` every
+        `interval` seconds, unless it was already evaluated, and append the
+        result to `log_path` as a JSON line. A failed evaluation is appended
+        with its traceback under `error`. Runs until `stop_event` is set,
+        then evaluates the latest checkpoint a last time.
+    '''
+    import rlcard
+    config = {} if seed is None else {'seed': seed}
+    env = rlcard.make(env_id, config=config)
+    last_evaluated = None
+    last_failed = None
+    while True:
+        stopping = stop_event is not None and stop_event.wait(interval)
+        latest = find_latest_checkpoint(checkpoint_pattern)
+        if latest is not None and latest != last_evaluated:
+            path = latest[0]
+            record = {
+                'checkpoint': path,
+                'position': position,
+                'opponents': list(opponents),
+                'num_games': num_games,
+            }
+            try:
+                reward, agent = _evaluate_checkpoint(env, path, opponents, position, num_games, None)
+            except Exception:
+                # The checkpoint may have been pruned while it was loaded.
+                # It is tried again, but the error is only recorded once
+                traceback.print_exc()
+                if latest != last_failed:
+                    last_failed = latest
+                    record.update(frames=_checkpoint_frames(path), error=traceback.format_exc())
+                else:
+                    record = None
+            else:
+                last_evaluated = latest
+                record.update(frames=_checkpoint_frames(path, agent), reward=reward)
+            if record is not None:
+                record['time'] = time.time()
+                with open(log_path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+        if stopping:
+            break
+
+class EvaluationWorker(object):
+    ''' Run `evaluation_worker` in a separate process, so that the
+        evaluation never blocks training
+    '''
+
+    def __init__(self, env_id, checkpoint_pattern, opponents, log_path,
+                 position=0, num_games=1000, interval=60, seed=None):
+        ''' Initialize the worker
+
+        Args:
+            env_id (str): The id of the environment
+            checkpoint_pattern (str): A glob pattern of the checkpoint files
+            opponents (list): The models of the other positions, such as
+              `random` or `doudizhu-rule-v1`
+            log_path (str): The JSON lines file the results are appended to
+            position (int): The position of the evaluated agent
+            num_games (int): The number of games of every evaluation
+            interval (float): Seconds between two checks for a new checkpoint
+            seed (int): The seed of the evaluation environment
+        '''
+        self.args = (env_id, checkpoint_pattern, list(opponents), log_path,
+                     position, num_games, interval, seed)
+        self.process = None
+        self.stop_event = None
+
+    def start(self):
+        import multiprocessing as mp
+        ctx = mp.get_context('spawn')
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=evaluation_worker,
+            args=self.args + (self.stop_event,),
+            daemon=True,
+        )
+        self.process.start()
+
+    def stop(self, timeout=None):
+        ''' Let the worker evaluate the latest checkpoint and exit
+
+        Args:
+            timeout (float): Seconds to wait for the worker
+        '''
+        if self.process is not None:
+            self.stop_event.set()
+            self.process.join(timeout)
+            self.process = None
@@ -35,6 +35,7 @@ setuptools.setup(
                    'games/limitholdem/card2index.json',
                    'games/leducholdem/card2index.json',
                    'games/doudizhu/jsondata.zip',
+                   'games/doudizhu/rule_tables.npz',
                    'games/uno/jsondata/*',
                    ]},
     install_requires=[
@@ -0,0 +1,341 @@
+import os
+import queue
+import socket
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import torch
+
+import rlcard
+from rlcard.agents.dmc_agent import DMCTrainer
+from rlcard.agents.dmc_agent.model import DMCAgent, DMCModel, DMCFactoredNet
+from rlcard.agents.dmc_agent.checkpoint_writer import CheckpointWriter, to_cpu
+from rlcard.agents.dmc_agent.telemetry import ActorStats, Telemetry
+from rlcard.agents.dmc_agent.transport import (
+    send_message,
+    recv_message,
+    RolloutServer,
+    SocketTransport,
+)
+from rlcard.agents.dmc_agent.utils import (
+    create_buffers,
+    get_batch,
+    release_batch,
+    RolloutStaging,
+    BatchedEnvRunner,
+    ParameterBroadcaster,
+    pull_parameters,
+    pack_bits,
+    unpack_bits,
+)
+
+class TestDMC(unittest.TestCase):
+
+    def test_rollout_staging(self):
+        T = 4
+        buffers = create_buffers(T, 2, [[3]], [[2]], ['cpu'])['cpu'][0]
+        self.assertEqual(buffers['state'].shape, (2, T, 3))
+        staging = RolloutStaging(T, buffers)
+        self.assertFalse(staging.is_full())
+
+        n = 11
+        staging.extend(
+            done=np.arange(n) % 5 == 4,
+            episode_return=np.arange(n, dtype=np.float32),
+            target=np.arange(n, dtype=np.float32),
+            state=np.tile(np.arange(n, dtype=np.int8)[:, None], (1, 3)),
+            action=np.tile(np.arange(n, dtype=np.int8)[:, None], (1, 2)),
+        )
+        self.assertEqual(staging.size, n)
+
+        staging.flush(buffers, 1)
+        self.assertEqual(staging.size, n - T)
+        self.assertTrue(torch.equal(buffers['target'][1], torch.arange(T, dtype=torch.float32)))
+        self.assertTrue(torch.equal(buffers['state'][1][:, 0], torch.arange(T, dtype=torch.int8)))
+        self.assertTrue(torch.equal(buffers['done'][1], torch.tensor([False, False, False, False])))
+
+        staging.flush(buffers, 0)
+        self.assertEqual(staging.size, n - 2 * T)
+        self.assertTrue(torch.equal(buffers['action'][0][:, 1], torch.arange(T, 2 * T, dtype=torch.int8)))
+        self.assertTrue(torch.equal(buffers['done'][0], torch.tensor([True, False, False, False])))
+        self.assertFalse(staging.is_full())
+
+    def test_packed_buffers(self):
+        T = 2
+        buffers = create_buffers(T, 1, [[2, 9]], [[5]], ['cpu'], packed=True)['cpu'][0]
+        self.assertEqual(buffers['state'].shape, (1, T, 3))
+        self.assertEqual(buffers['state'].dtype, torch.uint8)
+        self.assertEqual(buffers['action'].shape, (1, T, 1))
+
+        state = np.random.randint(2, size=(T, 2, 9)).astype(np.int8)
+        action = np.random.randint(2, size=(T, 5)).astype(np.int8)
+        self.assertEqual(pack_bits(state).shape, (T, 3))
+        staging = RolloutStaging(T, buffers, packed=True)
+        staging.extend(
+            done=np.zeros(T, dtype=bool),
+            episode_return=np.zeros(T, dtype=np.float32),
+            target=np.zeros(T, dtype=np.float32),
+            state=state,
+            action=action,
+        )
+        staging.flush(buffers, 0)
+        self.assertTrue(torch.equal(unpack_bits(buffers['state'], [2, 9])[0], torch.from_numpy(state).to(torch.uint8)))
+        self.assertTrue(torch.equal(unpack_bits(buffers['action'], [5])[0], torch.from_numpy(action).to(torch.uint8)))
+
+    def test_get_batch(self):
+        T, B = 3, 2
+        buffers = create_buffers(T, 2 * B, [[3]], [[2]], ['cpu'])['cpu'][0]
+        free_queue, full_queue = queue.SimpleQueue(), queue.SimpleQueue()
+        for m in [2, 0, 3]:
+            buffers['target'][m] = m
+            full_queue.put(m)
+        slot_counts = [0, 0]
+        slot, batch = get_batch(full_queue, buffers, B, threading.Lock(), slot_counts)
+        self.assertEqual(slot, 1)
+        self.assertEqual(slot_counts, [1, 0])
+        self.assertEqual(batch['target'].shape, (B, T))
+        self.assertEqual(batch['target'][:, 0].tolist(), [2, 3])
+        # The batch is a view of the shared buffers
+        self.assertEqual(batch['state'].data_ptr(), buffers['state'][2].data_ptr())
+
+        release_batch(free_queue, slot, B)
+        self.assertEqual([free_queue.get() for _ in range(B)], [2, 3])
+
+        # A thread waiting for a buffer does not hold the lock
+        lock = threading.Lock()
+        waiting = threading.Thread(target=get_batch, args=(full_queue, buffers, B, lock, slot_counts), daemon=True)
+        waiting.start()
+        waiting.join(0.1)
+        self.assertTrue(lock.acquire(timeout=1))
+        lock.release()
+        full_queue.put(1)
+        waiting.join(1)
+        self.assertFalse(waiting.is_alive())
+        self.assertEqual(slot_counts, [0, 0])
+
+    def test_batch_predict(self):
+        env = rlcard.make('leduc-holdem')
+        for net_type in ['mlp', 'factored']:
+            model = DMCModel(env.state_shape, [[env.num_actions] for _ in range(env.num_players)], mlp_layers=[8,8], device='cpu', net_type=net_type)
+            agent = model.get_agent(0)
+            states = [env.reset()[0] for _ in range(3)]
+            for state, (action_keys, values) in zip(states, agent.batch_predict(states)):
+                _action_keys, _values = agent.predict(state)
+                self.assertTrue(np.array_equal(action_keys, _action_keys))
+                self.assertTrue(np.allclose(values, _values, atol=1e-6))
+
+    def test_factored_net(self):
+        net = DMCFactoredNet([6], [4], obs_layers=[8], action_layers=[4], head_layers=[8])
+        obs = torch.rand(2, 6)
+        actions = torch.rand(5, 4)
+        obs_index = torch.tensor([0, 0, 1, 1, 1])
+        values = net(obs, actions, obs_index)
+        self.assertEqual(values.shape, (5,))
+        self.assertTrue(torch.allclose(values, net(obs[obs_index], actions), atol=1e-6))
+
+        # The layers of the agent follow mlp_layers
+        agent = DMCAgent([6], [4], mlp_layers=[16, 8], device='cpu', net_type='factored')
+        self.assertEqual([m.out_features for m in agent.net.obs_layers if isinstance(m, torch.nn.Linear)], [16, 8])
+        self.assertEqual(agent.net.action_layers[0].out_features, 4)
+        self.assertEqual(agent.checkpoint_attributes()['mlp_layers'], [16, 8])
+        default = DMCAgent([6], [4], device='cpu', net_type='factored')
+        shapes = {k: v.shape for k, v in DMCFactoredNet([6], [4]).state_dict().items()}
+        self.assertEqual({k: v.shape for k, v in default.state_dict().items()}, shapes)
+
+    def test_batched_env_runner(self):
+        env = rlcard.make('leduc-holdem')
+        model = DMCModel(env.state_shape, [[env.num_actions] for _ in range(env.num_players)], mlp_layers=[8,8], device='cpu')
+        envs = [rlcard.make('leduc-holdem', config={'seed': k}) for k in range(3)]
+        runner = BatchedEnvRunner(envs, model.get_agents())
+        games = []
+        while len(games) < 10:
+            games.extend(runner.run())
+        for trajectories, payoffs in games:
+            self.assertEqual(len(trajectories), env.num_players)
+            self.assertAlmostEqual(sum(payoffs), 0)
+            for trajectory in trajectories:
+                self.assertEqual(len(trajectory) % 2, 1)
+                for t in range(1, len(trajectory), 2):
+                    self.assertIn(trajectory[t], trajectory[t-1]['legal_actions'])
+
+    def test_parameter_broadcast(self):
+        def make_model():
+            return DMCModel([[3], [3]], [[2], [2]], mlp_layers=[4], device='cpu')
+        learner_model, shared_model, local_model = make_model(), make_model(), make_model()
+        broadcaster = ParameterBroadcaster({'cpu': shared_model}, 2, publish_every=3, publish_interval=None)
+        versions = broadcaster.versions['cpu']
+        local_versions = [0, 0]
+
+        learner_agent = learner_model.get_agent(0)
+        for _ in range(2):
+            broadcaster.step(0, learner_agent)
+        self.assertEqual(versions.tolist(), [0, 0])
+        broadcaster.step(0, learner_agent)
+        self.assertEqual(versions.tolist(), [2, 0])
+
+        pull_parameters(shared_model, local_model, versions, local_versions)
+        self.assertEqual(local_versions, [2, 0])
+        for key, value in learner_agent.state_dict().items():
+            self.assertTrue(torch.equal(local_model.get_agent(0).state_dict()[key], value))
+
+        # A snapshot that is being written is not pulled
+        versions[1] += 1
+        pull_parameters(shared_model, local_model, versions, local_versions)
+        self.assertEqual(local_versions, [2, 0])
+
+    def test_checkpoint_writer(self):
+        agent = DMCAgent([4], [3], mlp_layers=[8], device='cpu', net_type='factored')
+        attributes = to_cpu(agent.checkpoint_attributes())
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = CheckpointWriter(keep=1)
+            for frames in [1, 2, 2]:
+                path = os.path.join(tmp, '0_%d.pth' % frames)
+                writer.submit([(path, attributes)], prunable=[path])
+            writer.close()
+            self.assertEqual(os.listdir(tmp), ['0_2.pth'])
+
+            checkpoint = torch.load(os.path.join(tmp, '0_2.pth'))
+            restored = DMCAgent.from_checkpoint(checkpoint)
+            self.assertEqual(restored.net_type, 'factored')
+            state = {'obs': np.random.random_sample((4,)), 'legal_actions': {0: None, 2: None}}
+            self.assertTrue(np.allclose(agent.predict(state)[1], restored.predict(state)[1]))
+
+    def test_learner_processes(self):
+        T, B = 8, 4
+        env = rlcard.make('leduc-holdem')
+        with tempfile.TemporaryDirectory() as tmp:
+            trainer = DMCTrainer(
+                env,
+                num_actors=1,
+                training_device='cpu',
+                savedir=tmp,
+                total_frames=6 * T * B,
+                batch_size=B,
+                unroll_length=T,
+                num_buffers=2 * B,
+                num_threads=1,
+                learner_processes=True,
+                metrics_interval=None,
+            )
+            trainer.start()
+
+            # Training stops at the frame budget and the stats of every
+            # position came back from the learner processes
+            checkpoint = torch.load(os.path.join(tmp, 'dmc', 'model.tar'))
+            self.assertEqual(checkpoint['frames'], 6 * T * B)
+            for p in range(env.num_players):
+                self.assertNotEqual(checkpoint['stats']['loss_%d' % p], 0)
+
+            model = trainer.model_func('cpu')
+            state = {'obs': np.random.random_sample(env.state_shape[0]), 'legal_actions': {0: None, 2: None}}
+            for p in range(env.num_players):
+                model.get_agent(p).load_state_dict(checkpoint['model_state_dict'][p])
+                restored = DMCAgent.from_checkpoint(torch.load(os.path.join(tmp, 'dmc', '%d_%d.pth' % (p, 6 * T * B))))
+                self.assertTrue(np.allclose(model.get_agent(p).predict(state)[1], restored.predict(state)[1]))
+
+    def test_num_buffers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertLogs('doudzero', 'WARNING'):
+                trainer = DMCTrainer(rlcard.make('leduc-holdem'), training_device='cpu', savedir=tmp, batch_size=4, num_buffers=6)
+            self.assertEqual(trainer.num_buffers, 8)
+
+    def test_telemetry(self):
+        versions = torch.tensor([6])
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in ['jsonl', 'csv']:
+                actor_stats = ActorStats(2, 1)
+                path = os.path.join(tmp, 'metrics.' + fmt)
+                slot_counts = {'cpu': torch.zeros(1, 4, dtype=torch.int64)}
+                telemetry = Telemetry(path, {'cpu': actor_stats}, {'cpu': versions}, 8, 2, 1, fmt=fmt, slot_counts=slot_counts)
+                actor_stats.add_frames(1, 10)
+                for _ in range(4):
+                    actor_stats.took_free(0, 0)
+                    actor_stats.put_full(0, 0)
+                # One of the two buffers left is already counted in its slot
+                slot_counts['cpu'][0, 1] = 1
+                actor_stats.set_versions(0, [2])
+                actor_stats.set_versions(1, [6])
+                telemetry.record_step('cpu', 0, wait=0.1, forward_backward=0.2, broadcast=0.0, frames=40)
+
+                record = telemetry.collect()
+                self.assertEqual(record['frames'], 40)
+                self.assertEqual(record['actor_fps_cpu_0'], 0)
+                self.assertGreater(record['actor_fps_cpu_1'], 0)
+                self.assertEqual(record['full_queue_cpu_0'], 1)
+                self.assertEqual(record['free_queue_cpu_0'], 6)
+                self.assertAlmostEqual(record['wait_ms_0'], 100)
+                self.assertEqual(record['version_lag_cpu_0'], 1)
+                self.assertEqual(record['max_version_lag_cpu_0'], 2)
+                telemetry.write(record)
+                telemetry.write(telemetry.collect())
+                with open(path) as f:
+                    self.assertEqual(len(f.readlines()), 2 if fmt == 'jsonl' else 3)
+
+                # Every write to a full file rolls it over
+                telemetry.max_bytes, telemetry.backup_count = 1, 2
+                for _ in range(3):
+                    telemetry.write(telemetry.collect())
+                self.assertTrue(os.path.exists(path + '.2'))
+                self.assertFalse(os.path.exists(path + '.3'))
+                with open(path) as f:
+                    self.assertEqual(len(f.readlines()), 1 if fmt == 'jsonl' else 2)
+
+    def test_framed_messages(self):
+        left, right = socket.socketpair()
+        arrays = {'a': np.arange(6, dtype=np.float32).reshape(2, 3), 'b': np.array([True, False])}
+        send_message(left, {'type': 'test'}, arrays)
+        header, received = recv_message(right)
+        self.assertEqual(header['type'], 'test')
+        for key in arrays:
+            self.assertEqual(received[key].dtype, arrays[key].dtype)
+            self.assertTrue(np.array_equal(received[key], arrays[key]))
+        left.close()
+        right.close()
+
+    def test_rollout_server(self):
+        T = 2
+        env = rlcard.make('leduc-holdem')
+        model = DMCModel(env.state_shape, [[env.num_actions]] * 2, mlp_layers=[8], device='cpu')
+        buffers = create_buffers(T, 2, env.state_shape, [[env.num_actions]] * 2, ['cpu'])['cpu']
+        free_queue = [queue.SimpleQueue() for _ in range(2)]
+        full_queue = [queue.SimpleQueue() for _ in range(2)]
+        free_queue[1].put(1)
+        versions = torch.tensor([2, 0])
+        config = dict(net_type='mlp', exp_epsilon=0.0, packed=False)
+        with tempfile.TemporaryDirectory() as tmp:
+            for address in ['127.0.0.1:0', 'unix:' + os.path.join(tmp, 'dmc.sock')]:
+                server = RolloutServer(address, T, buffers, free_queue, full_queue, model, versions, config)
+                server.start()
+                transport = SocketTransport(server.address, pull_interval=0.0)
+                _T, _config, templates = transport.hello()
+                self.assertEqual((_T, _config), (T, config))
+                self.assertEqual(tuple(templates[0]['state'].shape), (1, 1, 36))
+
+                staging = RolloutStaging(T, templates[1])
+                staging.extend(
+                    done=np.array([False, False, True]),
+                    episode_return=np.zeros(3, dtype=np.float32),
+                    target=np.arange(3, dtype=np.float32),
+                    state=np.ones((3, 36), dtype=np.int8),
+                    action=np.ones((3, env.num_actions), dtype=np.int8),
+                )
+                transport.put_block(1, staging)
+                self.assertEqual(full_queue[1].get(), 1)
+                self.assertEqual(buffers[1]['target'][1].tolist(), [0, 1])
+                self.assertEqual(staging.size, 1)
+                free_queue[1].put(1)
+
+                remote_model = DMCModel(env.state_shape, [[env.num_actions]] * 2, mlp_layers=[8], device='cpu')
+                local_versions = [-1, -1]
+                transport.pull_parameters(remote_model, local_versions)
+                self.assertEqual(local_versions, [2, 0])
+                for p in range(2):
+                    for name, tensor in model.get_agent(p).state_dict().items():
+                        self.assertTrue(torch.equal(remote_model.get_agent(p).state_dict()[name], tensor))
+                transport.close()
+                server.close()
+
+if __name__ == '__main__':
+    unittest.main()
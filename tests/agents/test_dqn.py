@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 import torch
 import numpy as np
@@ -51,3 +55,18 @@ class TestDQN(unittest.TestCase):
         predicted_action = agent.step({'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}})
         self.assertGreaterEqual(predicted_action, 0)
         self.assertLessEqual(predicted_action, 1)
+
+    def test_run_rl_self_play(self):
+        # The landlord and the peasants of Doudizhu observe states of different shapes
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with tempfile.TemporaryDirectory() as tmp:
+            subprocess.run(
+                [sys.executable, os.path.join(root, 'examples', 'run_rl.py'),
+                 '--env', 'doudizhu', '--self_play', '--num_episodes', '2',
+                 '--num_eval_games', '1', '--log_dir', tmp],
+                check=True,
+                env=dict(os.environ, PYTHONPATH=root),
+                stdout=subprocess.DEVNULL,
+            )
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'model.pth')))
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'player_1', 'model.pth')))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from rlcard.agents.dqn_agent import DQNAgent
+from rlcard.agents.nfsp_agent import NFSPAgent
+from rlcard.agents.dmc_agent.model import DMCAgent
+from rlcard.agents.inference_agent import InferenceAgent, export_agent
+
+
+def random_state():
+    return {'obs': np.random.random_sample((4,)), 'legal_actions': {0: None, 2: None}, 'raw_legal_actions': ['a', 'c']}
+
+class TestInferenceAgent(unittest.TestCase):
+
+    def test_export_dqn(self):
+        agent = DQNAgent(num_actions=3, state_shape=[4], mlp_layers=[10,10], device=torch.device('cpu'))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'dqn.pt')
+            metadata = export_agent(agent, path)
+            self.assertEqual(metadata['kind'], 'value')
+            inference_agent = InferenceAgent(path)
+            for _ in range(10):
+                state = random_state()
+                q_values = agent.predict(state)
+                action, info = inference_agent.eval_step(state)
+                self.assertEqual(action, np.argmax(q_values))
+                self.assertAlmostEqual(info['values']['c'], q_values[2], places=4)
+                self.assertIn(inference_agent.step(state), [0, 2])
+
+    def test_export_quantized(self):
+        agent = DQNAgent(num_actions=3, state_shape=[4], mlp_layers=[10,10], device=torch.device('cpu'))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'dqn_int8.pt')
+            metadata = export_agent(agent, path, quantize=True)
+            self.assertTrue(metadata['quantized'])
+            inference_agent = InferenceAgent(path)
+            action, _ = inference_agent.eval_step(random_state())
+            self.assertIn(action, [0, 2])
+        with self.assertRaises(ValueError):
+            export_agent(agent, 'dqn.onnx', export_format='onnx', quantize=True)
+
+    def test_export_nfsp(self):
+        agent = NFSPAgent(num_actions=3, state_shape=[4], hidden_layers_sizes=[10,10], q_mlp_layers=[10,10], device=torch.device('cpu'))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'nfsp.pt')
+            export_agent(agent, path)
+            inference_agent = InferenceAgent(path)
+            state = random_state()
+            _, info = inference_agent.eval_step(state)
+            self.assertAlmostEqual(sum(info['probs'].values()), 1.0, places=4)
+            self.assertIn(inference_agent.step(state), [0, 2])
+
+    def test_export_dmc(self):
+        for net_type in ['mlp', 'factored']:
+            agent = DMCAgent([4], [3], mlp_layers=[10,10], device='cpu', net_type=net_type)
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'dmc.pt')
+                metadata = export_agent(agent, path)
+                self.assertEqual(metadata['kind'], 'dmc')
+                inference_agent = InferenceAgent(path)
+                state = random_state()
+                _, values = agent.predict(state)
+                _, scores = inference_agent.predict(state)
+                self.assertTrue(np.allclose(values, scores, atol=1e-5))
+
+if __name__ == '__main__':
+    unittest.main()
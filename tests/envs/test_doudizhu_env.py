@@ -1,9 +1,95 @@
 import unittest
+import numpy as np
 
 import rlcard
 from rlcard.agents.random_agent import RandomAgent
+from rlcard.envs.doudizhu import _cards2array
 from .determism_util import is_deterministic
 
+def _encode_state(state):
+    ''' Encode the observation of a state from scratch, as the reference
+        of the observations kept by DoudizhuObservationEncoder
+
+    Args:
+        state (dict): dict of original state
+    '''
+    current_hand = _cards2array(state['current_hand'])
+    others_hand = _cards2array(state['others_hand'])
+
+    last_action = ''
+    if len(state['trace']) != 0:
+        if state['trace'][-1][1] == 'pass':
+            last_action = state['trace'][-2][1]
+        else:
+            last_action = state['trace'][-1][1]
+    last_action = _cards2array(last_action)
+
+    last_9_actions = _action_seq2array(_process_action_seq(state['trace']))
+
+    if state['self'] == 0: # landlord
+        landlord_up_played_cards = _cards2array(state['played_cards'][2])
+        landlord_down_played_cards = _cards2array(state['played_cards'][1])
+        landlord_up_num_cards_left = _get_one_hot_array(state['num_cards_left'][2], 17) 
+        landlord_down_num_cards_left = _get_one_hot_array(state['num_cards_left'][1], 17)
+        obs = np.concatenate((current_hand,
+                              others_hand,
+                              last_action,
+                              last_9_actions,
+                              landlord_up_played_cards,
+                              landlord_down_played_cards,
+                              landlord_up_num_cards_left,
+                              landlord_down_num_cards_left))
+    else:
+        landlord_played_cards = _cards2array(state['played_cards'][0])
+        for i, action in reversed(state['trace']):
+            if i == 0:
+                last_landlord_action = action
+                break
+        last_landlord_action = _cards2array(last_landlord_action)
+        landlord_num_cards_left = _get_one_hot_array(state['num_cards_left'][0], 20)
+
+        teammate_id = 3 - state['self']
+        teammate_played_cards = _cards2array(state['played_cards'][teammate_id])
+        last_teammate_action = 'pass'
+        for i, action in reversed(state['trace']):
+            if i == teammate_id:
+                last_teammate_action = action
+                break
+        last_teammate_action = _cards2array(last_teammate_action)
+        teammate_num_cards_left = _get_one_hot_array(state['num_cards_left'][teammate_id], 17)
+        obs = np.concatenate((current_hand,
+                              others_hand,
+                              last_action,
+                              last_9_actions,
+                              landlord_played_cards,
+                              teammate_played_cards,
+                              last_landlord_action,
+                              last_teammate_action,
+                              landlord_num_cards_left,
+                              teammate_num_cards_left))
+    return obs
+
+def _get_one_hot_array(num_left_cards, max_num_cards):
+    one_hot = np.zeros(max_num_cards, dtype=np.int8)
+    one_hot[num_left_cards - 1] = 1
+
+    return one_hot
+
+def _action_seq2array(action_seq_list):
+    action_seq_array = np.zeros((len(action_seq_list), 54), np.int8)
+    for row, cards in enumerate(action_seq_list):
+        action_seq_array[row, :] = _cards2array(cards)
+    action_seq_array = action_seq_array.flatten()
+    return action_seq_array
+
+def _process_action_seq(sequence, length=9):
+    sequence = [action[1] for action in sequence[-length:]]
+    if len(sequence) < length:
+        empty_sequence = ['' for _ in range(length - len(sequence))]
+        empty_sequence.extend(sequence)
+        sequence = empty_sequence
+    return sequence
+
 
 class TestDoudizhuEnv(unittest.TestCase):
 
@@ -23,6 +109,32 @@ class TestDoudizhuEnv(unittest.TestCase):
         for legal_action in legal_actions:
             self.assertLessEqual(legal_action, env.num_actions-1)
 
+    def test_get_action_features(self):
+        env = rlcard.make('doudizhu')
+        action_ids = [0, 1, env.num_actions-2, env.num_actions-1] + list(np.random.randint(env.num_actions, size=20))
+        features = env.get_action_features(action_ids)
+        self.assertEqual(features.shape, (len(action_ids), 54))
+        for action_id, feature in zip(action_ids, features):
+            expected = _cards2array(env._decode_action(action_id))
+            self.assertTrue(np.array_equal(feature, expected))
+            self.assertTrue(np.array_equal(env.get_action_feature(action_id), expected))
+
+    def test_observation_encoder(self):
+        env = rlcard.make('doudizhu', config={'allow_step_back': True, 'seed': 0})
+        np_random = np.random.RandomState(0)
+        state, _ = env.reset()
+        while not env.is_over():
+            state, _ = env.step(np_random.choice(list(state['legal_actions'])))
+            # The landlord has always played before the peasants observe
+            if np_random.rand() < 0.2 and len(env.game.round.trace) > 1:
+                state, _ = env.step_back()
+            for player_id in range(env.num_players):
+                expected = _encode_state(env.game.get_state(player_id))
+                self.assertTrue(np.array_equal(env.get_state(player_id)['obs'], expected))
+        obs = env.get_state(0)['obs']
+        obs[:] = 0
+        self.assertFalse(np.array_equal(env.get_state(0)['obs'], obs))
+
     def test_step(self):
         env = rlcard.make('doudizhu')
         _, player_id = env.reset()
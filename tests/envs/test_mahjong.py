@@ -3,6 +3,7 @@ import numpy as np
 
 import rlcard
 from rlcard.agents.random_agent import RandomAgent
+from rlcard.games.mahjong.utils import encode_cards, pile2list
 from .determism_util import is_deterministic
 
 class TestMahjongEnv(unittest.TestCase):
@@ -15,6 +16,22 @@ class TestMahjongEnv(unittest.TestCase):
     def test_is_deterministic(self):
         self.assertTrue(is_deterministic('mahjong'))
 
+    def test_get_obs(self):
+        env = rlcard.make('mahjong')
+        state, _ = env.reset()
+        while not env.is_over():
+            for player_id in range(env.num_players):
+                raw_state = env.game.get_state(player_id)
+                planes = [encode_cards(raw_state['current_hand']), encode_cards(raw_state['table'])]
+                for p in raw_state['players_pile']:
+                    planes.append(encode_cards(pile2list(raw_state['players_pile'][p])))
+                self.assertTrue(np.array_equal(env.get_state(player_id)['obs'], np.array(planes)))
+            out = np.zeros((6, 34, 4), dtype=np.int8)
+            self.assertIs(env.get_obs(out=out), out)
+            self.assertTrue(np.array_equal(out, state['obs']))
+            action = np.random.choice(list(state['legal_actions'].keys()))
+            state, _ = env.step(action)
+
     def test_get_legal_actions(self):
         env = rlcard.make('mahjong')
         env.set_agents([RandomAgent(env.num_actions) for _ in range(env.num_players)])
@@ -4,6 +4,8 @@ import functools
 
 from rlcard.games.doudizhu.game import DoudizhuGame as Game
 from rlcard.games.doudizhu.utils import get_landlord_score, encode_cards
+from rlcard.games.doudizhu.utils import get_gt_action_ids, cards2counts, ID_2_ACTION
+from rlcard.games.doudizhu.utils import build_rule_tables, RULE_TABLES_PATH, CARD_RANK_STR
 from rlcard.games.doudizhu.utils import doudizhu_sort_str
 from rlcard.games.doudizhu.judger import DoudizhuJudger as Judger
 
@@ -124,6 +126,44 @@ class TestDoudizhuGame(unittest.TestCase):
         #greater_player should be the same
         self.assertEqual(game.round.greater_player.player_id, 0)
 
+    def test_lazy_state(self):
+        game = Game(allow_step_back=True)
+        state, player_id = game.init_game()
+        self.assertIs(game.get_state(player_id), state)
+        self.assertEqual([ID_2_ACTION[i] for i in game.get_legal_action_ids()], state['actions'])
+        next_state, next_player_id = game.step(state['actions'][0])
+        self.assertIsNot(game.state, state)
+        self.assertIs(game.state, next_state)
+        self.assertEqual(next_state['actions'][0], 'pass')
+        self.assertEqual([ID_2_ACTION[i] for i in game.get_legal_action_ids(next_player_id)], next_state['actions'])
+        game.step_back()
+        self.assertEqual(game.state['actions'], state['actions'])
+
+    def test_player_play_and_play_back(self):
+        game = Game()
+        game.init_game()
+        player = game.players[0]
+        hand = player.current_hand_str
+        cards_with_suit = [str(card) for card in player.current_hand]
+        action = hand[0] + hand[-1]
+        player.play(action)
+        self.assertEqual(player.num_cards, 18)
+        self.assertEqual(player.current_hand_str, hand[1:-1])
+        self.assertEqual(len(player.current_hand), 18)
+        player.play('pass')
+        player.play_back()
+        player.play_back()
+        self.assertEqual(player.current_hand_str, hand)
+        self.assertEqual([str(card) for card in player.current_hand], cards_with_suit)
+        # The hand can only be changed through set_current_hand()
+        with self.assertRaises(AttributeError):
+            player.current_hand.append(player.current_hand[0])
+        player.set_current_hand(list(player.current_hand[1:]))
+        self.assertEqual(player.current_hand_str, hand[1:])
+        self.assertEqual(player.hand_counts.sum(), len(hand) - 1)
+        self.assertEqual(game._get_others_current_hand(player), ''.join(sorted(
+            game.players[1].current_hand_str + game.players[2].current_hand_str, key=CARD_RANK_STR.index)))
+
     def test_get_landlord_score(self):
         score_1 = get_landlord_score('56888TTQKKKAA222R')
         self.assertEqual(score_1, 12)
@@ -137,6 +177,25 @@ class TestDoudizhuGame(unittest.TestCase):
         self.assertEqual(plane[1][13], 1)
         self.assertEqual(plane[1][14], 1)
 
+    def test_get_gt_action_ids(self):
+        counts = cards2counts('3445556666789TJBR')
+        gt_cards = [ID_2_ACTION[i] for i in get_gt_action_ids(counts, '44')]
+        self.assertEqual(gt_cards, ['55', '66', 'BR', '6666'])
+        gt_cards = [ID_2_ACTION[i] for i in get_gt_action_ids(counts, '34567')]
+        self.assertEqual(gt_cards, ['45678', '56789', '6789T', '789TJ', 'BR', '6666'])
+        self.assertEqual(len(get_gt_action_ids(counts, 'BR')), 0)
+
+    def test_rule_tables(self):
+        tables = build_rule_tables()
+        with np.load(RULE_TABLES_PATH) as shipped_tables:
+            self.assertEqual(set(shipped_tables.files), set(tables))
+            for key, array in tables.items():
+                self.assertTrue(np.array_equal(shipped_tables[key], array), key)
+        # get_gt_action_ids() searches the weights of every type
+        offsets = tables['type_card_offsets']
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            self.assertTrue(np.all(np.diff(tables['type_card_weights'][start:end]) >= 0))
+
     def test_judge_payoffs(self):
         payoffs = Judger.judge_payoffs(0, 0)
         self.assertEqual(payoffs[0], 1)
@@ -1,6 +1,7 @@
 import unittest
+import numpy as np
 
-from rlcard.games.doudizhu.utils import CARD_TYPE
+from rlcard.games.doudizhu.utils import CARD_TYPE, CARD_RANK_STR, ID_2_ACTION
 from rlcard.games.doudizhu.judger import DoudizhuJudger as Judger
 
 class TestDoudizhuGame(unittest.TestCase):
@@ -155,5 +156,13 @@ class TestDoudizhuGame(unittest.TestCase):
             self.assertIn(c, playable_cards)
         self.assertEqual(len(playable_cards), len(all_cards_list))
 
+    def test_playable_action_ids_from_hand(self):
+        np_random = np.random.RandomState(0)
+        deck = ''.join(rank * 4 for rank in CARD_RANK_STR[:13]) + 'BR'
+        for num_cards in [1, 5, 17, 20, 20, 20, 33, 54]:
+            hand = ''.join(sorted(np_random.choice(list(deck), num_cards, replace=False), key=CARD_RANK_STR.index))
+            action_ids = Judger.playable_action_ids_from_hand(hand)
+            self.assertEqual(set(ID_2_ACTION[i] for i in action_ids), Judger.playable_cards_from_hand(hand))
+
 if __name__ == '__main__':
     unittest.main()
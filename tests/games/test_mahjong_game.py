@@ -3,6 +3,37 @@ import numpy as np
 
 from rlcard.games.mahjong.game import MahjongGame as Game
 from rlcard.games.mahjong.player import MahjongPlayer as Player
+from rlcard.games.mahjong.card import MahjongCard as Card
+from rlcard.games.mahjong.judger import MahjongJudger as Judger
+from rlcard.games.mahjong.utils import init_deck, cards2counts
+
+def _judge_hu_from_cards(judger, player):
+    ''' The string based judge_hu that the tile count version replaced,
+        as the reference of its results
+    '''
+    set_count = 0
+    hand = [card.get_str() for card in player.hand]
+    count_dict = {card: hand.count(card) for card in hand}
+    set_count = len(player.pile)
+    if set_count >= 4:
+        return True, set_count
+    used = []
+    maximum = 0
+    for each in count_dict:
+        if each in used:
+            continue
+        tmp_set_count = 0
+        tmp_hand = hand.copy()
+        if count_dict[each] == 2:
+            for _ in range(count_dict[each]):
+                tmp_hand.pop(tmp_hand.index(each))
+            tmp_set_count, _set = judger.cal_set(tmp_hand)
+            used.extend(_set)
+            if tmp_set_count + set_count > maximum:
+                maximum = tmp_set_count + set_count
+            if tmp_set_count + set_count >= 4:
+                return True, maximum
+    return False, maximum
 
 class TestMahjongMethods(unittest.TestCase):
 
@@ -68,6 +99,61 @@ class TestMahjongMethods(unittest.TestCase):
         success = game.step_back()
         self.assertEqual(success, False)
 
+    def test_judge_hu(self):
+        judger = Judger(np.random.RandomState())
+        player = Player(0, np.random.RandomState())
+        for trait in ['1', '2', '3', '5', '6', '7']:
+            player.hand.append(Card('dots', trait))
+        player.hand.extend([Card('bamboo', '9')] * 3 + [Card('winds', 'east')] * 2)
+        self.assertEqual(judger.judge_hu(player), (False, 3))
+        player.pile.append([Card('dragons', 'red')] * 3)
+        self.assertEqual(judger.judge_hu(player), (True, 4))
+
+        np_random = np.random.RandomState(0)
+        deck = init_deck()
+        for _ in range(2000):
+            num_piles = np_random.randint(4)
+            player.pile = [None] * num_piles
+            if np_random.rand() < 0.5:
+                cards = [card for card in deck if card.type == 'dots']
+            else:
+                cards = deck
+            indices = np_random.choice(len(cards), 14 - 3 * num_piles, replace=False)
+            player.hand = [cards[i] for i in indices]
+            self.assertEqual(judger.judge_hu(player), _judge_hu_from_cards(judger, player))
+
+    def test_hand_counts(self):
+        game = Game()
+        state, _ = game.init_game()
+        while not game.is_over():
+            action = np.random.choice(game.get_legal_actions(state))
+            state, _ = game.step(action)
+            for player in game.players:
+                self.assertTrue(np.array_equal(game.round.hand_counts[player.player_id], cards2counts(player.hand)))
+                self.assertEqual(game.round.judge_hu(player), game.judger.judge_hu(player))
+
+    def test_step_back_to_start(self):
+        def get_cards(game):
+            return ([c.get_str() for c in game.dealer.deck], [c.get_str() for c in game.dealer.table],
+                    [[c.get_str() for c in p.hand] for p in game.players],
+                    [[[c.get_str() for c in s] for s in p.pile] for p in game.players],
+                    game.round.current_player, game.round.valid_act, game.round.hand_counts.tolist())
+
+        game = Game(allow_step_back=True)
+        state, _ = game.init_game()
+        trace, actions = [get_cards(game)], []
+        while not game.is_over():
+            actions.append(np.random.choice(game.get_legal_actions(state)))
+            state, _ = game.step(actions[-1])
+            trace.append(get_cards(game))
+        for cards in reversed(trace[:-1]):
+            self.assertTrue(game.step_back())
+            self.assertEqual(get_cards(game), cards)
+        self.assertFalse(game.step_back())
+        for action, cards in zip(actions, trace[1:]):
+            game.step(action)
+            self.assertEqual(get_cards(game), cards)
+
     def test_player_get_player_id(self):
         player = Player(0, np.random.RandomState())
         self.assertEqual(0, player.get_player_id())
@@ -3,8 +3,9 @@ import numpy as np
 
 from rlcard.games.uno.game import UnoGame as Game
 from rlcard.games.uno.player import UnoPlayer as Player
+from rlcard.games.uno.card import UnoCard as Card
 from rlcard.games.uno.utils import ACTION_LIST
-from rlcard.games.uno.utils import hand2dict, encode_hand, encode_target
+from rlcard.games.uno.utils import hand2dict, encode_hand, encode_target, encode_hand_counts, card2id
 
 class TestUnoMethods(unittest.TestCase):
 
@@ -69,6 +70,35 @@ class TestUnoMethods(unittest.TestCase):
         success = game.step_back()
         self.assertEqual(success, False)
 
+    def test_get_legal_action_mask(self):
+        game = Game()
+        game.init_game()
+        player = game.players[0]
+        player.hand = [Card('number', 'r', '5'), Card('wild', 'b', 'wild_draw_4'), Card('action', 'g', 'skip')]
+        game.round.hand_counts[0] = 0
+        for card in player.hand:
+            game.round.hand_counts[0, card2id(card)] += 1
+        def get_legal_actions(target):
+            game.round.target = target
+            game.round.legal_action_masks.clear()
+            return game.round.get_legal_actions(game.players, 0)
+        self.assertEqual(get_legal_actions(Card('number', 'g', '7')), ['g-skip'])
+        self.assertEqual(get_legal_actions(Card('number', 'b', '5')), ['r-5'])
+        self.assertEqual(get_legal_actions(Card('wild', 'y', 'wild')), ['r-wild_draw_4', 'g-wild_draw_4', 'b-wild_draw_4', 'y-wild_draw_4'])
+        game.round.hand_counts[0, card2id(player.hand[1])] -= 1
+        self.assertEqual(get_legal_actions(Card('number', 'y', '1')), ['draw'])
+
+    def test_hand_counts(self):
+        game = Game(num_players=4)
+        game.init_game()
+        while not game.is_over():
+            for player in game.players:
+                counts = np.zeros(60, dtype=int)
+                for card in player.hand:
+                    counts[card2id(card)] += 1
+                self.assertTrue(np.array_equal(game.round.hand_counts[player.player_id], counts))
+            game.step(np.random.choice(game.get_legal_actions()))
+
     def test_hand2dict(self):
         hand_1 = ['y-1', 'r-8', 'b-9', 'y-reverse', 'r-skip']
         hand1_dict = hand2dict(hand_1)
@@ -95,6 +125,17 @@ class TestUnoMethods(unittest.TestCase):
             self.assertEqual(encoded_hand2[1][color][-2], 1)
             self.assertEqual(encoded_hand2[1][color][-1], 1)
 
+    def test_encode_hand_counts(self):
+        hand = [Card('number', 'y', '1'), Card('number', 'y', '1'), Card('action', 'r', 'skip'), Card('wild', 'b', 'wild')]
+        counts = np.zeros(60, dtype=int)
+        for card in hand:
+            counts[card2id(card)] += 1
+        encoded_hand = np.zeros((3, 4, 15), dtype=int)
+        encode_hand_counts(encoded_hand, counts)
+        expected = np.zeros((3, 4, 15), dtype=int)
+        encode_hand(expected, [card.get_str() for card in hand])
+        self.assertTrue(np.array_equal(encoded_hand, expected))
+
     def test_encode_target(self):
         encoded_target = np.zeros((4, 15), dtype=int)
         target = 'r-1'
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import torch
+
+import rlcard
+from rlcard.agents import DQNAgent
+from rlcard.agents.dmc_agent.model import DMCAgent
+from rlcard.utils.evaluation import (
+    load_agent,
+    find_latest_checkpoint,
+    evaluate_checkpoint,
+    evaluation_worker,
+)
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_evaluate_checkpoint(self):
+        env = rlcard.make('leduc-holdem')
+        agent = DMCAgent(env.state_shape[0], [env.num_actions], mlp_layers=[8], device='cpu')
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsNone(find_latest_checkpoint(os.path.join(tmp, '0_*.pth')))
+            for frames in [100, 200]:
+                torch.save(agent.checkpoint_attributes(), os.path.join(tmp, '0_%d.pth' % frames))
+            os.utime(os.path.join(tmp, '0_100.pth'), (0, 0))
+            path, _ = find_latest_checkpoint(os.path.join(tmp, '0_*.pth'))
+            self.assertEqual(os.path.basename(path), '0_200.pth')
+            self.assertIsInstance(load_agent(path, env, 0), DMCAgent)
+
+            reward = evaluate_checkpoint(env, path, ['random'], position=1, num_games=10)
+            self.assertTrue(-13 <= reward <= 13)
+
+            # The worker evaluates the latest checkpoint once before it stops
+            stop_event = threading.Event()
+            stop_event.set()
+            log_path = os.path.join(tmp, 'evaluation.jsonl')
+            evaluation_worker('leduc-holdem', os.path.join(tmp, '0_*.pth'), ['random'], log_path,
+                              num_games=10, stop_event=stop_event)
+            with open(log_path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0]['frames'], 200)
+            self.assertEqual(records[0]['opponents'], ['random'])
+
+    def test_evaluation_worker_records(self):
+        env = rlcard.make('leduc-holdem')
+        agent = DQNAgent(num_actions=env.num_actions, state_shape=env.state_shape[0], mlp_layers=[8], device='cpu')
+        agent.total_t = 42
+        stop_event = threading.Event()
+        stop_event.set()
+        with tempfile.TemporaryDirectory() as tmp:
+            # Checkpoints without a number in their name use the step counter of the agent
+            agent.save_checkpoint(tmp)
+            log_path = os.path.join(tmp, 'evaluation.jsonl')
+            evaluation_worker('leduc-holdem', os.path.join(tmp, 'checkpoint_*.pt'), ['random'], log_path,
+                              num_games=10, stop_event=stop_event)
+            # A failed evaluation is recorded with its error
+            with open(os.path.join(tmp, 'checkpoint_7.pt'), 'w') as f:
+                f.write('not a checkpoint')
+            evaluation_worker('leduc-holdem', os.path.join(tmp, 'checkpoint_*.pt'), ['random'], log_path,
+                              num_games=10, stop_event=stop_event)
+            with open(log_path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(len(records), 2)
+            self.assertEqual(records[0]['frames'], 42)
+            self.assertIn('reward', records[0])
+            self.assertEqual(records[1]['frames'], 7)
+            self.assertNotIn('reward', records[1])
+            self.assertIn('Error', records[1]['error'])
+
+if __name__ == '__main__':
+    unittest.main()